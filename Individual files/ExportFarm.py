@@ -0,0 +1,202 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Export farm for UnityExporter. Runs FBX exports in a pool of headless Maya processes, so the artist's session isn't blocked. For use in Autodesk Maya.
+
+1. the jobs (assets, folder, postfix and FBX options) are written to job files, one per worker
+2. every worker is a mayapy process running ExportWorker.py on its job file. the interpreter is configurable,
+   so a plain python with stub maya modules can stand in for mayapy in tests (see tests/test_ExportFarm.py)
+3. jobs of the same export folder always go to the same worker, so only one process writes that folder's manifest
+4. a thread waits on every worker and hands its results back to the Maya main thread (maya.utils.executeDeferred)
+
+the workers open the scene as it is saved on disk, unsaved changes are not exported
+
+USAGE:
+import ExportFarm
+farm = ExportFarm.ExportFarm(workers=2)
+farm.Submit("D:/scenes/props.mb", "D:/Projects/MyUnityProject",
+            [{"name": "crate", "folder": "Props", "assets": ["|crate_grp"]},
+             {"name": "crate", "postfix": "_low", "folder": "Props", "assets": ["|crate_low_grp"]}],
+            onFinished=ShowResults)
+'''
+
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import ExportQueue
+
+log = logging.getLogger("UnityExporterLog")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(HERE, "ExportWorker.py")
+#mayapy next to the running Maya, unless UNITY_EXPORTER_MAYAPY points somewhere else
+MAYAPY = os.environ.get("UNITY_EXPORTER_MAYAPY") or \
+         os.path.join(os.path.dirname(sys.executable), "mayapy.exe" if os.name == "nt" else "mayapy")
+#leave a core to the interactive session
+WORKERS = max(1, min(4, multiprocessing.cpu_count() - 1))
+#no console window for every worker on windows
+_CREATION_FLAGS = 0x08000000 if os.name == "nt" else 0
+
+
+#writes the job file read by ExportWorker.py
+def WriteJobFile(path, scene, projectPath, jobs, fbxOptions=None, force=False):
+    data = {"scene": scene, "projectPath": projectPath, "force": force,
+            "fbxOptions": list(fbxOptions or ExportQueue.FBX_OPTIONS), "jobs": jobs}
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1)
+    return path
+
+
+#splits @jobs into at most @workers lists of about the same number of assets. a folder is never split
+def SplitJobs(jobs, workers):
+    folders = {}
+    for job in jobs:
+        folders.setdefault(job.get("folder", ""), []).append(job)
+    bins = [[] for _ in range(max(1, min(workers, len(folders))))]
+    sizes = [0] * len(bins)
+    #biggest folders first, each into the emptiest worker
+    for folder in sorted(folders, key=lambda folder: -sum([len(job["assets"]) for job in folders[folder]])):
+        i = sizes.index(min(sizes))
+        bins[i].extend(folders[folder])
+        sizes[i] += sum([len(job["assets"]) for job in folders[folder]])
+    return [jobs for jobs in bins if jobs]
+
+
+#calls @function on the Maya main thread, or right away outside of an interactive Maya
+def _Deferred(function, *args):
+    try:
+        import maya.utils
+        maya.utils.executeDeferred(function, *args)
+    except (ImportError, AttributeError):
+        function(*args)
+
+
+'''
+Pool of headless Maya processes exporting FBX files
+'''
+class ExportFarm(object):
+    def __init__(self, interpreter=MAYAPY, workers=WORKERS, env=None):
+        self.interpreter = interpreter
+        self.workers = workers
+        #extra environment of the workers, e.g. PYTHONPATH of stub maya modules
+        self.env = env
+        self._processes = []
+        self._threads = []
+        self._lock = threading.Lock()
+
+    #true while a submitted batch is still exporting
+    def IsRunning(self):
+        return any([thread.is_alive() for thread in self._threads])
+
+    #starts exporting @jobs of @scene and returns right away
+    def Submit(self, scene, projectPath, jobs, onFinished=None, onWorkerFinished=None, force=False, fbxOptions=None):
+        """
+            @jobs are {"name", "folder", "assets", "postfix"} dicts.
+            @onWorkerFinished(results, seconds, error) is called for every worker, @onFinished(results) once with the
+            results of all jobs, in the order of @jobs. both are called on the Maya main thread
+        """
+        if self.IsRunning():
+            raise RuntimeError("The export farm is still running")
+        batchFolder = tempfile.mkdtemp(prefix="unityExporterFarm_")
+        #results are matched to their job by its index, two jobs can have the same name in different folders
+        workerJobs = SplitJobs([dict(job, index=i) for i, job in enumerate(jobs)], self.workers)
+        batch = {"folder": batchFolder, "jobs": jobs, "results": {}, "pending": len(workerJobs), "failed": False,
+                 "onFinished": onFinished, "onWorkerFinished": onWorkerFinished}
+        self._processes = []
+        self._threads = []
+        for i, chunk in enumerate(workerJobs):
+            jobFile = WriteJobFile(os.path.join(batchFolder, "jobs_%d.json" % i), scene, projectPath, chunk,
+                                   fbxOptions, force)
+            thread = threading.Thread(target=self._RunWorker, args=(batch, i, jobFile, projectPath, chunk))
+            thread.daemon = True
+            self._threads.append(thread)
+        for thread in self._threads:
+            thread.start()
+        log.info("Exporting %d jobs in %d workers" % (len(jobs), len(workerJobs)))
+        return batchFolder
+
+    #waits for the submitted batch. only useful outside of an interactive session
+    def Wait(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+        return not self.IsRunning()
+
+    #stops every worker. their unfinished jobs are reported as failed
+    def Cancel(self):
+        with self._lock:
+            for process in self._processes:
+                if process.poll() is None:
+                    process.kill()
+
+    #runs one worker process and waits for it, on its own thread
+    def _RunWorker(self, batch, index, jobFile, projectPath, jobs):
+        resultFile = os.path.join(batch["folder"], "results_%d.json" % index)
+        logFile = os.path.join(batch["folder"], "worker_%d.log" % index)
+        env = dict(os.environ)
+        env.update(self.env or {})
+        start = time.time()
+        error = None
+        results = []
+        try:
+            with open(logFile, "w") as logOutput:
+                with self._lock:
+                    process = subprocess.Popen([self.interpreter, WORKER_SCRIPT, jobFile, resultFile], env=env,
+                                               stdout=logOutput, stderr=subprocess.STDOUT,
+                                               creationflags=_CREATION_FLAGS)
+                    self._processes.append(process)
+                returnCode = process.wait()
+            if returnCode == 0:
+                with open(resultFile, "r") as f:
+                    results = json.load(f)["results"]
+            else:
+                error = "worker exited with %d: %s" % (returnCode, _LastLine(logFile))
+        except (IOError, OSError, ValueError) as e:
+            error = "worker failed to run: %s" % e
+        seconds = time.time() - start
+        if error:
+            queue = ExportQueue.ExportQueue(projectPath)
+            results = [{"name": job["name"] + job.get("postfix", ""), "status": "failed", "error": error,
+                        "file": queue.ExportPath(job.get("folder", ""), job["name"] + job.get("postfix", "")),
+                        "seconds": seconds} for job in jobs]
+        _Deferred(self._WorkerFinished, batch, jobs, results, seconds, error)
+
+    #collects the results of a worker, on the main thread
+    def _WorkerFinished(self, batch, jobs, results, seconds, error):
+        if error:
+            log.error(error)
+        if batch["onWorkerFinished"]:
+            batch["onWorkerFinished"](results, seconds, error)
+        with self._lock:
+            #a worker returns a result per job, in the order of its jobs
+            for job, result in zip(jobs, results):
+                batch["results"][job["index"]] = result
+            batch["failed"] = batch["failed"] or bool(error)
+            batch["pending"] -= 1
+            done = batch["pending"] == 0
+        if not done:
+            return
+        ordered = [batch["results"][i] for i in range(len(batch["jobs"])) if i in batch["results"]]
+        if batch["failed"]:
+            #keep the job files and worker logs to look into
+            log.warning("Worker logs kept in %s" % batch["folder"])
+        else:
+            shutil.rmtree(batch["folder"], ignore_errors=True)
+        if batch["onFinished"]:
+            batch["onFinished"](ordered)
+
+
+#last non-empty line of a worker log, usually the exception
+def _LastLine(path):
+    try:
+        with open(path, "r") as f:
+            lines = [line.strip() for line in f if line.strip()]
+    except (IOError, OSError):
+        return ""
+    return lines[-1] if lines else ""
@@ -0,0 +1,413 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Batch FBX export queue for UnityExporter. Exports many asset groups into a Unity Project in one go. For use in Autodesk Maya.
+
+1. FBX export options are set once per Maya session instead of before every export
+2. a manifest lists any number of asset groups, each with normal and low-version assets
+3. an asset is skipped when its scene content hash (and the export options) haven't changed since it was last exported.
+   hashes are kept in a hidden ".unityExporter.json" in every export folder, which Unity ignores
+4. an asset that is exported goes to a hidden temp file first. the target is only replaced when the FBX differs from it,
+   so Unity doesn't reimport a file that came out the same. the export time and the (temp) file path the FBX exporter
+   writes into every file are masked before comparing (FbxHash)
+
+manifest (json):
+{"groups": [{"name": "crate", "folder": "Props", "normal": ["|crate_grp"], "low": ["|crate_low_grp"]}]}
+
+USAGE:
+import ExportQueue
+queue = ExportQueue.ExportQueue("D:/Projects/MyUnityProject")
+queue.AddManifest("D:/exports/props.json")
+results = queue.Run()
+
+maya.cmds and maya.mel are only used through module globals, so the queue runs headless on the stub modules of
+tests/mayaStub (see tests/test_ExportQueue.py)
+'''
+
+import maya.cmds as cmds
+import maya.mel as mel
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import tempfile
+import time
+
+import Profiler
+
+log = logging.getLogger("UnityExporterLog")
+profile = Profiler.GetProfile("UnityExporter", log)
+
+#FBX export options used for Unity. set once per session by SetupFBXSession
+FBX_OPTIONS = [
+    "FBXExportSmoothingGroups -v true",
+    "FBXExportHardEdges -v false",
+    "FBXExportTangents -v false",
+    "FBXExportSmoothMesh -v true",
+    "FBXExportInstances -v false",
+    "FBXExportReferencedContainersContent -v false",
+    # Animation
+    "FBXExportAnimationOnly -v false",
+    "FBXExportUseSceneName -v false",
+    "FBXExportQuaternion -v euler",
+    "FBXExportShapes -v true",
+    "FBXExportSkins -v true",
+    # Constraints
+    "FBXExportConstraints -v false",
+    # Cameras
+    "FBXExportCameras -v false",
+    # Lights
+    "FBXExportLights -v false",
+    # Embed Media
+    "FBXExportEmbeddedTextures -v false",
+    # Connections
+    "FBXExportInputConnections -v false",
+    # Axis Conversion
+    "FBXExportUpAxis y",
+]
+#hidden file in every export folder that remembers what was exported there
+MANIFEST_NAME = ".unityExporter.json"
+#FBX records holding the time of the export, different in every file
+_VOLATILE_NODES = [b"FileId", b"CreationTime", b"Year", b"Month", b"Day", b"Hour", b"Minute", b"Second", b"Millisecond"]
+#FBX properties holding the export time or the path the file was written to, the temp file of an export
+_VOLATILE_PROPERTIES = [b"DocumentUrl", b"SrcDocumentUrl", b"Original|DateTime_GMT", b"Original|FileName",
+                        b"LastSaved|DateTime_GMT"]
+_BINARY_MAGIC = b"Kaydara FBX Binary"
+#a binary FBX ends in a footer that starts with an id made from the export time
+_BINARY_FOOTER = 176
+_ASCII_VOLATILE = re.compile(br'(?m)^(\s*(?:%s)\s*:).*$|^(\s*P:\s*"(?:%s)").*$' %
+                             (b"|".join(_VOLATILE_NODES), b"|".join([re.escape(p) for p in _VOLATILE_PROPERTIES])))
+
+_fbxSession = False
+
+
+#load the fbx plugin and set the export options, once per session
+def SetupFBXSession(force=False):
+    """
+        Sets FBX_OPTIONS the first time it is called. @force sets them again, in case another tool changed them
+    """
+    global _fbxSession
+    if _fbxSession and not force:
+        return
+    #load fbx plugin if it is not loaded
+    if not cmds.pluginInfo("fbxmaya", q=True, l=True):
+        cmds.loadPlugin("fbxmaya")
+    for option in FBX_OPTIONS:
+        mel.eval(option)
+    _fbxSession = True
+
+
+#hash of the export options, stored with every export so changing an option exports again
+def OptionsHash():
+    return hashlib.sha1("\n".join(FBX_OPTIONS).encode("utf-8")).hexdigest()
+
+
+#hash of everything in the scene that ends up in the FBX of @assets
+def ContentHash(assets):
+    """
+        Hashes the dag nodes under @assets, the deformers and construction history of their meshes, and their materials
+        with everything upstream of them (textures, place2d..), each with the animation curves driving it.
+        transforms, joints and meshes are hashed by what the FBX exporter reads of them, any other node by all of its
+        settable attributes, so a node type nobody thought of still can't hide an edit
+    """
+    digest = hashlib.sha1()
+    dagNodes = sorted(set(cmds.ls(assets, dag=True, long=True) or []))
+    meshes = [node for node in dagNodes if cmds.nodeType(node) == "mesh"]
+    for node in dagNodes:
+        _HashDagNode(digest, node)
+    #skinClusters, blendShapes, other deformers and poly modifiers
+    history = sorted(set(cmds.listHistory(meshes, pruneDagObjects=True) or [])) if meshes else []
+    shadingEngines = sorted(set(cmds.listConnections(meshes, type="shadingEngine") or [])) if meshes else []
+    digest.update(("shadingEngines=%r\n" % shadingEngines).encode("utf-8"))
+    materials = cmds.listConnections(["%s.surfaceShader" % engine for engine in shadingEngines],
+                                     source=True, destination=False) if shadingEngines else []
+    #a material with its textures and their placement
+    shading = sorted(set(cmds.listHistory(materials) or [])) if materials else []
+    for node in history + [node for node in shading if node not in history]:
+        _HashDependNode(digest, node)
+    return digest.hexdigest()
+
+
+#hashes a transform, joint or mesh by what the FBX exporter reads of it, any other dag node by all of its attributes
+def _HashDagNode(digest, node):
+    nodeType = cmds.nodeType(node)
+    digest.update(("%s|%s\n" % (node, nodeType)).encode("utf-8"))
+    if nodeType not in ("transform", "joint", "mesh"):
+        _HashAttributes(digest, node)
+        _HashAnimation(digest, node)
+        return
+    if nodeType == "transform" or nodeType == "joint":
+        digest.update(repr(cmds.xform(node, q=True, matrix=True, objectSpace=True)).encode("utf-8"))
+    for attr in sorted(cmds.listAttr(node, keyable=True) or []):
+        try:
+            digest.update(("%s=%r\n" % (attr, cmds.getAttr("%s.%s" % (node, attr)))).encode("utf-8"))
+        except Exception:
+            #compound or multi attributes that getAttr can't read as a whole
+            pass
+    if nodeType == "mesh":
+        digest.update(repr(cmds.polyInfo(node, faceToVertex=True)).encode("utf-8"))
+        #every edge ends in Hard or Soft, the smoothing groups of the FBX
+        digest.update(repr(cmds.polyInfo(node, edgeToVertex=True)).encode("utf-8"))
+        digest.update(repr(cmds.xform("%s.vtx[*]" % node, q=True, translation=True, objectSpace=True)).encode("utf-8"))
+        digest.update(repr(cmds.polyNormalPerVertex("%s.vtxFace[*][*]" % node, q=True, xyz=True)).encode("utf-8"))
+        digest.update(repr(cmds.polyEditUV("%s.map[*]" % node, q=True)).encode("utf-8"))
+    _HashAnimation(digest, node)
+
+
+#hashes a node of the history or shading network of the assets
+def _HashDependNode(digest, node):
+    nodeType = cmds.nodeType(node)
+    digest.update(("%s|%s\n" % (node, nodeType)).encode("utf-8"))
+    if nodeType == "skinCluster":
+        #weights are read per vertex, a whole weightList through listAttr would be one getAttr per weight
+        digest.update(repr(cmds.skinCluster(node, q=True, influence=True)).encode("utf-8"))
+        for vertex in cmds.getAttr("%s.weightList" % node, multiIndices=True) or []:
+            plug = "%s.weightList[%d].weights" % (node, vertex)
+            digest.update(repr((vertex, cmds.getAttr(plug, multiIndices=True), cmds.getAttr(plug))).encode("utf-8"))
+        digest.update(("skinningMethod=%r\n" % cmds.getAttr("%s.skinningMethod" % node)).encode("utf-8"))
+    else:
+        #blendShape targets and weights, material colors, texture paths..
+        _HashAttributes(digest, node)
+    _HashAnimation(digest, node)
+
+
+#hashes every settable attribute of @node, with the elements of multi attributes
+def _HashAttributes(digest, node):
+    for attr in sorted(cmds.listAttr(node, settable=True, multi=True) or []):
+        try:
+            digest.update(("%s=%r\n" % (attr, cmds.getAttr("%s.%s" % (node, attr)))).encode("utf-8"))
+        except Exception:
+            pass
+
+
+#hashes the keys and tangents of the animation curves driving @node, its current values only show one frame
+def _HashAnimation(digest, node):
+    connections = cmds.listConnections(node, source=True, destination=False, type="animCurve",
+                                       connections=True, plugs=True) or []
+    for plug, curvePlug in sorted(zip(connections[::2], connections[1::2])):
+        curve = curvePlug.split(".")[0]
+        digest.update(("%s<-%s\n" % (plug, cmds.nodeType(curve))).encode("utf-8"))
+        digest.update(repr(cmds.keyframe(curve, q=True, timeChange=True, valueChange=True)).encode("utf-8"))
+        digest.update(repr(cmds.keyTangent(curve, q=True, inTangentType=True, outTangentType=True, inAngle=True,
+                                           outAngle=True, inWeight=True, outWeight=True)).encode("utf-8"))
+        for attr in ("preInfinity", "postInfinity", "weightedTangents"):
+            digest.update(("%s=%r\n" % (attr, cmds.getAttr("%s.%s" % (curve, attr)))).encode("utf-8"))
+
+
+#hash of the FBX file at @path, without the export time and file name written into it
+def FbxHash(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(_BINARY_MAGIC):
+        data = _MaskBinary(data)
+    else:
+        data = _ASCII_VOLATILE.sub(lambda match: match.group(1) or match.group(2), data)
+    return hashlib.sha1(data).hexdigest()
+
+
+#zeroes the values of the volatile records of a binary FBX and drops its footer
+def _MaskBinary(data):
+    masked = bytearray(data[:max(len(data) - _BINARY_FOOTER, 0)])
+    #a node name is stored after its length byte and followed by its first property
+    for name in _VOLATILE_NODES:
+        for match in re.finditer(re.escape(struct.pack("B", len(name)) + name), data):
+            _MaskProperty(data, masked, match.end())
+    #a property is a P node of strings: name, type, label, flags, then the value
+    for name in _VOLATILE_PROPERTIES:
+        for match in re.finditer(re.escape(b"S" + struct.pack("<I", len(name)) + name), data):
+            pos = match.end()
+            for _ in range(3):
+                if data[pos:pos + 1] != b"S":
+                    break
+                pos += 5 + struct.unpack("<I", data[pos + 1:pos + 5])[0]
+            else:
+                _MaskProperty(data, masked, pos)
+    return bytes(masked)
+
+
+#zeroes the property value at @pos
+def _MaskProperty(data, masked, pos):
+    kind = data[pos:pos + 1]
+    if kind == b"I":
+        start, end = pos + 1, pos + 5
+    elif kind in (b"S", b"R") and pos + 5 <= len(data):
+        start = pos + 5
+        end = start + struct.unpack("<I", data[pos + 1:pos + 5])[0]
+    else:
+        return
+    end = min(end, len(masked))
+    if start < end:
+        masked[start:end] = b"\0" * (end - start)
+
+
+#writes @data as json next to @path first, then replaces @path with it
+def _WriteJson(path, data):
+    folder, name = os.path.split(path)
+    fd, tempPath = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=folder)
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    _ReplaceFile(tempPath, path)
+
+
+#moves @src over @dst in one step where the platform can
+def _ReplaceFile(src, dst):
+    if hasattr(os, "replace"):
+        os.replace(src, dst)
+    else:
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+def _ReadJson(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except ValueError:
+        log.warning("Ignoring unreadable %s" % path)
+        return default
+
+
+'''
+Queue of FBX exports into one Unity Project
+'''
+class ExportQueue(object):
+    def __init__(self, projectPath):
+        self.projectPath = projectPath
+        #(name, folder, assets) in the order they were added
+        self.jobs = []
+        self._manifests = {}
+
+    #queues one export of @assets to <folder>/<name>.fbx
+    def AddJob(self, name, folder, assets):
+        self.jobs.append((name, folder, list(assets)))
+
+    #queues the normal and low-version assets of an asset group
+    def AddGroup(self, name, folder, normal=None, low=None):
+        if normal:
+            self.AddJob(name, folder, normal)
+        if low:
+            self.AddJob(name + "_low", folder, low)
+
+    #queues every group of a manifest file
+    def AddManifest(self, manifestPath):
+        with open(manifestPath, "r") as f:
+            manifest = json.load(f)
+        for group in manifest.get("groups", []):
+            self.AddGroup(group["name"], group.get("folder", ""), group.get("normal"), group.get("low"))
+
+    #exports every queued job and returns a result per job
+    def Run(self, force=False):
+        """
+            Returns [{"name", "file", "status", "reason", "seconds", "error"}], status is "exported", "skipped" or "failed".
+            reason of a skipped asset is "scene unchanged" (not exported) or "file unchanged" (exported, not replaced).
+            @force exports even when nothing changed
+        """
+        SetupFBXSession()
+        results = []
+        for name, folder, assets in self.jobs:
+            start = time.time()
+            result = {"name": name, "file": self.ExportPath(folder, name), "status": "failed", "reason": None, "error": None}
+            try:
+                result["status"], result["reason"] = self._ExportFile(result["file"], assets, force)
+            except Exception as e:
+                result["error"] = "%s" % e
+                log.error("Export of %s failed: %s" % (name, e))
+            result["seconds"] = time.time() - start
+            results.append(result)
+        self._SaveManifests()
+        self.jobs = []
+        exported = len([r for r in results if r["status"] == "exported"])
+        skipped = len([r for r in results if r["status"] == "skipped"])
+        profile.Count("files exported", exported)
+        profile.Count("files skipped", skipped)
+        profile.Count("files failed", len(results) - exported - skipped)
+        for result in results:
+            if result["status"] == "skipped":
+                log.info("skipped %s: %s" % (result["name"], result["reason"]))
+        log.info("Exported %d, skipped %d unchanged, %d failed" % (exported, skipped, len(results) - exported - skipped))
+        return results
+
+    #gets <project>/Assets/<folder>/<name>.fbx
+    def ExportPath(self, folder, name):
+        return "/".join([part for part in (self.projectPath, "Assets", folder, name + ".fbx") if part])
+
+    #exports @assets to @file on its own, outside of a run. returns (status, reason) like the results of Run
+    def ExportFile(self, file, assets, force=False):
+        SetupFBXSession()
+        try:
+            return self._ExportFile(file, assets, force)
+        finally:
+            self._SaveManifests()
+
+    def _ExportFile(self, file, assets, force):
+        exportFolder, fileName = os.path.split(file)
+        name = os.path.splitext(fileName)[0]
+        if not assets or not all([cmds.objExists(obj) for obj in assets]):
+            raise ValueError("One or more objects of %s doesn't exist" % name)
+        manifest = self._Manifest(exportFolder)
+        previous = manifest["assets"].get(name, {})
+        with profile.Timer("content hash"):
+            entry = {"contentHash": ContentHash(assets), "optionsHash": OptionsHash()}
+        exists = os.path.exists(file)
+        if not force and exists and all([previous.get(key) == entry[key] for key in entry]):
+            log.info("file %s unchanged in the scene, skipped" % file)
+            return "skipped", "scene unchanged"
+        try:
+            os.makedirs(exportFolder)
+        except OSError:
+            #exists, or was made meanwhile by a farm worker exporting to a folder next to this one
+            if not os.path.isdir(exportFolder):
+                raise
+        #export next to the target, hidden from Unity until it replaces it
+        fd, tempFile = tempfile.mkstemp(prefix="." + name + ".", suffix=".tmp.fbx", dir=exportFolder)
+        os.close(fd)
+        try:
+            with profile.Timer("fbx export"):
+                cmds.select(assets)
+                mel.eval('FBXExport -f "%s" -s' % tempFile.replace("\\", "/"))
+            with profile.Timer("fbx compare"):
+                entry["fileHash"] = FbxHash(tempFile)
+                unchanged = exists and entry["fileHash"] == self._TargetHash(file, previous)
+            if unchanged:
+                status = "skipped", "file unchanged"
+                log.info("file %s came out the same, not replaced" % file)
+            else:
+                _ReplaceFile(tempFile, file)
+                status = "exported", None
+                log.info("file %s exported" % file)
+        finally:
+            if os.path.exists(tempFile):
+                os.remove(tempFile)
+        stat = os.stat(file)
+        entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime
+        manifest["assets"][name] = entry
+        if status[0] == "exported":
+            profile.Count("bytes exported", stat.st_size)
+        return status
+
+    #FbxHash of the target @file, from its manifest @entry while the file wasn't touched since
+    def _TargetHash(self, file, entry):
+        stat = os.stat(file)
+        if entry.get("fileHash") and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            return entry["fileHash"]
+        return FbxHash(file)
+
+    #manifest of an export folder, loaded once per run
+    def _Manifest(self, exportFolder):
+        if exportFolder not in self._manifests:
+            manifest = _ReadJson(os.path.join(exportFolder, MANIFEST_NAME), {})
+            manifest.setdefault("assets", {})
+            #the settings the files of this folder were exported with, for whoever reads the manifest
+            manifest["fbxOptions"] = list(FBX_OPTIONS)
+            self._manifests[exportFolder] = manifest
+        return self._manifests[exportFolder]
+
+    def _SaveManifests(self):
+        for exportFolder, manifest in self._manifests.items():
+            if os.path.isdir(exportFolder):
+                _WriteJson(os.path.join(exportFolder, MANIFEST_NAME), manifest)
+        self._manifests = {}
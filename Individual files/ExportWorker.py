@@ -0,0 +1,81 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Headless worker of the UnityExporter export farm. Runs the FBX exports of a job file outside the interactive Maya session.
+
+1. opens the scene of the job file in a standalone Maya (mayapy)
+2. sets the FBX options of the job file and exports every job through ExportQueue, so unchanged assets are still skipped
+3. writes the results, with timings and errors, next to the job file for ExportFarm to pick up
+
+job file (json, written by ExportFarm.WriteJobFile):
+{"scene": "D:/scenes/props.mb", "projectPath": "D:/Projects/MyUnityProject", "force": false,
+ "fbxOptions": ["FBXExportSmoothingGroups -v true", ...],
+ "jobs": [{"name": "crate", "postfix": "_low", "folder": "Props", "assets": ["|crate_low_grp"], "index": 1}]}
+@index is the place of the job in the batch ExportFarm submitted, the results are written in the order of the jobs
+
+USAGE:
+mayapy ExportWorker.py <jobFile> <resultFile>
+'''
+
+import json
+import logging
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+import Profiler
+
+log = logging.getLogger("UnityExporterLog")
+#the same tool as the interactive session, the reports tell the processes apart by their pid
+profile = Profiler.GetProfile("UnityExporter", log)
+
+
+#starts Maya without its UI. a stub interpreter has no maya.standalone and needs nothing started
+def _InitializeMaya():
+    try:
+        import maya.standalone
+    except ImportError:
+        return
+    maya.standalone.initialize(name="python")
+
+
+#runs the jobs of @jobFile and returns a result per job
+def RunJobFile(jobFile):
+    with open(jobFile, "r") as f:
+        jobFileData = json.load(f)
+    with profile.Timer("start maya"):
+        _InitializeMaya()
+    import maya.cmds as cmds
+    import ExportQueue
+    if jobFileData.get("scene"):
+        with profile.Timer("open scene"):
+            cmds.file(jobFileData["scene"], open=True, force=True)
+    if jobFileData.get("fbxOptions"):
+        ExportQueue.FBX_OPTIONS = list(jobFileData["fbxOptions"])
+    queue = ExportQueue.ExportQueue(jobFileData["projectPath"])
+    for job in jobFileData["jobs"]:
+        queue.AddJob(job["name"] + job.get("postfix", ""), job.get("folder", ""), job["assets"])
+    return queue.Run(force=jobFileData.get("force", False))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        sys.stderr.write("usage: mayapy ExportWorker.py <jobFile> <resultFile>\n")
+        return 2
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    jobFile, resultFile = argv
+    start = time.time()
+    results = RunJobFile(jobFile)
+    with open(resultFile, "w") as f:
+        json.dump({"results": results, "seconds": time.time() - start}, f, indent=1)
+    #a profile report per worker, next to the ones of the interactive session
+    profile.Save()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,453 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Standalone reader of the layer groups of a psd file. Renders an icon of every group to PNG, without Maya.
+
+1. the psd is memory-mapped. only the header, the layer records and the rows of the channels an icon samples are read
+2. RLE channels are seeked row by row through their byte counts, so a large layer isn't decoded to make a small icon
+3. the layers of a group are downsampled (nearest pixel) and composited bottom to top with their opacity.
+   every blend mode is drawn as normal, good enough for a thumbnail
+4. groups are rendered in a pool of processes, one group per task
+5. group names are reduced to a safe file name alphabet for their icons, names that then collide are numbered (IconFiles)
+supports RGB and Grayscale psd and psb files of 8 and 16 bits per channel
+
+USAGE:
+python PsdReader.py splatters.psd --groups splatter1 splatter2 --out images/ --size 128 -j 4
+import PsdReader
+results = PsdReader.ExtractGroups("splatters.psd", ["splatter1"], "images/")
+'''
+
+import argparse
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+
+SIZE = 128
+PROCESSES = multiprocessing.cpu_count()
+ICON_NAME = "%sIcon.png"
+#characters of a group name that can't go into a file name. / \ and .. would leave the icon folder
+_UNSAFE = re.compile(r"[^A-Za-z0-9_-]")
+
+_RGB, _GRAYSCALE = 3, 1
+#"lsct" section divider types. a group is listed bottom to top as a divider, its layers, then its folder record
+_OPEN_FOLDER, _CLOSED_FOLDER, _DIVIDER = 1, 2, 3
+#tagged blocks with an 8 byte length in psb files
+_LONG_BLOCKS = set([b"LMsk", b"Lr16", b"Lr32", b"Layr", b"Mt16", b"Mt32", b"Mtrn", b"Alph", b"FMsk", b"lnk2", b"FEid",
+                    b"FXid", b"PxSD"])
+
+
+class PsdError(Exception):
+    pass
+
+
+'''
+Layer records of a memory-mapped psd file
+'''
+class PsdFile(object):
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise PsdError("%s is empty" % path)
+        try:
+            self._ReadHeader()
+            self.layers = self._ReadLayers()
+        except (struct.error, IndexError):
+            self.Close()
+            raise PsdError("%s is truncated" % path)
+        except PsdError:
+            self.Close()
+            raise
+
+    def Close(self):
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    #names of the layer groups, top-level and nested, bottom to top
+    def Groups(self):
+        return [layer["name"] for layer in self.layers if layer["folder"]]
+
+    #pixel layers inside the group @name, bottom to top. hidden layers and layers of hidden nested groups are left out
+    def GroupLayers(self, name):
+        layers = []
+        for layer in self.layers:
+            if layer["folder"] or layer["divider"]:
+                continue
+            if name in layer["groups"]:
+                nested = layer["groups"][layer["groups"].index(name) + 1:]
+                if layer["visible"] and all([self._Folder(group)["visible"] for group in nested]):
+                    layers.append(layer)
+        return layers
+
+    #renders the group @name to fit in @size x @size. returns (width, height, rgba)
+    def RenderGroup(self, name, size=SIZE):
+        if name not in self.Groups():
+            raise PsdError("%s has no layer group %s" % (self.path, name))
+        scale = float(size) / max(self.width, self.height)
+        width = max(1, int(round(self.width * scale)))
+        height = max(1, int(round(self.height * scale)))
+        #canvas pixel sampled by every icon pixel
+        xs = [min(self.width - 1, int((x + 0.5) * self.width / width)) for x in range(width)]
+        ys = [min(self.height - 1, int((y + 0.5) * self.height / height)) for y in range(height)]
+        rgba = bytearray(width * height * 4)
+        for layer in self.GroupLayers(name):
+            opacity = layer["opacity"] / 255.0
+            for nested in layer["groups"][layer["groups"].index(name) + 1:]:
+                opacity *= self._Folder(nested)["opacity"] / 255.0
+            self._Composite(layer, opacity, xs, ys, width, rgba)
+        return width, height, rgba
+
+    def _Folder(self, name):
+        for layer in self.layers:
+            if layer["folder"] and layer["name"] == name:
+                return layer
+        raise PsdError("%s has no layer group %s" % (self.path, name))
+
+    #draws the sampled pixels of @layer over @rgba
+    def _Composite(self, layer, opacity, xs, ys, width, rgba):
+        layerWidth = layer["right"] - layer["left"]
+        layerHeight = layer["bottom"] - layer["top"]
+        if layerWidth <= 0 or layerHeight <= 0 or opacity <= 0:
+            return
+        colorIds = [0, 1, 2] if self.mode == _RGB else [0]
+        channels = dict([(channel["id"], channel) for channel in layer["channels"]])
+        if not all([channelId in channels for channelId in colorIds]):
+            return
+        columns = [(i, x - layer["left"]) for i, x in enumerate(xs) if layer["left"] <= x < layer["right"]]
+        rows = [(i, y - layer["top"]) for i, y in enumerate(ys) if layer["top"] <= y < layer["bottom"]]
+        if not columns or not rows:
+            return
+        needed = sorted(set([row for _, row in rows]))
+        colors = [self._ReadRows(channels[channelId], layerWidth, layerHeight, needed) for channelId in colorIds]
+        alpha = self._ReadRows(channels[-1], layerWidth, layerHeight, needed) if -1 in channels else None
+        step = self.depth // 8
+        for i, row in rows:
+            rowColors = [color[row] for color in colors]
+            rowAlpha = alpha[row] if alpha else None
+            base = i * width * 4
+            for j, column in columns:
+                source = column * step
+                a = (rowAlpha[source] if rowAlpha else 255) * opacity / 255.0
+                if a <= 0:
+                    continue
+                pixel = base + j * 4
+                if self.mode == _RGB:
+                    color = [rowColors[0][source], rowColors[1][source], rowColors[2][source]]
+                else:
+                    color = [rowColors[0][source]] * 3
+                destAlpha = rgba[pixel + 3] / 255.0
+                outAlpha = a + destAlpha * (1 - a)
+                for c in range(3):
+                    rgba[pixel + c] = int(round((color[c] * a + rgba[pixel + c] * destAlpha * (1 - a)) / outAlpha))
+                rgba[pixel + 3] = int(round(outAlpha * 255))
+
+    #decodes only @rows of a channel. returns {row: bytearray}, 16 bit samples keep their high byte first
+    def _ReadRows(self, channel, width, height, rows):
+        offset = channel["offset"]
+        compression = struct.unpack_from(">H", self._data, offset)[0]
+        offset += 2
+        rowSize = width * self.depth // 8
+        decoded = {}
+        if compression == 0:
+            for row in rows:
+                start = offset + row * rowSize
+                decoded[row] = bytearray(self._data[start:start + rowSize])
+        elif compression == 1:
+            countSize = 4 if self.isPsb else 2
+            counts = struct.unpack_from(">%d%s" % (height, "I" if self.isPsb else "H"), self._data, offset)
+            start = offset + height * countSize
+            wanted = set(rows)
+            for row in range(max(rows) + 1):
+                if row in wanted:
+                    decoded[row] = _UnpackBits(self._data[start:start + counts[row]], rowSize)
+                start += counts[row]
+        elif compression in (2, 3):
+            try:
+                data = zlib.decompress(self._data[offset:channel["offset"] + channel["length"]])
+            except zlib.error as e:
+                raise PsdError("%s has a broken zip channel: %s" % (self.path, e))
+            for row in rows:
+                decoded[row] = bytearray(data[row * rowSize:(row + 1) * rowSize])
+                if compression == 3:
+                    _Unpredict(decoded[row], self.depth // 8)
+        else:
+            raise PsdError("%s uses unknown compression %d" % (self.path, compression))
+        return decoded
+
+    def _ReadHeader(self):
+        signature, version, channels, height, width, depth, mode = struct.unpack_from(">4sH6xHIIHH", self._data, 0)
+        if signature != b"8BPS" or version not in (1, 2):
+            raise PsdError("%s is not a psd file" % self.path)
+        if mode not in (_RGB, _GRAYSCALE):
+            raise PsdError("%s uses an unsupported color mode %d" % (self.path, mode))
+        if depth not in (8, 16):
+            raise PsdError("%s uses an unsupported depth of %d bits" % (self.path, depth))
+        self.isPsb = version == 2
+        self.width, self.height, self.depth, self.mode = width, height, depth, mode
+
+    #offset and length of the layer info, found in the layer and mask section or, for 16 bit files, in its Lr16 block
+    def _LayerInfo(self):
+        offset = 26
+        #color mode data, then image resources
+        for _ in range(2):
+            offset += 4 + struct.unpack_from(">I", self._data, offset)[0]
+        sectionLength, offset = self._Length(offset)
+        sectionEnd = offset + sectionLength
+        infoLength, infoOffset = self._Length(offset)
+        if infoLength:
+            return infoOffset, infoLength
+        #skip the global layer mask info, then look through the tagged blocks
+        offset = infoOffset
+        offset += 4 + struct.unpack_from(">I", self._data, offset)[0]
+        while offset + 12 <= sectionEnd:
+            key, length, data = self._TaggedBlock(offset)
+            if key in (b"Lr16", b"Lr32"):
+                return data, length
+            offset = data + length
+        return None, 0
+
+    def _ReadLayers(self):
+        offset, length = self._LayerInfo()
+        if not length:
+            return []
+        count = abs(struct.unpack_from(">h", self._data, offset)[0])
+        offset += 2
+        layers = []
+        for _ in range(count):
+            layer, offset = self._ReadLayerRecord(offset)
+            layers.append(layer)
+        #channel image data follows the records, layer by layer, channel by channel
+        for layer in layers:
+            for channel in layer["channels"]:
+                channel["offset"] = offset
+                offset += channel["length"]
+        return self._NameGroups(layers)
+
+    #a group is only named by its folder record, above its layers. walks the layers top to bottom to name their groups
+    def _NameGroups(self, layers):
+        names = []
+        for layer in reversed(layers):
+            if layer["divider"]:
+                if not names:
+                    raise PsdError("%s has an unbalanced layer group" % self.path)
+                names.pop()
+            layer["groups"] = list(names)
+            if layer["folder"]:
+                names.append(layer["name"])
+        return layers
+
+    def _ReadLayerRecord(self, offset):
+        top, left, bottom, right, channelCount = struct.unpack_from(">iiiiH", self._data, offset)
+        offset += 18
+        channels = []
+        for _ in range(channelCount):
+            channelId = struct.unpack_from(">h", self._data, offset)[0]
+            length = struct.unpack_from(">Q" if self.isPsb else ">I", self._data, offset + 2)[0]
+            offset += 10 if self.isPsb else 6
+            channels.append({"id": channelId, "length": length})
+        signature, blendMode, opacity, clipping, flags, extraLength = struct.unpack_from(">4s4sBBBxI", self._data, offset)
+        if signature != b"8BIM":
+            raise PsdError("%s has a broken layer record" % self.path)
+        offset += 16
+        extraEnd = offset + extraLength
+        #layer mask data, then blending ranges
+        for _ in range(2):
+            offset += 4 + struct.unpack_from(">I", self._data, offset)[0]
+        nameLength = struct.unpack_from(">B", self._data, offset)[0]
+        name = self._data[offset + 1:offset + 1 + nameLength].decode("latin-1")
+        offset += (1 + nameLength + 3) // 4 * 4
+        divider = 0
+        while offset + 12 <= extraEnd:
+            key, length, data = self._TaggedBlock(offset)
+            if key == b"luni":
+                characters = struct.unpack_from(">I", self._data, data)[0]
+                name = self._data[data + 4:data + 4 + characters * 2].decode("utf-16-be")
+            elif key == b"lsct":
+                divider = struct.unpack_from(">I", self._data, data)[0]
+            offset = data + length
+        layer = {"name": name, "top": top, "left": left, "bottom": bottom, "right": right, "channels": channels,
+                 "opacity": opacity, "blendMode": blendMode.decode("latin-1"), "visible": not flags & 0x02,
+                 "folder": divider in (_OPEN_FOLDER, _CLOSED_FOLDER), "divider": divider == _DIVIDER, "groups": []}
+        return layer, extraEnd
+
+    #reads a tagged block header. returns (key, length, dataOffset)
+    def _TaggedBlock(self, offset):
+        signature, key = struct.unpack_from(">4s4s", self._data, offset)
+        if signature not in (b"8BIM", b"8B64"):
+            raise PsdError("%s has a broken tagged block" % self.path)
+        if self.isPsb and key in _LONG_BLOCKS:
+            length = struct.unpack_from(">Q", self._data, offset + 8)[0]
+            data = offset + 16
+        else:
+            length = struct.unpack_from(">I", self._data, offset + 8)[0]
+            data = offset + 12
+        #block data is padded to an even length
+        return key, length + length % 2, data
+
+    #reads a section length, 8 bytes in psb files. returns (length, offset after it)
+    def _Length(self, offset):
+        if self.isPsb:
+            return struct.unpack_from(">Q", self._data, offset)[0], offset + 8
+        return struct.unpack_from(">I", self._data, offset)[0], offset + 4
+
+
+#decodes a PackBits row to @size bytes
+def _UnpackBits(data, size):
+    data = bytearray(data)
+    row = bytearray()
+    i = 0
+    while i < len(data) and len(row) < size:
+        header = data[i]
+        if header < 128:
+            row += data[i + 1:i + 2 + header]
+            i += 2 + header
+        elif header > 128:
+            row += data[i + 1:i + 2] * (257 - header)
+            i += 2
+        else:
+            i += 1
+    if len(row) < size:
+        row += bytearray(size - len(row))
+    return row[:size]
+
+
+#undoes the per row delta prediction of zip channels, in place
+def _Unpredict(row, step):
+    if step == 1:
+        for i in range(1, len(row)):
+            row[i] = (row[i] + row[i - 1]) & 0xff
+    else:
+        for i in range(2, len(row) - 1, 2):
+            value = ((row[i] << 8 | row[i + 1]) + (row[i - 2] << 8 | row[i - 1])) & 0xffff
+            row[i], row[i + 1] = value >> 8, value & 0xff
+
+
+#writes 8 bit @rgba pixels as a PNG file
+def WritePng(path, width, height, rgba):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    rowSize = width * 4
+    #filter type 0 in front of every row
+    raw = b"".join([b"\0" + bytes(rgba[y * rowSize:(y + 1) * rowSize]) for y in range(height)])
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+#renders one group to a PNG file. runs in the process pool
+def _RenderJob(job):
+    path, group, outPath, size = job
+    start = time.time()
+    result = {"group": group, "file": outPath, "error": None}
+    try:
+        with PsdFile(path) as psd:
+            width, height, rgba = psd.RenderGroup(group, size)
+        WritePng(outPath, width, height, rgba)
+    except (PsdError, IOError, OSError) as e:
+        result["error"] = "%s" % e
+    result["seconds"] = time.time() - start
+    return result
+
+
+#gets the icon file name of every group in @groups, %s of @iconName being the group in a safe alphabet.
+#names that collide after that, or only differ in case, are numbered in order (splatter_1, splatter_1_2)
+def IconFiles(groups, iconName=ICON_NAME):
+    files = {}
+    taken = set()
+    for group in groups:
+        if group in files:
+            continue
+        base = _UNSAFE.sub("_", group) or "group"
+        name = base
+        number = 2
+        while name.lower() in taken:
+            name = "%s_%d" % (base, number)
+            number += 1
+        taken.add(name.lower())
+        files[group] = iconName % name
+    return files
+
+
+#renders @groups of the psd at @path to PNG icons in @outFolder. returns a result per group, in order
+def ExtractGroups(path, groups, outFolder, size=SIZE, processes=PROCESSES, iconName=ICON_NAME, fileNames=None):
+    """
+        Returns [{"group", "file", "seconds", "error"}]. every group is rendered in its own task of a pool of @processes.
+        @fileNames are the icon files of @groups in the same order, IconFiles by default. they must be plain file names
+    """
+    if fileNames is None:
+        files = IconFiles(groups, iconName)
+        fileNames = [files[group] for group in groups]
+    if len(fileNames) != len(groups):
+        raise ValueError("%d icon files for %d groups" % (len(fileNames), len(groups)))
+    for fileName in fileNames:
+        if os.path.basename(fileName) != fileName or fileName in ("", ".", ".."):
+            raise ValueError("%s is not a plain file name" % fileName)
+    if not os.path.isdir(outFolder):
+        os.makedirs(outFolder)
+    jobs = [(path, group, os.path.join(outFolder, fileName), size) for group, fileName in zip(groups, fileNames)]
+    if processes > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(processes, len(jobs)))
+        try:
+            return pool.map(_RenderJob, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    return [_RenderJob(job) for job in jobs]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the layer groups of a psd file to PNG icons.")
+    parser.add_argument("psd", help="psd or psb file")
+    parser.add_argument("--groups", nargs="+", help="layer groups to render (default: every group)")
+    parser.add_argument("--out", help="folder of the icons (default: next to the psd)")
+    parser.add_argument("--size", type=int, default=SIZE, help="largest side of an icon in pixels (default: %d)" % SIZE)
+    parser.add_argument("-j", "--jobs", type=int, default=PROCESSES, help="worker processes (default: one per cpu)")
+    parser.add_argument("--icon-name", default=ICON_NAME, help="file name of an icon, %%s is the group (default: %s)" % ICON_NAME.replace("%", "%%"))
+    parser.add_argument("--icon-files", nargs="+", help="file name of the icon of every group of --groups, in the same order")
+    parser.add_argument("--json", action="store_true", help="print the results as json")
+    parser.add_argument("--list", action="store_true", help="only list the layer groups")
+    args = parser.parse_args(argv)
+
+    try:
+        with PsdFile(args.psd) as psd:
+            available = psd.Groups()
+    except (PsdError, IOError, OSError) as e:
+        sys.stderr.write("%s\n" % e)
+        return 1
+    if args.list:
+        sys.stdout.write("\n".join(available) + "\n")
+        return 0
+    start = time.time()
+    try:
+        results = ExtractGroups(args.psd, args.groups or available, args.out or os.path.dirname(os.path.abspath(args.psd)),
+                                args.size, args.jobs, args.icon_name, args.icon_files)
+    except ValueError as e:
+        sys.stderr.write("%s\n" % e)
+        return 2
+    if args.json:
+        sys.stdout.write(json.dumps({"results": results, "seconds": time.time() - start}, indent=1) + "\n")
+    else:
+        for result in results:
+            sys.stdout.write("%-24s %7.3fs  %s\n" % (result["group"], result["seconds"], result["error"] or result["file"]))
+        sys.stdout.write("%d groups in %.3fs with %d processes\n" % (len(results), time.time() - start, args.jobs))
+    return 1 if any([result["error"] for result in results]) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
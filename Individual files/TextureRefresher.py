@@ -6,22 +6,63 @@ node network:
 1. create an unknown node with name "nyTR"
 2. add a "message" data-type attribute with name "psd"
 3. create a psd node and connect <psd_node>.mesage to nyTR.psd
+thumbnails are cached under images/, named after their layer in a safe file name alphabet (PsdReader.IconFiles). Refresh only exports the icons whose psd file (path, modified time, size) or layer changed,
+and deletes the icons of layers that are no longer listed in @layerNames
+icons are rendered by PsdReader in a separate python (mayapy), a process per layer group. psdExport is only used for the
+layers PsdReader can't read, or when there is no python to run it
+the layer groups are read from the psd itself (@layerNames is only the fallback). the grid shows a page of PAGE_SIZE buttons,
+the icons of a page are exported when it is shown and the last ICON_LRU_SIZE of them are kept ready, so opening the window
+costs the same for any number of layers
 USAGE:
-1) Execute this script in Maya's Script Editor
-2) It should open "Unity Exporter" window
+1) Put the folder of this script on sys.path (a Maya scripts folder, or sys.path.append), it imports Profiler and PsdReader from it
+2) Execute this script in Maya's Script Editor
+3) It should open "Unity Exporter" window
 '''
 import maya.cmds as cmds
 import logging
 import functools
+import collections
+import json
+import os
+import subprocess
+import sys
+
+import Profiler
+import PsdReader
 
 log = logging.getLogger("TF_LOG")
+#timings and counts of every Refresh and page, written as json reports (see Profiler)
+profile = Profiler.GetProfile("TextureRefresher", log)
 
 btnSetup = None
-#group names in the psd file
+#group names in the psd file. replaced by the groups found in the psd
+DEFAULT_LAYER_NAMES = ["splatter1", "splatter2", "splatter3", "splatter4", "splatter5"]
 layerNames = ["splatter1", "splatter2", "splatter3", "splatter4", "splatter5"]
 nyTR = None
-imageExt = "tif"
+imageExt = "png"
+#icon file of a layer, %s being the layer name in a safe file name alphabet. the names PsdReader writes for --groups
+ICON_NAME = "%sIcon." + imageExt
+#largest side of an icon, about the width of a button of the grid
+ICON_SIZE = 160
+#python that runs PsdReader. mayapy next to the running Maya, unless TEXTURE_REFRESHER_PYTHON points somewhere else
+PYTHON = os.environ.get("TEXTURE_REFRESHER_PYTHON") or \
+         os.path.join(os.path.dirname(sys.executable), "mayapy.exe" if os.name == "nt" else "mayapy")
+#PsdReader.py run by PYTHON. found next to the imported PsdReader module unless TEXTURE_REFRESHER_PSD_READER is set (see _PsdReaderPath)
+PSD_READER = os.environ.get("TEXTURE_REFRESHER_PSD_READER")
 psdNode = None
+#remembers which psd and layer every icon under images/ was exported from
+ICON_CACHE = ".textureRefresherIcons.json"
+#buttons in one page of the grid
+PAGE_SIZE = 6
+#icons known to be up to date, least recently shown first
+ICON_LRU_SIZE = 64
+_iconLru = collections.OrderedDict()
+_psdFile = None
+_iconPath = None
+#icon file of every layer of @layerNames
+_iconFiles = {}
+_page = 0
+_gridUI = {}
 
 #Create a startup UI if needed
 def UI(): 
@@ -49,15 +90,24 @@ def SetupNetwork(*args):
                 print(cmds.getAttr(psdNode + ".fileTextureName"))
             psdFile = cmds.getAttr(psdNode + ".fileTextureName")
             cmds.setAttr(psdNode + ".fileTextureName", psdFile, type="string")
-            #create thumbnails using psdExport
-            path = cmds.workspace(q=True, rd=True) + "images/"
+            #find the layer groups, their icons are created page by page
+            global layerNames, _psdFile, _iconPath, _iconFiles
+            _psdFile = psdFile
+            _iconPath = cmds.workspace(q=True, rd=True) + "images/"
+            profile.Reset()
+            with profile.Timer("discover layers"):
+                layerNames = DiscoverLayers(psdFile)
+            _iconFiles = PsdReader.IconFiles(layerNames, ICON_NAME)
+            profile.Count("layers found", len(layerNames))
+            _iconLru.clear()
+            #evict the icons of layers that went away
             try:
-                for layer in layerNames:
-                    cmds.psdExport(ifn = psdFile, ofn=(path+layer+"Icon."+imageExt), lsn=layer, format=imageExt, bpc=0)
+                with profile.Timer("evict icons"):
+                    RefreshIcons(psdFile, _iconPath, layerNames, only=[])
             except Exception as e:
-                cmds.confirmDialog( title='Thumbnail Generation Exception', message='An Exception has been caught. \n %s ' % e.message, button=['OK'], defaultButton='OK', icn="critical" )
+                cmds.confirmDialog( title='Thumbnail Generation Exception', message='An Exception has been caught. \n %s ' % e, button=['OK'], defaultButton='OK', icn="critical" )
 
-            #generate UI based on the textures created 
+            #generate UI, it creates the textures of the first page
             GenerateTextureUI()
 
     else:
@@ -66,6 +116,117 @@ def SetupNetwork(*args):
 
     pass
 
+ #exports the icons of @layers from @psdFile into @path, skipping the ones that are up to date. returns the exported layers
+def RefreshIcons(psdFile, path, layers, force=False, only=None):
+    """
+        An icon is up to date when it exists and was exported from the same psd path, modified time and size, for the same layer.
+        Icons this tool exported for layers that are no longer in @layers are deleted. @only limits the export to some of @layers
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    stat = os.stat(psdFile)
+    psdKey = {"psd": os.path.normcase(os.path.abspath(psdFile)), "mtime": stat.st_mtime, "size": stat.st_size}
+    cache = _ReadIconCache(path)
+    exported = []
+    files = PsdReader.IconFiles(layers, ICON_NAME)
+    #evict the icons of layers that went away
+    icons = set(files.values())
+    for icon in [icon for icon in cache if icon not in icons]:
+        #only plain file names are deleted, older versions could write a layer name with a path in it
+        if _IsFileName(icon) and os.path.exists(path + icon):
+            os.remove(path + icon)
+        del cache[icon]
+    stale = [layer for layer in (layers if only is None else only) if layer in files and
+             (force or cache.get(files[layer]) != dict(psdKey, layer=layer) or not os.path.exists(path + files[layer]))]
+    try:
+        with profile.Timer("PsdReader"):
+            failed = _ExtractIcons(psdFile, path, stale, files) if stale else []
+        for layer in stale:
+            icon = files[layer]
+            if layer in failed:
+                with profile.Timer("psdExport"):
+                    cmds.psdExport(ifn = psdFile, ofn=(path + icon), lsn=layer, format=imageExt, bpc=0)
+            cache[icon] = dict(psdKey, layer=layer)
+            exported.append(layer)
+    finally:
+        #keep the icons exported so far, even when a layer fails
+        _WriteIconCache(path, cache)
+    log.info("%d of %d icons exported" % (len(exported), len(layers)))
+    return exported
+
+#renders the icons of @layers with PsdReader, all groups in parallel. returns the layers it couldn't render
+def _ExtractIcons(psdFile, path, layers, files):
+    psdReader = _PsdReaderPath()
+    if not os.path.exists(PYTHON) or not psdReader or not os.path.exists(psdReader):
+        return list(layers)
+    command = [PYTHON, psdReader, psdFile, "--groups"] + list(layers) + ["--icon-files"] + [files[layer] for layer in layers] + \
+              ["--out", path, "--size", str(ICON_SIZE), "--json"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    try:
+        results = json.loads(out.decode("utf-8"))["results"]
+    except (ValueError, KeyError):
+        log.warning("PsdReader failed, using psdExport: %s" % err.decode("utf-8", "replace").strip())
+        return list(layers)
+    for result in results:
+        if result["error"]:
+            log.warning("PsdReader can't render %s, using psdExport: %s" % (result["group"], result["error"]))
+    return [result["group"] for result in results if result["error"]]
+
+def _IsFileName(name):
+    return name not in ("", ".", "..") and "/" not in name and "\\" not in name
+
+#gets the PsdReader.py script next to the imported module. a script pasted into the Script Editor has no __file__ of its own
+def _PsdReaderPath():
+    if PSD_READER:
+        return PSD_READER
+    return os.path.splitext(os.path.abspath(PsdReader.__file__))[0] + ".py"
+
+def _ReadIconCache(path):
+    try:
+        with open(path + ICON_CACHE, "r") as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+def _WriteIconCache(path, cache):
+    with open(path + ICON_CACHE + ".tmp", "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    if os.path.exists(path + ICON_CACHE):
+        os.remove(path + ICON_CACHE)
+    os.rename(path + ICON_CACHE + ".tmp", path + ICON_CACHE)
+
+#gets the layer groups of @psdFile, or DEFAULT_LAYER_NAMES when it can't be read
+def DiscoverLayers(psdFile):
+    try:
+        with PsdReader.PsdFile(psdFile) as psd:
+            groups = psd.Groups()
+    except (PsdReader.PsdError, IOError, OSError) as e:
+        log.warning("Can't read the layer groups of %s: %s" % (psdFile, e))
+        return list(DEFAULT_LAYER_NAMES)
+    log.info("%d layer groups in %s" % (len(groups), psdFile))
+    return groups or list(DEFAULT_LAYER_NAMES)
+
+#gets the icon files of @layers, exporting the ones that aren't up to date yet
+def _PageIcons(layers):
+    missing = [layer for layer in layers if layer not in _iconLru]
+    if missing:
+        try:
+            with profile.Timer("refresh icons"):
+                exported = RefreshIcons(_psdFile, _iconPath, layerNames, only=missing)
+            profile.Count("layers rendered", len(exported))
+            profile.Count("icons up to date", len(missing) - len(exported))
+        except Exception as e:
+            cmds.confirmDialog( title='Thumbnail Generation Exception', message='An Exception has been caught. \n %s ' % e, button=['OK'], defaultButton='OK', icn="critical" )
+            return [_iconPath + _iconFiles[layer] for layer in layers]
+    for layer in layers:
+        #(re)insert at the most recently shown end
+        _iconLru.pop(layer, None)
+        _iconLru[layer] = _iconPath + _iconFiles[layer]
+    while len(_iconLru) > ICON_LRU_SIZE:
+        _iconLru.popitem(last=False)
+    return [_iconLru[layer] for layer in layers]
+
  #Generates textures automatically needed to display for the UI
 def GenerateTextureUI(*args):
     log.info("@ui")
@@ -74,24 +235,48 @@ def GenerateTextureUI(*args):
     if cmds.window(win, exists=True):
         cmds.deleteUI(win, window=True)
 
-    win = cmds.window(win, title="Texture Refresher", wh=(545, 350), sizeable=False, mxb=False)
+    win = cmds.window(win, title="Texture Refresher", wh=(545, 420), sizeable=False, mxb=False)
     _mainForm = cmds.formLayout("mainForm", nd=100)
     width = (545 /3) - 15
     cmds.rowColumnLayout( numberOfColumns=3, columnWidth=[(1, width), (2, width), (3, width)])
-    #get path from current Directory
-    path = cmds.workspace(q=True, rd=True) + "images/"
-    #create image buttons using icons exported from @psdFile
-    for i in range(0, len(layerNames)):
-        cmds.symbolButton(image=(path + layerNames[i] + "Icon." + imageExt), w=width, h=width, c=functools.partial(SetLayerForPSD, i), ann="Swap Texture with Blood_Splatter %s" % str(i+1))
+    #create a page of image buttons, ShowPage puts the icons exported from @psdFile on them
+    _gridUI["buttons"] = [cmds.symbolButton(w=width, h=width) for i in range(PAGE_SIZE)]
+    #page through the layers
+    _gridUI["prev"] = cmds.button(l="<<", c=lambda *args: ShowPage(_page - 1), ann="Previous page")
+    _gridUI["page"] = cmds.text(l="")
+    _gridUI["next"] = cmds.button(l=">>", c=lambda *args: ShowPage(_page + 1), ann="Next page")
 
     #create a button to refresh thumbnails
     cmds.button(l="Refresh", c=SetupNetwork, bgc=(0.2,0.0,0), ebg=True, ann="Refresh Thumbnails")
 
-
+    ShowPage(0)
     cmds.showWindow(win)
-    cmds.window(win, edit=True, wh=(545, 350))
+    cmds.window(win, edit=True, wh=(545, 420))
     pass
 
+#shows the icons of page @page on the grid buttons
+def ShowPage(page, *args):
+    _FillPage(page)
+    #a Refresh or a page flip ends here
+    profile.Save()
+
+@profile.Timed("show page")
+def _FillPage(page):
+    global _page
+    pages = max(1, (len(layerNames) + PAGE_SIZE - 1) // PAGE_SIZE)
+    _page = max(0, min(page, pages - 1))
+    first = _page * PAGE_SIZE
+    layers = layerNames[first:first + PAGE_SIZE]
+    icons = _PageIcons(layers)
+    for i, button in enumerate(_gridUI["buttons"]):
+        if i < len(layers):
+            cmds.symbolButton(button, e=True, visible=True, image=icons[i], c=functools.partial(SetLayerForPSD, first + i), ann="Swap Texture with %s" % layers[i])
+        else:
+            cmds.symbolButton(button, e=True, visible=False)
+    cmds.text(_gridUI["page"], e=True, l="%d / %d" % (_page + 1, pages))
+    cmds.button(_gridUI["prev"], e=True, en=_page > 0)
+    cmds.button(_gridUI["next"], e=True, en=_page < pages - 1)
+
 #Select Layers from psd based on the user selection
 def SetLayerForPSD(id, *args):
     #extra check if the @psdNode exists or not. this is check is - when you open the scene and tool, and close the scene
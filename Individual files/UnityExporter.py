@@ -6,16 +6,28 @@ Exports assets directly to selected Unity Project
 valid Assets = models
  
 USAGE:
-1) Execute this script in Maya's Script Editor
-2) It should open "Unity Exporter" window
+1) Put the folder of this script on sys.path (a Maya scripts folder, or sys.path.append), it imports ExportQueue,
+   ExportFarm and Profiler from it
+2) Execute this script in Maya's Script Editor
+3) It should open "Unity Exporter" window
+
+Batch Manifest exports many asset groups at once and skips the unchanged ones (see ExportQueue)
+an existing FBX is only overwritten when the new export differs from it, so Unity only reimports changed assets
+Export in Background runs the exports in headless Maya processes and keeps this session free (see ExportFarm).
+the background workers export the scene as it is saved on disk
 '''
 
 import maya.cmds as cmds
 import functools
 import logging
 import maya.mel as mel
+import ExportQueue
+import ExportFarm
+import Profiler
 
 log = logging.getLogger("UnityExporterLog")
+#timings and counts of every Export/Apply, written as json reports (see Profiler)
+profile = Profiler.GetProfile("UnityExporter", log)
 
 # global variables that can be used by other tools
 WINDOW_UI = "unityExporter"
@@ -32,7 +44,9 @@ _ToolUI = {}
 _uiValues = {}
 
 _path = ""
+_projectPath = ""
 _assets = {"normal":"","low" : ""}
+_farm = None
 
 #Common UI can be used for any other tool
 def UI():
@@ -147,13 +161,28 @@ def ToolOptions():
     cmds.rowLayout(nc=2)
     _ToolUI["txt_lowAssets"] = cmds.textField(w = SIZE[0]/2, editable=False, text="Select Assets which are in Low version", ann="this field is not writable")
     _ToolUI["btn_lowAssets"] = cmds.button(l="  <<  ", c=functools.partial(_GetAssets,True), ann="Link your selection here")
+    cmds.setParent('..')
+    #select a batch manifest
+    cmds.text(l="Batch Manifest:")
+    cmds.rowLayout(nc=3)
+    _ToolUI["txt_manifest"] = cmds.textField(w = SIZE[0]/2, editable=False, text="Select a manifest of asset groups", ann="this field is not writable")
+    _ToolUI["btn_manifest"] = cmds.button(l="  ..  ", c=_GetManifest, ann="Select a json manifest of asset groups")
+    _ToolUI["btn_exportManifest"] = cmds.button(l="Export All", c=ExportManifest, ann="Export every group of the manifest. Unchanged assets are skipped")
+    cmds.setParent('..')
+    #export in background processes
+    cmds.text(l="Export in Background:")
+    cmds.rowLayout(nc=3)
+    _ToolUI["chk_background"] = cmds.checkBox(l="", v=False, ann="Export in headless Maya processes from the saved scene, without blocking this session")
+    cmds.text(l="Workers:")
+    _ToolUI["int_workers"] = cmds.intField(v=ExportFarm.WORKERS, min=1, max=16, w=40, ann="Number of headless Maya processes")
 
 
 # Get a Valid Unity Project Directory
 def _GetUnityPath(*args):
-    global _ToolUI, _path
+    global _ToolUI, _path, _projectPath
     #Show the Dialog window with Directory selection
     _path = cmds.fileDialog2(fm=3, okc = "Select", cap="select Unity Project")
+    _projectPath = ""
     #Check if the Directory contains "Assets" and "Project Settings" as sub-folders
     if _path:
         _path = _path[0]
@@ -162,6 +191,7 @@ def _GetUnityPath(*args):
         #display the path to the user if the directory is valid
         if(file1Exists and file2Exists):
             cmds.textField(_ToolUI["txt_unityLocation"], e=True, text=_path, ebg=True, bgc=[0, .2, 0])
+            _projectPath = _path
             _path=_path + "/Assets/"+ cmds.textField(_ToolUI["txt_folderName"], q=True, text=True) 
         else:
             #display warning to if the directory is not valid
@@ -220,48 +250,20 @@ def _ExportAsFBX(assets, isUnity=False, postfix="", *args):
         if not assetName:
             log.warning("Asset Name is empty")
             return
-        #load fbx pluginif it is not loaded
-        if not cmds.pluginInfo("fbxmaya", q=True, l=True):
-            cmds.loadPlugin("fbxmaya")
-        #set FBXExport options
-        mel.eval("FBXExportSmoothingGroups -v true")
-        mel.eval("FBXExportHardEdges -v false")
-        mel.eval("FBXExportTangents -v false")
-        mel.eval("FBXExportSmoothMesh -v true")
-        mel.eval("FBXExportInstances -v false")
-        mel.eval("FBXExportReferencedContainersContent -v false")
-        # Animation
-        mel.eval("FBXExportAnimationOnly -v false")
-        #mel.eval("FBXExportBakeComplexAnimation -v false")
-        #mel.eval("FBXExportBakeComplexStart -v 0")
-        #mel.eval("FBXExportBakeComplexEnd -v 24")
-        #mel.eval("FBXExportBakeComplexStep -v 1")
-        #mm.eval("FBXExportBakeResampleAll -v true")
-        mel.eval("FBXExportUseSceneName -v false")
-        mel.eval("FBXExportQuaternion -v euler")
-        mel.eval("FBXExportShapes -v true")
-        mel.eval("FBXExportSkins -v true")
-        # Constraints
-        mel.eval("FBXExportConstraints -v false")
-        # Cameras
-        mel.eval("FBXExportCameras -v false")
-        # Lights
-        mel.eval("FBXExportLights -v false")
-        # Embed Media
-        mel.eval("FBXExportEmbeddedTextures -v false")
-        # Connections
-        mel.eval("FBXExportInputConnections -v false")
-        # Axis Conversion
-        mel.eval("FBXExportUpAxis y")
         #mel.eval('FBXExport -f "%s" -s' % (path + "/" + folder + "/" + assetName + ".fbx"))
         # catch any exceptions during the process
         try:
             #make a string with all the attributes
             file = (_path + "/" + folder + "/" + assetName + postfix + ".fbx")
-            #export the assets
-            mel.eval('FBXExport -f "%s" -s' % file)
-            #display where the file is exported
-            log.info ("file " + cmds.file(file, q=True, loc=True)  + " exported" )
+            #export the assets. the file is only replaced when the export changed it, so Unity doesn't reimport it
+            with profile.Timer("export fbx"):
+                status, reason = ExportQueue.ExportQueue(_projectPath).ExportFile(file, assets)
+            profile.Count("files exported" if status == "exported" else "files skipped")
+            #display where the file is exported, or why it is skipped
+            if status == "skipped":
+                log.info ("file " + file + " skipped, " + reason)
+            else:
+                log.info ("file " + cmds.file(file, q=True, loc=True)  + " exported" )
         except Exception as e:
             #display any exception that occurs during the process
             cmds.confirmDialog( title='FBX export Exception', message='The export failed due to %s' % e.message, button=['OK'], defaultButton='OK', icn="critical" )
@@ -269,6 +271,79 @@ def _ExportAsFBX(assets, isUnity=False, postfix="", *args):
         log.warning("Unity Project Directory not selected")
     pass
 
+#Get a manifest of asset groups to export in one go
+def _GetManifest(*args):
+    global _ToolUI, _uiValues
+    manifest = cmds.fileDialog2(fm=1, okc="Select", cap="select Batch Manifest", ff="Manifest (*.json)")
+    if manifest:
+        _uiValues["manifest"] = manifest[0]
+        cmds.textField(_ToolUI["txt_manifest"], e=True, text=manifest[0], ebg=True, bgc=[0, .2, 0])
+    log.info(manifest)
+
+#export every asset group of the selected manifest. assets that haven't changed since their last export are skipped
+def ExportManifest(*args):
+    if not _projectPath:
+        log.warning("Unity Project Directory not selected")
+        return
+    if not _uiValues.get("manifest"):
+        log.warning("Batch Manifest not selected")
+        return
+    queue = ExportQueue.ExportQueue(_projectPath)
+    queue.AddManifest(_uiValues["manifest"])
+    if cmds.checkBox(_ToolUI["chk_background"], q=True, v=True):
+        _SubmitToFarm([{"name": name, "folder": folder, "assets": assets} for name, folder, assets in queue.jobs])
+        return
+    profile.Reset()
+    with profile.Timer("export manifest"):
+        results = queue.Run()
+    profile.Save()
+    failed = [r["name"] for r in results if r["status"] == "failed"]
+    if failed:
+        cmds.confirmDialog( title='FBX export Exception', message='The export failed for %s' % ", ".join(failed), button=['OK'], defaultButton='OK', icn="critical" )
+    return results
+
+#export @jobs in the background export farm. the scene has to be saved, the workers load it from disk
+def _SubmitToFarm(jobs):
+    global _farm
+    if not jobs:
+        log.warning("Nothing to export")
+        return
+    if _farm and _farm.IsRunning():
+        log.warning("Background exports are still running")
+        return
+    scene = cmds.file(q=True, sceneName=True)
+    if not scene:
+        log.warning("Save the scene before exporting in background")
+        return
+    if cmds.file(q=True, modified=True):
+        answer = cmds.confirmDialog( title='Export in Background', message='The background export uses the saved scene. Save it now?', button=['Save','Cancel'], defaultButton='Save', cancelButton='Cancel', dismissString='Cancel' )
+        if answer != 'Save':
+            return
+        cmds.file(save=True)
+    _farm = ExportFarm.ExportFarm(workers=cmds.intField(_ToolUI["int_workers"], q=True, v=True))
+    profile.Reset()
+    _farm.Submit(scene, _projectPath, jobs, onFinished=_FarmFinished, onWorkerFinished=_FarmWorkerFinished)
+
+#a background worker finished its jobs
+def _FarmWorkerFinished(results, seconds, error):
+    for result in results:
+        log.info("%s %s in %.1fs" % (result["file"], result["status"], result.get("seconds") or 0))
+    log.info("worker finished in %.1fs" % seconds)
+    profile.AddTime("background worker", seconds)
+
+#every background export finished
+def _FarmFinished(results):
+    exported = len([r for r in results if r["status"] == "exported"])
+    skipped = len([r for r in results if r["status"] == "skipped"])
+    failed = ["%s (%s)" % (r["name"], r["error"]) for r in results if r["status"] == "failed"]
+    profile.Count("files exported", exported)
+    profile.Count("files skipped", skipped)
+    profile.Count("files failed", len(failed))
+    profile.Save()
+    log.info("Background export done. Exported %d, skipped %d unchanged, %d failed" % (exported, skipped, len(failed)))
+    if failed:
+        cmds.confirmDialog( title='FBX export Exception', message='The export failed for %s' % "\n".join(failed), button=['OK'], defaultButton='OK', icn="critical" )
+
 #checking for the selected assets existence before the export starts. a safe check
 def _objExists(sel):
     if not sel:
@@ -284,6 +359,26 @@ def ApplyTool(*args):
         PlaceHolder method that can be used by nyTool
     """
     global _assets
+    #hand the exports over to the background workers
+    if cmds.checkBox(_ToolUI["chk_background"], q=True, v=True):
+        if not _projectPath:
+            log.warning("Unity Project Directory not selected")
+            return
+        folder = cmds.textField(_ToolUI["txt_folderName"], q=True, text=True)
+        assetName = cmds.textField(_ToolUI["txt_assetName"], q=True, text=True)
+        if not assetName:
+            log.warning("Asset Name is empty")
+            return
+        jobs = []
+        for key, postfix in (("normal", ""), ("low", "_low")):
+            if _assets[key] and _objExists(_assets[key]):
+                jobs.append({"name": assetName, "postfix": postfix, "folder": folder, "assets": _assets[key]})
+            else:
+                log.warning("%s Assets not selected or missing" % key)
+        _SubmitToFarm(jobs)
+        return
+    #one profile report per Apply
+    profile.Reset()
     #check for the normal assets and export them individually
     if not _assets["normal"]:
         log.warning("Normal Assets not selected")
@@ -300,6 +395,7 @@ def ApplyTool(*args):
             _ExportAsFBX(_assets["low"], isUnity = False, postfix="_low")
         else:
             log.error("One or more objects in Low Version Assets doesn't exist")
+    profile.Save()
 
 #close the tool window
 def CloseTool(*args):
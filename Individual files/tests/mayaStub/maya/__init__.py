@@ -0,0 +1,7 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Stub of the maya package, so the UnityExporter tools run headless in tests. Put tests/mayaStub on sys.path
+(or PYTHONPATH of a stub worker) before importing them.
+
+cmds holds an in-memory scene, mel records what it evaluates and writes a fake FBX for FBXExport
+'''
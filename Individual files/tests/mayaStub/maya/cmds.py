@@ -0,0 +1,209 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Stub of maya.cmds with an in-memory scene, for headless tests. Only the calls the UnityExporter tools make are stubbed.
+
+the scene is a dict of nodes by name, dag nodes have long names starting with "|":
+{"|crate|crateShape": {"type": "mesh", "attrs": {"displayColors": false}, "keyable": ["visibility"],
+                       "data": {"faces": [..], "edges": [..], "points": [..], "normals": [..], "uvs": [..]},
+                       "inputs": {"inMesh": "skinCluster1.outputGeometry[0]"}}}
+@attrs are what getAttr reads, multi attributes are dicts by index. @data is what the geometry queries (xform, polyInfo..)
+return and @inputs are the incoming connections by attribute. file(path, open=True) loads a scene saved with SaveScene
+'''
+
+import copy
+import io
+import json
+
+_scene = {}
+_selection = []
+_plugins = set()
+_scenePath = None
+
+
+#replaces the scene with @nodes
+def SetScene(nodes):
+    global _scenePath
+    _scene.clear()
+    _scene.update(copy.deepcopy(nodes))
+    del _selection[:]
+    _scenePath = None
+
+
+#the node dict of @name, to edit the scene from a test
+def Node(name):
+    return _scene[name]
+
+
+#writes the scene as json, to be opened with file(path, open=True)
+def SaveScene(path):
+    with open(path, "w") as f:
+        json.dump(_scene, f, indent=1, sort_keys=True)
+
+
+def file(path=None, open=False, force=False, q=False, sceneName=False, **kwargs):
+    global _scenePath
+    if q:
+        return _scenePath
+    if open:
+        #io.open, the open flag hides the builtin
+        with io.open(path, "r") as f:
+            SetScene(json.load(f))
+        _scenePath = path
+    return _scenePath
+
+
+def pluginInfo(name, q=False, l=False, loaded=False):
+    return name in _plugins
+
+
+def loadPlugin(name):
+    _plugins.add(name)
+
+
+def objExists(name):
+    return _NodeName(name) in _scene
+
+
+def select(objects=None, clear=False, **kwargs):
+    del _selection[:]
+    if objects and not clear:
+        _selection.extend(_List(objects))
+
+
+def ls(objects=None, dag=False, long=False, selection=False, **kwargs):
+    if selection:
+        objects = list(_selection)
+    if objects is None:
+        return sorted(_scene)
+    names = []
+    for name in _List(objects):
+        if dag:
+            names.extend([node for node in sorted(_scene) if node == name or node.startswith(name + "|")])
+        elif name in _scene:
+            names.append(name)
+    return names
+
+
+def nodeType(node):
+    return _scene[_NodeName(node)]["type"]
+
+
+def xform(target, q=False, matrix=False, translation=False, objectSpace=False, **kwargs):
+    data = _scene[_NodeName(target)].get("data", {})
+    if ".vtx[" in target:
+        return data.get("points")
+    return data.get("matrix", [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0])
+
+
+def listAttr(node, keyable=False, settable=False, multi=False, **kwargs):
+    node = _scene[_NodeName(node)]
+    if keyable:
+        return list(node.get("keyable", []))
+    return sorted(node.get("attrs", {}))
+
+
+def getAttr(plug, multiIndices=False, **kwargs):
+    name, attr = plug.split(".", 1)
+    attrs = _scene[name].get("attrs", {})
+    value = attrs.get(attr)
+    if multiIndices:
+        if isinstance(value, dict):
+            return sorted([int(index) for index in value])
+        #elements of a multi of compounds, weightList[0].weights..
+        prefix = attr + "["
+        return sorted(set([int(key[len(prefix):key.index("]")]) for key in attrs if key.startswith(prefix)])) or None
+    if attr not in attrs:
+        raise ValueError("No object matches name: %s" % plug)
+    if isinstance(value, dict):
+        return [value[index] for index in sorted(value, key=int)]
+    return value
+
+
+def setAttr(plug, value, **kwargs):
+    name, attr = plug.split(".", 1)
+    _scene[name].setdefault("attrs", {})[attr] = value
+
+
+def polyInfo(node, faceToVertex=False, edgeToVertex=False, **kwargs):
+    data = _scene[_NodeName(node)].get("data", {})
+    return data.get("faces") if faceToVertex else data.get("edges")
+
+
+def polyEditUV(target, q=False, **kwargs):
+    return _scene[_NodeName(target)].get("data", {}).get("uvs")
+
+
+def polyNormalPerVertex(target, q=False, xyz=False, **kwargs):
+    return _scene[_NodeName(target)].get("data", {}).get("normals")
+
+
+def skinCluster(node, q=False, influence=False, **kwargs):
+    return _scene[node].get("data", {}).get("influences")
+
+
+#keys of an animation curve as [time, value, time, value..]
+def keyframe(curve, q=False, timeChange=False, valueChange=False, **kwargs):
+    return [number for key in _scene[curve].get("data", {}).get("keys", []) for number in key]
+
+
+def keyTangent(curve, q=False, **kwargs):
+    return _scene[curve].get("data", {}).get("tangents")
+
+
+def listConnections(nodes, type=None, source=True, destination=True, connections=False, plugs=False, **kwargs):
+    """
+        @nodes are nodes or plugs. with @connections the result is [plug of @nodes, plug at the other end, ..].
+        @type matches a node type and the types derived from it, like maya: animCurve matches animCurveTL
+    """
+    result = []
+    for item in _List(nodes):
+        name, _, attr = item.partition(".")
+        if source:
+            for inputAttr, sourcePlug in sorted(_scene[name].get("inputs", {}).items()):
+                sourceName = sourcePlug.split(".")[0]
+                if (attr and inputAttr != attr) or not _IsType(sourceName, type):
+                    continue
+                if connections:
+                    result.extend(["%s.%s" % (name, inputAttr), sourcePlug])
+                else:
+                    result.append(sourcePlug if plugs else sourceName)
+        if destination:
+            for other in sorted(_scene):
+                for inputAttr, sourcePlug in sorted(_scene[other].get("inputs", {}).items()):
+                    sourceName, _, sourceAttr = sourcePlug.partition(".")
+                    if sourceName != name or (attr and sourceAttr != attr) or not _IsType(other, type):
+                        continue
+                    if connections:
+                        result.extend([sourcePlug, "%s.%s" % (other, inputAttr)])
+                    else:
+                        result.append("%s.%s" % (other, inputAttr) if plugs else other)
+    return result or None
+
+
+#@nodes and every node upstream of them. history stops at dag nodes other than @nodes
+def listHistory(nodes, pruneDagObjects=False, **kwargs):
+    start = _List(nodes)
+    found = []
+    pending = list(start)
+    while pending:
+        name = pending.pop(0)
+        if name in found:
+            continue
+        found.append(name)
+        if name.startswith("|") and name not in start:
+            continue
+        pending.extend([plug.split(".")[0] for _, plug in sorted(_scene[name].get("inputs", {}).items())])
+    return [name for name in found if not (pruneDagObjects and name.startswith("|"))]
+
+
+def _NodeName(target):
+    return target.split(".")[0]
+
+
+def _List(items):
+    return list(items) if isinstance(items, (list, tuple, set)) else [items]
+
+
+def _IsType(name, nodeType):
+    return nodeType is None or _scene[name]["type"].startswith(nodeType)
+
@@ -0,0 +1,137 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Stub of maya.mel for headless tests. Records every command and writes a fake FBX for FBXExport.
+
+the fake FBX holds the dag nodes of the selection, so edits of their history or materials export the same file, and any
+edit of the dag nodes a different one. like the FBX exporter it also writes what differs in every file: the export time
+(CreationTimeStamp, CreationTime, DateTime_GMT), a random FileId and the path it was exported to (DocumentUrl,
+SrcDocumentUrl, Original|FileName). binary, the default of the exporter, or ascii after "FBXExportInAscii -v true"
+'''
+
+import json
+import os
+import re
+import struct
+import time
+
+from maya import cmds
+
+#every command evaluated, in order
+calls = []
+#set by FBXExportInAscii
+ascii = False
+
+_EXPORT = re.compile(r'^FBXExport -f "(?P<path>[^"]+)"')
+_ASCII = re.compile(r'^FBXExportInAscii -v (?P<value>true|false)')
+_VERSION = 7400
+_CREATOR = "FBX SDK/FBX Plugins version 2020.2"
+
+
+def eval(command):
+    global ascii
+    calls.append(command)
+    match = _EXPORT.match(command)
+    if match:
+        _WriteFbx(match.group("path"))
+    match = _ASCII.match(command)
+    if match:
+        ascii = match.group("value") == "true"
+
+
+def _WriteFbx(path):
+    nodes = dict([(node, cmds.Node(node)) for node in cmds.ls(cmds.ls(selection=True), dag=True, long=True)])
+    now = time.time()
+    local = time.localtime(now)
+    millisecond = int(now % 1 * 1000)
+    header = {"stamp": [local.tm_year, local.tm_mon, local.tm_mday, local.tm_hour, local.tm_min, local.tm_sec, millisecond],
+              "creationTime": "%s:%03d" % (time.strftime("%Y-%m-%d %H:%M:%S", local), millisecond),
+              "gmt": "%s.%03d" % (time.strftime("%d/%m/%Y %H:%M:%S", time.gmtime(now)), millisecond),
+              "fileId": os.urandom(16), "url": path, "content": json.dumps(nodes, sort_keys=True)}
+    with open(path, "wb") as f:
+        f.write(_Ascii(header) if ascii else _Binary(header))
+
+
+#(name, type, label, flags, value) of the SceneInfo properties
+def _SceneProperties(header):
+    return [("DocumentUrl", "KString", "Url", "", header["url"]),
+            ("SrcDocumentUrl", "KString", "Url", "", header["url"]),
+            ("Original|ApplicationVendor", "KString", "", "", "Autodesk"),
+            ("Original|FileName", "KString", "", "", header["url"]),
+            ("Original|DateTime_GMT", "DateTime", "", "", header["gmt"]),
+            ("LastSaved|ApplicationVendor", "KString", "", "", "Autodesk"),
+            ("LastSaved|DateTime_GMT", "DateTime", "", "", header["gmt"])]
+
+
+def _Ascii(header):
+    names = ("Year", "Month", "Day", "Hour", "Minute", "Second", "Millisecond")
+    lines = ["; FBX 7.4.0 project file", "; " + "-" * 52, "",
+             "FBXHeaderExtension:  {",
+             "\tFBXHeaderVersion: 1003",
+             "\tFBXVersion: %d" % _VERSION,
+             "\tCreationTimeStamp:  {",
+             "\t\tVersion: 1000"]
+    lines += ["\t\t%s: %d" % (name, value) for name, value in zip(names, header["stamp"])]
+    lines += ["\t}",
+              '\tCreator: "%s"' % _CREATOR,
+              '\tSceneInfo: "SceneInfo::GlobalInfo", "UserData" {',
+              '\t\tType: "UserData"',
+              "\t\tProperties70:  {"]
+    lines += ['\t\t\tP: "%s", "%s", "%s", "%s", "%s"' % prop for prop in _SceneProperties(header)]
+    lines += ["\t\t}", "\t}", "}",
+              'FileId: "%s"' % "".join(["\\x%02x" % byte for byte in bytearray(header["fileId"])]),
+              'CreationTime: "%s"' % header["creationTime"],
+              'Creator: "%s"' % _CREATOR,
+              "Objects:  {",
+              '\tUserData: "%s"' % header["content"].replace('"', "&quot;"),
+              "}", ""]
+    return "\n".join(lines).encode("utf-8")
+
+
+def _Binary(header):
+    names = ("Year", "Month", "Day", "Hour", "Minute", "Second", "Millisecond")
+    sceneInfo = ("SceneInfo", [b"GlobalInfo\x00\x01SceneInfo", b"UserData"], [
+        ("Type", [b"UserData"], []),
+        ("Properties70", [], [("P", [part.encode("utf-8") for part in prop], []) for prop in _SceneProperties(header)])])
+    nodes = [("FBXHeaderExtension", [], [
+                 ("FBXHeaderVersion", [1003], []),
+                 ("FBXVersion", [_VERSION], []),
+                 ("CreationTimeStamp", [], [("Version", [1000], [])] +
+                  [(name, [value], []) for name, value in zip(names, header["stamp"])]),
+                 ("Creator", [_CREATOR.encode("utf-8")], []),
+                 sceneInfo]),
+             ("FileId", [bytearray(header["fileId"])], []),
+             ("CreationTime", [header["creationTime"].encode("utf-8")], []),
+             ("Creator", [_CREATOR.encode("utf-8")], []),
+             ("Objects", [], [("UserData", [header["content"].encode("utf-8")], [])])]
+    data = bytearray(b"Kaydara FBX Binary  \x00\x1a\x00" + struct.pack("<I", _VERSION))
+    for node in nodes:
+        data += _BinaryNode(node, len(data))
+    #the null record that ends the top level, then the footer: an id made from the export time, padding and the version
+    data += b"\x00" * 13
+    data += os.urandom(16) + b"\x00" * 4
+    data += b"\x00" * (-len(data) % 16)
+    data += struct.pack("<I", _VERSION) + b"\x00" * 120 + b"\xf8\x5a\x8c\x6a\xde\xf5\xd9\x7e\xec\xe9\x0c\xe3\x75\x8f\x29\x0b"
+    return bytes(data)
+
+
+#a node record at @offset: end offset, property count, property bytes, name, properties, children and their null record
+def _BinaryNode(node, offset):
+    name, values, children = node
+    properties = b"".join([_BinaryProperty(value) for value in values])
+    start = offset + 13 + len(name) + len(properties)
+    nested = bytearray()
+    for child in children:
+        nested += _BinaryNode(child, start + len(nested))
+    if children:
+        nested += b"\x00" * 13
+    end = start + len(nested)
+    return (struct.pack("<III", end, len(values), len(properties)) + struct.pack("B", len(name)) + name.encode("utf-8") +
+            properties + bytes(nested))
+
+
+#ints are I, bytes are S strings and bytearrays R raw data
+def _BinaryProperty(value):
+    if isinstance(value, int):
+        return b"I" + struct.pack("<i", value)
+    kind = b"R" if isinstance(value, bytearray) else b"S"
+    return kind + struct.pack("<I", len(value)) + bytes(value)
@@ -0,0 +1,81 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Tests of ExportFarm with a stub interpreter: the workers are this python with tests/mayaStub on their PYTHONPATH.
+
+USAGE:
+python -m unittest discover -s "Individual files/tests"
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STUB = os.path.join(HERE, "mayaStub")
+sys.path.insert(0, STUB)
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ["NY_PROFILE_DIR"] = ""
+
+from maya import cmds
+import ExportFarm
+from test_ExportQueue import SCENE
+
+
+class ExportFarmTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="exportFarmTest_")
+        self.project = os.path.join(self.folder, "project")
+        self.scene = os.path.join(self.folder, "crate.json")
+        cmds.SetScene(SCENE)
+        cmds.SaveScene(self.scene)
+        self.farm = ExportFarm.ExportFarm(interpreter=sys.executable, workers=2,
+                                          env={"PYTHONPATH": STUB, "NY_PROFILE_DIR": ""})
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def Submit(self, scene, jobs):
+        finished = []
+        workers = []
+        batchFolder = self.farm.Submit(scene, self.project, jobs, onFinished=finished.append,
+                                       onWorkerFinished=lambda results, seconds, error: workers.append(error))
+        self.assertTrue(self.farm.Wait(120))
+        #kept when a worker failed
+        shutil.rmtree(batchFolder, ignore_errors=True)
+        self.assertEqual(len(finished), 1)
+        return finished[0], workers
+
+    def test_ResultsKeepTheOrderOfTheJobs(self):
+        #the same name in two folders, and a job that fails
+        jobs = [{"name": "crate", "folder": "Props", "assets": ["|crate"]},
+                {"name": "crate", "folder": "Props/Old", "assets": ["|crate"]},
+                {"name": "crate", "postfix": "_low", "folder": "Props", "assets": ["|crate"]},
+                {"name": "barrel", "folder": "Props/Old", "assets": ["|barrel"]}]
+        results, workers = self.Submit(self.scene, jobs)
+        self.assertEqual(workers, [None, None])
+        self.assertEqual([(result["file"], result["status"]) for result in results],
+                         [(self.project + "/Assets/Props/crate.fbx", "exported"),
+                          (self.project + "/Assets/Props/Old/crate.fbx", "exported"),
+                          (self.project + "/Assets/Props/crate_low.fbx", "exported"),
+                          (self.project + "/Assets/Props/Old/barrel.fbx", "failed")])
+        for result in results[:3]:
+            self.assertTrue(os.path.exists(result["file"]))
+        #a second run only finds unchanged assets
+        results, _ = self.Submit(self.scene, jobs[:3])
+        self.assertEqual([result["reason"] for result in results], ["scene unchanged"] * 3)
+
+    def test_WorkerFailureFailsItsJobs(self):
+        jobs = [{"name": "crate", "folder": "Props", "assets": ["|crate"]},
+                {"name": "crate", "folder": "Props/Old", "assets": ["|crate"]}]
+        results, workers = self.Submit(os.path.join(self.folder, "missing.json"), jobs)
+        self.assertTrue(all(workers))
+        self.assertEqual([(result["file"], result["status"]) for result in results],
+                         [(self.project + "/Assets/Props/crate.fbx", "failed"),
+                          (self.project + "/Assets/Props/Old/crate.fbx", "failed")])
+        self.assertTrue(all([result["error"] for result in results]))
+
+
+if __name__ == '__main__':
+    unittest.main()
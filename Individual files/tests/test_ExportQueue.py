@@ -0,0 +1,133 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Headless tests of ExportQueue, on the stub maya modules of tests/mayaStub.
+
+USAGE:
+python -m unittest discover -s "Individual files/tests"
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "mayaStub"))
+sys.path.insert(0, os.path.dirname(HERE))
+#profile reports are only logged
+os.environ["NY_PROFILE_DIR"] = ""
+
+from maya import cmds, mel
+import ExportQueue
+
+#a skinned, blend-shaped and animated crate with a textured material, and a locator the queue has no special case for
+SCENE = {
+    "|crate": {"type": "transform", "keyable": ["translateX", "visibility"], "attrs": {"translateX": 0.0, "visibility": True},
+               "inputs": {"translateX": "crate_translateX.output"}},
+    "crate_translateX": {"type": "animCurveTL", "attrs": {"preInfinity": 0, "postInfinity": 0, "weightedTangents": False},
+                         "data": {"keys": [[1.0, 0.0], [24.0, 5.0]], "tangents": ["auto", "auto", 0.0, 0.0, 1.0, 1.0]}},
+    "|crate|crateShape": {"type": "mesh", "keyable": [], "attrs": {},
+                          "data": {"faces": ["FACE 0: 0 1 2"], "edges": ["EDGE 0: 0 1 Soft", "EDGE 1: 1 2 Soft", "EDGE 2: 2 0 Soft"],
+                                   "points": [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0],
+                                   "normals": [0.0, 0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 0.0, 1.0],
+                                   "uvs": [0.0, 0.0, 1.0, 0.0, 0.0, 1.0]},
+                          "inputs": {"inMesh": "skinCluster1.outputGeometry[0]"}},
+    "|crate|crateLocator": {"type": "locator", "attrs": {"localScaleX": 1.0}},
+    "skinCluster1": {"type": "skinCluster", "data": {"influences": ["|root"]},
+                     "attrs": {"skinningMethod": 0, "weightList[0].weights": {"0": 1.0}, "weightList[1].weights": {"0": 1.0},
+                               "weightList[2].weights": {"0": 1.0}},
+                     "inputs": {"input[0].inputGeometry": "blendShape1.outputGeometry[0]", "matrix[0]": "|root.worldMatrix[0]"}},
+    "blendShape1": {"type": "blendShape", "attrs": {"weight[0]": 0.0,
+                    "inputTarget[0].inputTargetGroup[0].inputTargetItem[6000].inputPointsTarget": [[0.0, 0.5, 0.0]]}},
+    "|root": {"type": "joint", "keyable": ["rotateZ"], "attrs": {"rotateZ": 0.0}},
+    "crate_SG": {"type": "shadingEngine", "inputs": {"dagSetMembers[0]": "|crate|crateShape.instObjGroups[0]",
+                                                     "surfaceShader": "crate_mat.outColor"}},
+    "crate_mat": {"type": "blinn", "attrs": {"color": [[0.5, 0.5, 0.5]], "eccentricity": 0.3}, "inputs": {"color": "crate_file.outColor"}},
+    "crate_file": {"type": "file", "attrs": {"fileTextureName": "sourceimages/crate.png"}},
+}
+
+
+class ExportQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.project = tempfile.mkdtemp(prefix="exportQueueTest_")
+        cmds.SetScene(SCENE)
+        del mel.calls[:]
+        mel.ascii = False
+        ExportQueue._fbxSession = False
+
+    def tearDown(self):
+        shutil.rmtree(self.project, ignore_errors=True)
+
+    def Run(self, assets=("|crate",), force=False):
+        queue = ExportQueue.ExportQueue(self.project)
+        queue.AddGroup("crate", "Props", normal=list(assets))
+        return queue.Run(force)[0]
+
+    def test_UnchangedSceneIsSkipped(self):
+        self.assertEqual(self.Run()["status"], "exported")
+        result = self.Run()
+        self.assertEqual((result["status"], result["reason"]), ("skipped", "scene unchanged"))
+        self.assertEqual(self.Run(force=True)["reason"], "file unchanged")
+
+    def test_OptionsAreSetOncePerSession(self):
+        self.Run()
+        self.Run()
+        self.assertEqual([call for call in mel.calls if call in ExportQueue.FBX_OPTIONS], ExportQueue.FBX_OPTIONS)
+
+    def test_EditsAreExportedAgain(self):
+        def SetEdge():
+            cmds.Node("|crate|crateShape")["data"]["edges"][0] = "EDGE 0: 0 1 Hard"
+
+        def SetNormal():
+            cmds.Node("|crate|crateShape")["data"]["normals"][2] = 0.5
+
+        def SetKey():
+            cmds.Node("crate_translateX")["data"]["keys"][1] = [24.0, 6.0]
+
+        def SetTangent():
+            cmds.Node("crate_translateX")["data"]["tangents"][0] = "linear"
+
+        edits = [("edge softness", SetEdge),
+                 ("normals", SetNormal),
+                 ("skin weights", lambda: cmds.setAttr("skinCluster1.weightList[1].weights", {"0": 0.25})),
+                 ("blend shape target", lambda: cmds.setAttr(
+                     "blendShape1.inputTarget[0].inputTargetGroup[0].inputTargetItem[6000].inputPointsTarget", [[0.0, 0.7, 0.0]])),
+                 ("animation key", SetKey),
+                 ("animation tangent", SetTangent),
+                 ("material", lambda: cmds.setAttr("crate_mat.eccentricity", 0.5)),
+                 ("texture", lambda: cmds.setAttr("crate_file.fileTextureName", "sourceimages/crate_v2.png")),
+                 ("node type without a special case", lambda: cmds.setAttr("|crate|crateLocator.localScaleX", 2.0))]
+        self.Run()
+        for label, edit in edits:
+            edit()
+            self.assertNotEqual(self.Run()["reason"], "scene unchanged", "%s edit was skipped" % label)
+
+    def test_SameFbxIsNotReplaced(self):
+        self.CheckSameFbx()
+
+    def test_SameAsciiFbxIsNotReplaced(self):
+        mel.eval("FBXExportInAscii -v true")
+        self.CheckSameFbx()
+
+    #the stub FBX only holds the dag nodes, so a material edit exports the same file at another time and temp path
+    def CheckSameFbx(self):
+        path = self.Run()["file"]
+        with open(path, "rb") as f:
+            exported = f.read()
+        self.assertEqual(exported.startswith(b"Kaydara FBX Binary"), not mel.ascii)
+        cmds.setAttr("crate_mat.eccentricity", 0.5)
+        result = self.Run()
+        self.assertEqual((result["status"], result["reason"]), ("skipped", "file unchanged"))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), exported)
+        self.assertEqual(sorted(os.listdir(os.path.dirname(path))), [ExportQueue.MANIFEST_NAME, "crate.fbx"])
+
+    def test_MissingAssetFails(self):
+        result = self.Run(assets=("|missing",))
+        self.assertEqual(result["status"], "failed")
+        self.assertTrue(result["error"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Tests of Profiler, and that Text Parser ships the same module.
+
+USAGE:
+python -m unittest discover -s "Individual files/tests"
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import Profiler
+
+TEXT_PARSER_COPY = os.path.join(os.path.dirname(os.path.dirname(HERE)), "TextParser", "Profiler.py")
+
+
+class ProfilerTest(unittest.TestCase):
+    def test_TextParserCopyIsTheSame(self):
+        with open(os.path.splitext(Profiler.__file__)[0] + ".py", "rb") as f:
+            module = f.read()
+        with open(TEXT_PARSER_COPY, "rb") as f:
+            self.assertEqual(f.read(), module, "TextParser/Profiler.py differs from Individual files/Profiler.py")
+
+    def test_ReportIsSaved(self):
+        folder = tempfile.mkdtemp(prefix="profilerTest_")
+        reportDir = Profiler.REPORT_DIR
+        try:
+            Profiler.REPORT_DIR = folder
+            profile = Profiler.Profile("Test")
+            with profile.Timer("step"):
+                pass
+            profile.Count("files", 2)
+            profile.Save()
+            self.assertEqual(len(os.listdir(folder)), 1)
+        finally:
+            Profiler.REPORT_DIR = reportDir
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
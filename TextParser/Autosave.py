@@ -0,0 +1,172 @@
+__author__ = "Narendra"
+'''
+Autosave
+Crash recovery for the document open in Text Parser, written in the background without writing the text again.
+
+only the regions that changed are written: the replace passes of the journal (see Document) since the file was loaded or saved
+1. every replace, undo, redo or re-apply is one line in a sidecar next to the file (.<name>.autosave), holding the spans of its pass
+2. write() appends the changes made since the last write and fsyncs the sidecar. Text Parser writes a few seconds after
+   the last change, on a worker thread, so editing never waits for it
+3. recover() reads the file again and replays the changes. a sidecar whose file changed on disk since is stale
+a crash while writing leaves at most a partial last line, which recover() ignores
+
+sidecar: a json header line {"version", "size", "mtime", "encoding"}, then a {"op": "apply"|"undo"|"redo", "pass": {..}} line per change
+'''
+import base64
+import json
+import os
+import threading
+from array import array
+
+from Document import Document, ReplacePass
+from StreamProcessor import readText
+
+VERSION = 1
+
+
+#gets the sidecar file of @path
+def sidecarPath(path):
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, "." + name + ".autosave")
+
+
+'''
+Collects the changes of @document and appends them to the sidecar of @path
+'''
+class Autosave(object):
+    def __init__(self, path, encoding, document):
+        self.path = os.path.abspath(path)
+        self.sidecar = sidecarPath(path)
+        self.encoding = encoding
+        self.document = document
+        self.document.journal = []
+        self.base = _fileStamp(self.path)
+        #counts the saves. changes taken before a save are in the saved file and must not reach the new sidecar
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    #takes the changes made since the last call as (generation, changes). called on the window thread while no task changes the document
+    def pending(self):
+        changes = self.document.journal
+        if changes is None:
+            return self.generation, []
+        self.document.journal = []
+        return self.generation, changes
+
+    #appends @changes to the sidecar and fsyncs it. the header goes first when the sidecar is new
+    def write(self, generation, changes, progress=None):
+        with self._lock:
+            if generation != self.generation or not changes:
+                return 0
+            new = not os.path.exists(self.sidecar)
+            with open(self.sidecar, "ab") as f:
+                if new:
+                    header = {"version": VERSION, "size": self.base[0], "mtime": self.base[1], "encoding": self.encoding}
+                    f.write(json.dumps(header).encode("utf-8") + b"\n")
+                for i, (op, replacePass) in enumerate(changes):
+                    #ascii escapes keep undecodable bytes (lone surrogates) of the text writable
+                    line = json.dumps({"op": op, "pass": _dumpPass(replacePass)})
+                    f.write(line.encode("utf-8") + b"\n")
+                    if progress:
+                        progress(i + 1, len(changes))
+                f.flush()
+                os.fsync(f.fileno())
+        return len(changes)
+
+    #drops the sidecar once the document is saved. the changes from then on are written against the saved file
+    def discard(self):
+        with self._lock:
+            self.generation += 1
+            self.document.journal = []
+            self.base = _fileStamp(self.path)
+            if os.path.exists(self.sidecar):
+                os.remove(self.sidecar)
+
+    #stops collecting changes after a write failed, the sidecar may miss some of them. discard() starts again
+    def stop(self):
+        with self._lock:
+            self.generation += 1
+            self.document.journal = None
+            try:
+                if os.path.exists(self.sidecar):
+                    os.remove(self.sidecar)
+            except OSError:
+                pass
+
+
+#returns True when @path has a sidecar written against the file as it is on disk
+def canRecover(path):
+    header = _readHeader(sidecarPath(path))
+    return bool(header) and (header["size"], header["mtime"]) == _fileStamp(path)
+
+
+#reads @path and replays the changes of its sidecar. returns the Document, with the encoding the file was read with
+def recover(path, progress=None):
+    sidecar = sidecarPath(path)
+    header = _readHeader(sidecar)
+    document = Document(readText(path, header["encoding"], progress=progress), header["encoding"])
+    with open(sidecar, "rb") as f:
+        f.readline()
+        for line in f:
+            #the last line is partial when writing it was interrupted
+            if not line.endswith(b"\n"):
+                break
+            change = json.loads(line.decode("utf-8"))
+            document.replay(change["op"], _loadPass(change["pass"]))
+    return document
+
+
+#removes the sidecar of @path, when its changes are not wanted
+def discardSidecar(path):
+    sidecar = sidecarPath(path)
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
+
+
+#(size, mtime) of @path, which tells if it changed since a sidecar was started
+def _fileStamp(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
+
+
+def _readHeader(sidecar):
+    try:
+        with open(sidecar, "rb") as f:
+            header = json.loads(f.readline().decode("utf-8"))
+    except (IOError, OSError, ValueError):
+        return None
+    return header if header.get("version") == VERSION else None
+
+
+def _dumpPass(replacePass):
+    return {"rules": [list(rule) for rule in replacePass.rules],
+            "starts": _dumpArray(replacePass.starts), "ruleIds": _dumpArray(replacePass.ruleIds),
+            "found": dict([("%d" % i, text) for i, text in replacePass.found.items()]),
+            "replaced": dict([("%d" % i, text) for i, text in replacePass.replaced.items()])}
+
+
+def _loadPass(data):
+    replacePass = ReplacePass([tuple(rule) for rule in data["rules"]])
+    replacePass.starts = _loadArray(data["starts"])
+    replacePass.ruleIds = _loadArray(data["ruleIds"])
+    replacePass.found = dict([(int(i), text) for i, text in data["found"].items()])
+    replacePass.replaced = dict([(int(i), text) for i, text in data["replaced"].items()])
+    return replacePass
+
+
+#arrays are written as their raw items, a pass can have millions of spans
+def _dumpArray(values):
+    raw = values.tobytes() if hasattr(values, "tobytes") else values.tostring()
+    return {"typecode": values.typecode, "itemsize": values.itemsize, "data": base64.b64encode(raw).decode("ascii")}
+
+
+def _loadArray(data):
+    values = array(data["typecode"])
+    if values.itemsize != data["itemsize"]:
+        raise ValueError("autosave was written where %s items have %d bytes" % (data["typecode"], data["itemsize"]))
+    raw = base64.b64decode(data["data"])
+    if hasattr(values, "frombytes"):
+        values.frombytes(raw)
+    else:
+        values.fromstring(raw)
+    return values
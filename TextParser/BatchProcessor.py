@@ -0,0 +1,65 @@
+__author__ = "Narendra"
+'''
+Batch Processor
+Spreads many files across a process pool. every worker receives the compiled ReplaceEngine once when it starts
+and streams its files in chunks (see StreamProcessor), so only small per-file results travel back.
+
+1. at most @maxInFlight files are queued at a time, so memory does not grow with the number of files
+2. results come back in input order and every file is written only by its own worker,
+   so the output is the same for any number of workers
+3. with mapped=True, files replaced in place (srcPath == dstPath) try the mmap fast path of MappedReplace first
+'''
+import multiprocessing
+import time
+
+from MappedReplace import replaceInPlace
+from StreamProcessor import CHUNK_SIZE, processFile
+
+#engine of the current worker process, set once by _initWorker
+_engine = None
+
+
+#processes (srcPath, dstPath) pairs and yields (srcPath, dstPath, bytes, seconds, error) in the same order.
+#@error is None when the file was written
+def processFiles(pairs, engine, jobs=1, encoding="utf-8", chunkSize=CHUNK_SIZE, maxInFlight=None, mapped=False):
+    if jobs <= 1:
+        global _engine
+        _engine = engine
+        for src, dst in pairs:
+            yield _processOne(src, dst, encoding, chunkSize, mapped)
+        return
+
+    maxInFlight = maxInFlight or jobs * 2
+    pending = []
+    #multiprocessing.Pool takes an initializer on python 2 as well
+    pool = multiprocessing.Pool(processes=jobs, initializer=_initWorker, initargs=(engine,))
+    try:
+        for src, dst in pairs:
+            pending.append(pool.apply_async(_processOne, (src, dst, encoding, chunkSize, mapped)))
+            if len(pending) >= maxInFlight:
+                yield pending.pop(0).get()
+        while pending:
+            yield pending.pop(0).get()
+        pool.close()
+        pool.join()
+    finally:
+        #stops the workers as well when the caller stopped early or a result could not be sent back
+        pool.terminate()
+
+
+#keeps the engine sent by the parent process for all the files of this worker
+def _initWorker(engine):
+    global _engine
+    _engine = engine
+
+
+def _processOne(src, dst, encoding, chunkSize, mapped=False):
+    start = time.time()
+    try:
+        if src == dst:
+            size = replaceInPlace(src, _engine, mapped, encoding=encoding, chunkSize=chunkSize)
+        else:
+            size = processFile(src, dst, _engine, encoding=encoding, chunkSize=chunkSize)
+    except Exception as e:
+        return (src, dst, 0, time.time() - start, "%s" % e)
+    return (src, dst, size, time.time() - start, None)
@@ -0,0 +1,41 @@
+__author__ = "Narendra"
+'''
+Compile UI
+Generates app_ui.py from app.ui with pyside-uic, so Text Parser builds its window without parsing xml at startup.
+
+the sha1 of app.ui is written into app_ui.py. while app.ui is edited and app_ui.py not regenerated,
+Text Parser notices the difference and loads app.ui at runtime instead. so does an app_ui.py without the sha1
+
+app_ui.py is not kept in the tree, it is generated here: once in a checkout, and before every frozen build, which
+ships it (with app.ui) instead of parsing the xml at startup
+
+USAGE:
+python CompileUI.py
+'''
+import hashlib
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+UI_FILE = os.path.join(HERE, "app.ui")
+UI_MODULE = os.path.join(HERE, "app_ui.py")
+
+
+#sha1 of a .ui file. line endings are normalized, so a checkout with CRLF endings still matches
+def uiHash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read().replace(b"\r\n", b"\n")).hexdigest()
+
+
+#writes the python module of @uiFile to @moduleFile
+def compileUi(uiFile=UI_FILE, moduleFile=UI_MODULE):
+    from pysideuic import compileUi as uic
+    with open(moduleFile, "w") as f:
+        uic(uiFile, f)
+        f.write("\n#generated by CompileUI.py. sha1 of the app.ui this module was generated from\n")
+        f.write('UI_SOURCE_HASH = "%s"\n' % uiHash(uiFile))
+    return moduleFile
+
+
+if __name__ == '__main__':
+    sys.stdout.write("%s\n" % compileUi())
@@ -0,0 +1,289 @@
+__author__ = "Narendra"
+'''
+Document
+The text loaded in Text Parser together with a journal of the replace passes applied to it.
+
+every pass is kept as a compact list of spans (array-backed start offsets and rule ids) over the text it was applied to,
+so the text before and after a pass can be rebuilt from the spans alone:
+1. undo and redo rebuild the text from the spans, the journal never stores a copy of the text
+2. re-applying a pass whose rules only changed their replace text rewrites just the spans of those rules, without rescanning
+3. re-applying with different find text undoes the pass and scans again
+case-insensitive and pattern rules match text that differs from their find, only those matches keep their own text.
+a pattern rule with a changed template is scanned again, its replacements depend on the groups of every match
+
+a MatchIndex previews a pass before it is applied: the same scan, with the offsets of every rule kept apart for counts
+and jumping between matches. replacing with the rules it was built for applies its spans without scanning again
+
+passes never change once scanned, re-applying new replace texts makes a new pass over the same spans. that lets Autosave
+keep the passes of unsaved changes as they are and write them later (see Document.journal)
+'''
+import bisect
+from array import array
+
+from LineIndex import OFFSET
+from ReplaceEngine import IGNORE_CASE, LITERAL, foldCase
+from StreamProcessor import CHUNK_SIZE
+
+
+'''
+Spans of one replace pass. @starts are offsets in the text the pass was applied to, @ruleIds index into @rules.
+@found and @replaced hold the matched text and the replacement of the spans where they differ from the rule, by span
+'''
+class ReplacePass(object):
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.starts = array(OFFSET)
+        self.ruleIds = array("I")
+        self.found = {}
+        self.replaced = {}
+
+    #finds all the spans of @engine in @text. @progress gets (charactersDone, charactersTotal)
+    @classmethod
+    def scan(cls, text, engine, progress=None):
+        replacePass = cls(engine.rules)
+        if engine.isEmpty():
+            return replacePass
+        nextReport = CHUNK_SIZE
+        for match in engine.finditer(text):
+            start = match.start()
+            ruleId = engine.ruleId(match)
+            find, replace, _ = engine.rules[ruleId]
+            if not engine.literal:
+                found = match.group(0)
+                if found != find:
+                    replacePass.found[len(replacePass.ruleIds)] = found
+                replaced = engine.replacement(match, ruleId)
+                if replaced != replace:
+                    replacePass.replaced[len(replacePass.ruleIds)] = replaced
+            replacePass.starts.append(start)
+            replacePass.ruleIds.append(ruleId)
+            if progress and start >= nextReport:
+                progress(start, len(text))
+                nextReport = start + CHUNK_SIZE
+        if progress:
+            progress(len(text), len(text))
+        return replacePass
+
+    def __len__(self):
+        return len(self.ruleIds)
+
+    #yields the (find, replace) texts of every span
+    def spans(self):
+        for i, ruleId in enumerate(self.ruleIds):
+            find, replace, _ = self.rules[ruleId]
+            yield self.found.get(i, find), self.replaced.get(i, replace)
+
+    #gets the text after the pass from the text it was applied to
+    def apply(self, text):
+        parts = []
+        pos = 0
+        for start, (find, replace) in zip(self.starts, self.spans()):
+            parts.append(text[pos:start])
+            parts.append(replace)
+            pos = start + len(find)
+        parts.append(text[pos:])
+        return text[:0].join(parts)
+
+    #gets the text the pass was applied to from the text after it
+    def revert(self, text):
+        parts = []
+        pos = 0
+        delta = 0
+        for start, (find, replace) in zip(self.starts, self.spans()):
+            start = start + delta
+            parts.append(text[pos:start])
+            parts.append(find)
+            pos = start + len(replace)
+            delta += len(replace) - len(find)
+        parts.append(text[pos:])
+        return text[:0].join(parts)
+
+    #returns True when the rules of the pass and @rules only differ in replace texts that can be rewritten without a scan
+    def canRereplace(self, rules):
+        if [(find, mode) for find, _, mode in self.rules] != [(find, mode) for find, _, mode in rules]:
+            return False
+        #the replacements of a pattern depend on the groups of every match
+        return all([mode in (LITERAL, IGNORE_CASE) or old == new for (_, old, mode), (_, new, _) in zip(self.rules, rules)])
+
+    #rewrites only the spans of the rules whose replace text differs in @rules, in @text the text after the pass
+    def rereplace(self, text, rules):
+        changed = set([i for i, ((_, old, _), (_, new, _)) in enumerate(zip(self.rules, rules)) if old != new])
+        if not changed:
+            return text
+        parts = []
+        pos = 0
+        delta = 0
+        for start, ruleId, (find, replace) in zip(self.starts, self.ruleIds, self.spans()):
+            if ruleId in changed:
+                start = start + delta
+                parts.append(text[pos:start])
+                parts.append(rules[ruleId][1])
+                pos = start + len(replace)
+            delta += len(replace) - len(find)
+        parts.append(text[pos:])
+        return text[:0].join(parts)
+
+    #a pass over the same spans with the replace texts of @rules
+    def withRules(self, rules):
+        replacePass = ReplacePass(rules)
+        replacePass.starts = self.starts
+        replacePass.ruleIds = self.ruleIds
+        replacePass.found = self.found
+        replacePass.replaced = self.replaced
+        return replacePass
+
+
+'''
+Every match of an engine in a text. @replacePass holds them in text order, @ruleStarts the offsets of every rule on their own
+'''
+class MatchIndex(object):
+    def __init__(self, text, engine, progress=None):
+        self.replacePass = ReplacePass.scan(text, engine, progress)
+        self.rules = self.replacePass.rules
+        #split from the spans, the text is not scanned again
+        self.ruleStarts = [array(OFFSET) for _ in self.rules]
+        for start, ruleId in zip(self.replacePass.starts, self.replacePass.ruleIds):
+            self.ruleStarts[ruleId].append(start)
+
+    def __len__(self):
+        return len(self.replacePass)
+
+    #number of matches of every rule, in rule order
+    def counts(self):
+        return [len(starts) for starts in self.ruleStarts]
+
+    #gets the id of the rule that matches @find with @mode, None when there is none
+    def findRule(self, find, mode=LITERAL):
+        for ruleId, (ruleFind, _, ruleMode) in enumerate(self.rules):
+            if ruleMode == mode and (ruleFind == find or (mode == IGNORE_CASE and foldCase(ruleFind) == foldCase(find))):
+                return ruleId
+        return None
+
+    #gets (start, length) of the first match from @offset on, of @ruleId or of any rule. wraps around to the first match
+    def nextMatch(self, offset, ruleId=None):
+        starts = self.replacePass.starts if ruleId is None else self.ruleStarts[ruleId]
+        if not starts:
+            return None
+        i = bisect.bisect_left(starts, offset)
+        return self._match(starts[i if i < len(starts) else 0])
+
+    #gets (start, length) of the last match before @offset, of @ruleId or of any rule. wraps around to the last match
+    def previousMatch(self, offset, ruleId=None):
+        starts = self.replacePass.starts if ruleId is None else self.ruleStarts[ruleId]
+        if not starts:
+            return None
+        i = bisect.bisect_left(starts, offset)
+        return self._match(starts[i - 1])
+
+    #gets (start, length) of the match at @start. matches never overlap, so their starts are unique
+    def _match(self, start):
+        i = bisect.bisect_left(self.replacePass.starts, start)
+        find = self.replacePass.found.get(i, self.rules[self.replacePass.ruleIds[i]][0])
+        return start, len(find)
+
+
+'''
+Text with undo and redo stacks of replace passes. @encoding is the one it was read with and is saved with
+'''
+class Document(object):
+    def __init__(self, text, encoding="utf-8"):
+        self.text = text
+        self.encoding = encoding
+        self.undoStack = []
+        self.redoStack = []
+        #matches of the current text, until it changes
+        self.matchIndex = None
+        #counts the changes, the window compares it with the revision last saved
+        self.revision = 0
+        self.savedRevision = 0
+        #("apply" | "undo" | "redo", pass) of every change, while someone (Autosave) collects them. None otherwise
+        self.journal = None
+
+    #indexes every match of @engine without replacing them. a replace with the same rules uses the index
+    def index(self, engine, progress=None):
+        self.matchIndex = MatchIndex(self.text, engine, progress)
+        return self.matchIndex
+
+    #replaces all the matches of @engine and records the pass. returns the number of replacements
+    def replace(self, engine, progress=None):
+        if self.matchIndex is not None and self.matchIndex.rules == engine.rules:
+            replacePass = self.matchIndex.replacePass
+            if progress:
+                progress(len(self.text), len(self.text))
+        else:
+            replacePass = ReplacePass.scan(self.text, engine, progress)
+        self.text = replacePass.apply(self.text)
+        self.undoStack.append(replacePass)
+        self.redoStack = []
+        self._changed("apply", replacePass)
+        return len(replacePass)
+
+    #replaces the last pass with the rules of @engine. only the changed spans are rewritten when the finds are the same
+    def reapply(self, engine, progress=None):
+        if not self.undoStack:
+            return self.replace(engine, progress)
+        last = self.undoStack[-1]
+        #nothing changes until the new pass is complete, a cancelled scan keeps the text and both stacks
+        if last.canRereplace(engine.rules):
+            text = last.rereplace(self.text, engine.rules)
+            replacePass = last.withRules(engine.rules)
+            if progress:
+                progress(len(text), len(text))
+        else:
+            #finds changed, so the matches can be different anywhere
+            text = last.revert(self.text)
+            replacePass = ReplacePass.scan(text, engine, progress)
+            text = replacePass.apply(text)
+        self.text = text
+        self.undoStack[-1] = replacePass
+        self.redoStack = []
+        self._changed("undo", last)
+        self._changed("apply", replacePass)
+        return len(replacePass)
+
+    def canUndo(self):
+        return bool(self.undoStack)
+
+    def canRedo(self):
+        return bool(self.redoStack)
+
+    def undo(self, progress=None):
+        replacePass = self.undoStack.pop()
+        self.text = replacePass.revert(self.text)
+        self.redoStack.append(replacePass)
+        self._changed("undo", replacePass)
+        return len(replacePass)
+
+    def redo(self, progress=None):
+        replacePass = self.redoStack.pop()
+        self.text = replacePass.apply(self.text)
+        self.undoStack.append(replacePass)
+        self._changed("redo", replacePass)
+        return len(replacePass)
+
+    #returns True when the text changed since it was loaded or saved
+    def isModified(self):
+        return self.revision != self.savedRevision
+
+    #plays back a change of the journal, @replacePass read back from an autosave. the stacks are rebuilt as far as they can be
+    def replay(self, op, replacePass):
+        if op == "undo":
+            self.text = replacePass.revert(self.text)
+            if self.undoStack:
+                self.undoStack.pop()
+            self.redoStack.append(replacePass)
+        else:
+            self.text = replacePass.apply(self.text)
+            if op == "redo" and self.redoStack:
+                self.redoStack.pop()
+            elif op == "apply":
+                self.redoStack = []
+            self.undoStack.append(replacePass)
+        self._changed(op, replacePass)
+
+    #the text changed by @op with @replacePass
+    def _changed(self, op, replacePass):
+        self.matchIndex = None
+        self.revision += 1
+        if self.journal is not None:
+            self.journal.append((op, replacePass))
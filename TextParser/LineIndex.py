@@ -0,0 +1,118 @@
+__author__ = "Narendra"
+'''
+Line Index
+Offsets of every line start in a document, so a viewer can fetch any window of lines without splitting the whole text.
+
+TextLines serves lines of a document held in memory, FileLines serves them straight from a file on disk.
+both have lineCount() and lines(first, count), which is all PagedTextView needs.
+FileLines finds the newlines of 16 and 32 bit encodings on whole code units, so utf-16 files are indexed without decoding them
+'''
+import bisect
+import re
+from array import array
+
+from StreamProcessor import CHUNK_SIZE, decodeBytes, resolveEncoding, splitBom
+
+#typecode of an unsigned 64 bit offset, so indexes of files over 4GB still fit
+OFFSET = "Q" if hasattr(array("B"), "frombytes") else "L"
+
+
+'''
+Sorted start offsets of the lines of a document. line 0 starts at the first character, after a byte order mark
+'''
+class LineIndex(object):
+    def __init__(self, offsets, length, newlineSize=1):
+        self.offsets = offsets
+        self.length = length
+        self.newlineSize = newlineSize
+
+    #indexes the lines of a string held in memory
+    @classmethod
+    def fromText(cls, text):
+        offsets = array(OFFSET, [0])
+        offsets.extend([match.end() for match in re.finditer(u"\n", text)])
+        return cls(offsets, len(text))
+
+    #indexes the lines of a file by byte offset, reading it one chunk at a time.
+    #@newline is the encoded newline and @start the offset of the first character
+    @classmethod
+    def fromFile(cls, path, chunkSize=CHUNK_SIZE, progress=None, newline=b"\n", start=0):
+        unit = len(newline)
+        #chunks hold whole code units, so a newline is only counted where a character starts
+        chunkSize -= chunkSize % unit
+        offsets = array(OFFSET, [start])
+        done = start
+        with open(path, "rb") as f:
+            f.seek(start)
+            while True:
+                raw = f.read(chunkSize)
+                if not raw:
+                    break
+                offsets.extend([done + match.end() for match in re.finditer(re.escape(newline), raw) if match.start() % unit == 0])
+                done += len(raw)
+                if progress:
+                    progress(done, done)
+        return cls(offsets, done, unit)
+
+    def lineCount(self):
+        #a document ending with a newline has no extra empty line after it
+        if len(self.offsets) > 1 and self.offsets[-1] == self.length:
+            return len(self.offsets) - 1
+        return len(self.offsets)
+
+    #gets the (start, end) offsets of @count lines from @first, end excludes the last newline
+    def span(self, first, count):
+        first = max(0, min(first, self.lineCount()))
+        last = min(first + count, self.lineCount())
+        if first >= last:
+            return self.length, self.length
+        start = self.offsets[first]
+        end = self.offsets[last] - self.newlineSize if last < len(self.offsets) else self.length
+        return start, end
+
+    #gets the line that contains @offset
+    def lineAt(self, offset):
+        return max(0, bisect.bisect_right(self.offsets, offset) - 1)
+
+
+'''
+Lines of a document held in memory
+'''
+class TextLines(object):
+    def __init__(self, text):
+        self.text = text
+        self.index = LineIndex.fromText(text)
+
+    def lineCount(self):
+        return self.index.lineCount()
+
+    def lines(self, first, count):
+        start, end = self.index.span(first, count)
+        return _splitLines(self.text[start:end], first, self.index)
+
+
+'''
+Lines of a file on disk. only the requested lines are read and decoded
+'''
+class FileLines(object):
+    def __init__(self, path, encoding="utf-8", index=None):
+        self.path = path
+        #lines are decoded from the middle of the file, after any byte order mark
+        bom, self.encoding = splitBom(path, resolveEncoding(path, encoding))
+        self.index = index or LineIndex.fromFile(path, newline=u"\n".encode(self.encoding), start=len(bom))
+
+    def lineCount(self):
+        return self.index.lineCount()
+
+    def lines(self, first, count):
+        start, end = self.index.span(first, count)
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            text = decodeBytes(f.read(end - start), self.encoding)
+        return _splitLines(text, first, self.index)
+
+
+def _splitLines(text, first, index):
+    if first >= index.lineCount():
+        return []
+    return [line.rstrip(u"\r") for line in text.split(u"\n")]
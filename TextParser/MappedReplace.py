@@ -0,0 +1,108 @@
+__author__ = "Narendra"
+'''
+Mapped Replace
+Opt-in fast path that rewrites a file in place through mmap when every find and its replace are byte sequences of the same length,
+which is the case for the single character swaps the tool was built for.
+
+1. single byte rules go through a 256 entry translation table (bytes.translate), one mapped chunk at a time
+2. longer equal-length rules are matched straight on the mapped buffer and overwritten where they are found
+3. rules that change the length, or that aren't literal text, return False, so the caller falls back to StreamProcessor
+   (replaceInPlace does this)
+
+the file is modified in place: unlike StreamProcessor there is no temp file, so an interrupted run leaves a partly replaced file.
+'''
+import codecs
+import mmap
+import os
+import re
+
+from ReplaceEngine import buildPattern
+from StreamProcessor import CHUNK_SIZE, checkChunkSize, processFile, resolveEncoding
+
+#encodings where a byte match always starts on a character boundary
+_SAFE_ENCODINGS = ("utf-8", "ascii", "latin-1", "iso8859-1")
+_SAFE_PREFIXES = ("cp125", "iso8859-", "mac-")
+
+
+#returns [(findBytes, replaceBytes)] for the rules of @engine, or None when they can't be replaced in place
+def byteRules(engine, encoding="utf-8"):
+    name = codecs.lookup(encoding).name
+    if name not in _SAFE_ENCODINGS and not name.startswith(_SAFE_PREFIXES):
+        return None
+    #case-insensitive and pattern matches have no fixed bytes
+    if not engine.literal:
+        return None
+    rules = []
+    for find, replace, _ in engine.rules:
+        try:
+            findBytes = find.encode(encoding)
+            replaceBytes = replace.encode(encoding)
+        except (UnicodeError, AttributeError):
+            return None
+        if len(findBytes) != len(replaceBytes):
+            return None
+        rules.append((findBytes, replaceBytes))
+    return rules
+
+
+#rewrites @path in place through mmap. returns False without touching the file when the rules change length
+#@progress is called as progress(bytesDone, bytesTotal)
+def replaceMapped(path, engine, encoding="utf-8", chunkSize=CHUNK_SIZE, progress=None):
+    checkChunkSize(chunkSize)
+    rules = byteRules(engine, resolveEncoding(path, encoding))
+    if rules is None:
+        return False
+    size = os.path.getsize(path)
+    if not rules or not size:
+        if progress:
+            progress(size, size)
+        return True
+    with open(path, "r+b") as f:
+        mapped = mmap.mmap(f.fileno(), 0)
+        try:
+            if max([len(find) for find, _ in rules]) == 1:
+                _translateMapped(mapped, size, rules, chunkSize, progress)
+            else:
+                _overwriteMapped(mapped, size, rules, chunkSize, progress)
+            mapped.flush()
+        finally:
+            mapped.close()
+    return True
+
+
+#replaces @path in place. tries the mmap fast path when @mapped is set, otherwise streams through a temp file
+def replaceInPlace(path, engine, mapped=False, encoding="utf-8", chunkSize=CHUNK_SIZE, progress=None):
+    if mapped and replaceMapped(path, engine, encoding=encoding, chunkSize=chunkSize, progress=progress):
+        return os.path.getsize(path)
+    return processFile(path, path, engine, encoding=encoding, chunkSize=chunkSize, progress=progress)
+
+
+#single byte rules. chunks that don't change are not written back, so their pages stay clean
+def _translateMapped(mapped, size, rules, chunkSize, progress):
+    table = bytearray(range(256))
+    for find, replace in rules:
+        table[ord(find[:1])] = ord(replace[:1])
+    table = bytes(table)
+    for start in range(0, size, chunkSize):
+        end = min(start + chunkSize, size)
+        chunk = mapped[start:end]
+        translated = chunk.translate(table)
+        if translated != chunk:
+            mapped[start:end] = translated
+        if progress:
+            progress(end, size)
+
+
+#equal-length rules. the pattern scans the mapped buffer directly and every match is overwritten in place
+def _overwriteMapped(mapped, size, rules, chunkSize, progress):
+    replacements = dict(rules)
+    regex = re.compile(buildPattern([find for find, _ in rules]))
+    nextReport = chunkSize
+    for match in regex.finditer(mapped):
+        start, end = match.span()
+        mapped[start:end] = replacements[match.group(0)]
+        if progress and end >= nextReport:
+            progress(end, size)
+            nextReport = end + chunkSize
+    if progress:
+        progress(size, size)
@@ -0,0 +1,113 @@
+__author__ = "Narendra"
+'''
+Paged Text View
+A read-only viewer that only keeps the visible window of lines in its text widget.
+Lines come from a line source (see LineIndex) as the user scrolls, so Qt never lays out the whole document.
+
+after setSource with the same scroll position, only the visible lines that actually changed are rewritten
+'''
+from PySide import QtGui, QtCore
+
+
+'''
+Read-only text widget and scroll bar over a TextLines/FileLines source
+'''
+class PagedTextView(QtGui.QWidget):
+    def __init__(self, parent=None):
+        super(PagedTextView, self).__init__(parent)
+        self.source = None
+        self.visibleLines = []
+
+        #text widget never scrolls itself, the scroll bar picks the first visible line
+        self.textEdit = QtGui.QPlainTextEdit(self)
+        self.textEdit.setReadOnly(True)
+        self.textEdit.setLineWrapMode(QtGui.QPlainTextEdit.NoWrap)
+        self.textEdit.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.textEdit.installEventFilter(self)
+        self.textEdit.viewport().installEventFilter(self)
+        self.scrollBar = QtGui.QScrollBar(QtCore.Qt.Vertical, self)
+        self.scrollBar.valueChanged.connect(self.refresh)
+
+        layout = QtGui.QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        layout.addWidget(self.textEdit)
+        layout.addWidget(self.scrollBar)
+
+    #shows lines from @source. the scroll position is kept unless @keepPosition is False
+    def setSource(self, source, keepPosition=True):
+        self.source = source
+        if not keepPosition:
+            self.visibleLines = []
+            self.scrollBar.setValue(0)
+        self._updateScrollRange()
+        self.refresh()
+
+    #number of lines that fit in the text widget
+    def pageSize(self):
+        lineHeight = max(1, self.textEdit.fontMetrics().lineSpacing())
+        return max(1, self.textEdit.viewport().height() // lineHeight)
+
+    #scrolls so @line is the first visible line
+    def scrollToLine(self, line):
+        self.scrollBar.setValue(line)
+
+    #first visible line
+    def firstLine(self):
+        return self.scrollBar.value()
+
+    #scrolls @line into view, a third down the page, and selects @length characters from @column of it
+    def showSpan(self, line, column, length):
+        self.scrollToLine(max(0, line - self.pageSize() // 3))
+        block = self.textEdit.document().findBlockByNumber(line - self.scrollBar.value())
+        if not block.isValid():
+            return
+        #a match can run over the following lines, the selection stops at the end of the visible ones
+        end = self.textEdit.document().characterCount() - 1
+        cursor = QtGui.QTextCursor(block)
+        cursor.setPosition(min(block.position() + column, end))
+        cursor.setPosition(min(block.position() + column + length, end), QtGui.QTextCursor.KeepAnchor)
+        self.textEdit.setTextCursor(cursor)
+
+    #fetches the visible window of lines and rewrites the ones that changed
+    def refresh(self, *args):
+        if self.source is None:
+            lines = []
+        else:
+            lines = self.source.lines(self.scrollBar.value(), self.pageSize())
+        if lines == self.visibleLines:
+            return
+        if len(lines) != len(self.visibleLines):
+            self.textEdit.setPlainText(u"\n".join(lines))
+        else:
+            #same number of lines, only replace the blocks that differ
+            document = self.textEdit.document()
+            for row, line in enumerate(lines):
+                if line != self.visibleLines[row]:
+                    cursor = QtGui.QTextCursor(document.findBlockByNumber(row))
+                    cursor.movePosition(QtGui.QTextCursor.EndOfBlock, QtGui.QTextCursor.KeepAnchor)
+                    cursor.insertText(line)
+        self.visibleLines = lines
+
+    def _updateScrollRange(self):
+        count = self.source.lineCount() if self.source else 0
+        self.scrollBar.setRange(0, max(0, count - self.pageSize()))
+        self.scrollBar.setPageStep(self.pageSize())
+
+    def resizeEvent(self, event):
+        super(PagedTextView, self).resizeEvent(event)
+        self._updateScrollRange()
+        self.refresh()
+
+    #wheel and paging keys on the text widget move the scroll bar instead
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Wheel:
+            self.scrollBar.setValue(self.scrollBar.value() - event.delta() // 40)
+            return True
+        if event.type() == QtCore.QEvent.KeyPress:
+            steps = {QtCore.Qt.Key_PageDown: self.pageSize(), QtCore.Qt.Key_PageUp: -self.pageSize(),
+                     QtCore.Qt.Key_Down: 1, QtCore.Qt.Key_Up: -1}
+            if event.key() in steps:
+                self.scrollBar.setValue(self.scrollBar.value() + steps[event.key()])
+                return True
+        return super(PagedTextView, self).eventFilter(obj, event)
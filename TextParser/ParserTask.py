@@ -0,0 +1,94 @@
+__author__ = "Narendra"
+'''
+Parser Task
+Runs loading, replacing and saving on a QThreadPool worker, so the Text Parser window keeps painting while big files are processed.
+
+1. the work itself is any StreamProcessor style function taking a progress callback
+2. progress, result, failure and cancellation come back to the window through signals. a failure keeps its traceback on stderr
+3. cancel() makes the next progress callback raise Cancelled, so the work stops between chunks
+
+StallMonitor measures how long the window event loop was blocked while a task ran.
+'''
+import threading
+import time
+import traceback
+from PySide import QtCore
+
+from StreamProcessor import Cancelled
+
+
+'''
+Signals of a ParserTask. QRunnable is not a QObject, so they live on their own object
+'''
+class TaskSignals(QtCore.QObject):
+    progress = QtCore.Signal(int)
+    finished = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+    cancelled = QtCore.Signal()
+
+
+'''
+Calls function(*args, progress=<callback>) on a worker thread. the result is only sent to the window once it is done
+'''
+class ParserTask(QtCore.QRunnable):
+    def __init__(self, function, *args):
+        super(ParserTask, self).__init__()
+        self.function = function
+        self.args = args
+        self.signals = TaskSignals()
+        self.started = None
+        self._cancel = threading.Event()
+
+    #asks the work to stop at the next chunk
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        self.started = time.time()
+        try:
+            result = self.function(*self.args, progress=self._progress)
+        except Cancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.failed.emit("%s" % e or e.__class__.__name__)
+        else:
+            self.signals.finished.emit(result)
+
+    #progress callback handed to the work. runs on the worker thread
+    def _progress(self, done, total):
+        if self._cancel.is_set():
+            raise Cancelled()
+        self.signals.progress.emit(int(done * 100 / total) if total else 100)
+
+
+'''
+Ticks on the window thread while a task runs. a late tick means the event loop was blocked for that long
+'''
+class StallMonitor(QtCore.QObject):
+    INTERVAL = 10
+
+    def __init__(self, parent=None):
+        super(StallMonitor, self).__init__(parent)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(self.INTERVAL)
+        self.timer.timeout.connect(self._tick)
+        self.longestStall = 0.0
+        self._last = None
+
+    def start(self):
+        self.longestStall = 0.0
+        self._last = time.time()
+        self.timer.start()
+
+    #stops ticking and returns the longest stall in seconds
+    def stop(self):
+        self._tick()
+        self.timer.stop()
+        return self.longestStall
+
+    def _tick(self):
+        now = time.time()
+        if self._last is not None:
+            self.longestStall = max(self.longestStall, now - self._last - self.INTERVAL / 1000.0)
+        self._last = now
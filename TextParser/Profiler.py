@@ -0,0 +1,141 @@
+__author__ = "Narendra 'aka' NaRango"
+'''
+brief: Lightweight profiling shared by the tools. Timers and counters per tool, reported as json per run.
+
+1. a Profile collects timers (calls, total and longest seconds) and counters (bytes processed, files exported, layers rendered..)
+2. timers are context managers or decorators. a Profile is thread safe, so worker threads can time their part of a run
+3. Save() ends a run. the report is logged in one line and written as json to REPORT_DIR, which keeps the last MAX_REPORTS
+   reports of every tool. set NY_PROFILE_DIR to choose the folder, or to an empty string to only log
+TextParser/Profiler.py is the same module, so Text Parser and its frozen build don't depend on the Maya scripts folder.
+edit both, tests/test_Profiler.py fails while they differ
+
+USAGE:
+import Profiler
+profile = Profiler.GetProfile("UnityExporter")
+with profile.Timer("export"):
+    ...
+profile.Count("files exported")
+profile.Save()
+'''
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+REPORT_DIR = os.environ.get("NY_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "nyProfiles"))
+MAX_REPORTS = 50
+
+log = logging.getLogger("ProfilerLog")
+
+_profiles = {}
+_profilesLock = threading.Lock()
+
+
+#gets the Profile of @tool, shared by every module of that tool
+def GetProfile(tool, logger=None):
+    with _profilesLock:
+        if tool not in _profiles:
+            _profiles[tool] = Profile(tool, logger)
+        return _profiles[tool]
+
+
+'''
+Timers and counters of one tool, from the start of a run until Save
+'''
+class Profile(object):
+    def __init__(self, tool, logger=None):
+        self.tool = tool
+        self.log = logger or log
+        self._lock = threading.Lock()
+        #numbers the runs of this process, so reports saved in the same second get different names
+        self.runs = 0
+        self.Reset()
+
+    #starts a new run
+    def Reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.timers = {}
+            self.counters = {}
+
+    #times the block it wraps under @name
+    def Timer(self, name):
+        return _Timer(self, name)
+
+    #decorator timing every call of a function, under @name or the function name
+    def Timed(self, name=None):
+        def decorator(function):
+            def timed(*args, **kwargs):
+                with self.Timer(name or function.__name__):
+                    return function(*args, **kwargs)
+            timed.__name__ = function.__name__
+            timed.__doc__ = function.__doc__
+            return timed
+        return decorator
+
+    def Count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def AddTime(self, name, seconds):
+        with self._lock:
+            timer = self.timers.setdefault(name, {"calls": 0, "seconds": 0.0, "max": 0.0})
+            timer["calls"] += 1
+            timer["seconds"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+
+    #report of the run so far
+    def Report(self):
+        with self._lock:
+            return {"tool": self.tool, "started": self.started, "seconds": time.time() - self.started, "pid": os.getpid(),
+                    "timers": dict([(name, dict(timer)) for name, timer in self.timers.items()]),
+                    "counters": dict(self.counters)}
+
+    #ends the run. logs its report, writes it to REPORT_DIR and returns the path it was written to
+    def Save(self):
+        report = self.Report()
+        self.Reset()
+        with self._lock:
+            self.runs += 1
+            run = self.runs
+        timers = ", ".join(["%s %.3fs" % (name, timer["seconds"]) for name, timer in sorted(report["timers"].items())])
+        counters = ", ".join(["%s %s" % (name, value) for name, value in sorted(report["counters"].items())])
+        self.log.info("%s run %.3fs | %s | %s" % (self.tool, report["seconds"], timers, counters))
+        if not REPORT_DIR:
+            return None
+        #profiling never stops a tool, a report that can't be written is only logged
+        try:
+            if not os.path.isdir(REPORT_DIR):
+                os.makedirs(REPORT_DIR)
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(report["started"]))
+            path = os.path.join(REPORT_DIR, "%s_%s_%d_%04d.json" % (self.tool, stamp, os.getpid(), run))
+            with open(path, "w") as f:
+                json.dump(report, f, indent=1, sort_keys=True)
+            self._Prune()
+        except (IOError, OSError) as e:
+            self.log.warning("Profile report of %s not written: %s" % (self.tool, e))
+            return None
+        return path
+
+    #keeps the MAX_REPORTS latest reports of this tool
+    def _Prune(self):
+        reports = sorted([name for name in os.listdir(REPORT_DIR) if name.startswith(self.tool + "_") and name.endswith(".json")])
+        for name in reports[:max(0, len(reports) - MAX_REPORTS)]:
+            os.remove(os.path.join(REPORT_DIR, name))
+
+
+class _Timer(object):
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *args):
+        self.seconds = time.time() - self.start
+        self.profile.AddTime(self.name, self.seconds)
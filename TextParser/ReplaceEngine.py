@@ -0,0 +1,394 @@
+__author__ = "Narendra"
+'''
+Replace Engine
+Compiles all find/replace rules into one matcher and rewrites the text in a single left-to-right pass.
+
+the literal finds are folded into a prefix tree and emitted as one regular expression, so
+1. every rule is checked at every position with a single scan of the text (no copy per rule)
+2. text inserted by a replacement is never re-matched by another rule
+3. when several finds match at the same position the longest one wins ("ab" beats "a")
+when every find is a single character the text is translated with a lookup table instead
+
+every rule has a mode:
+literal          - the find is plain text (the default)
+ignorecase       - plain text matched in any letter case, folded into a second prefix tree
+regex            - the find is a regular expression and the replace a template (\\1, \\g<name>)
+regex-ignorecase - a regular expression matched in any letter case
+literal, ignorecase and regex rules are alternatives of the same expression. regex-ignorecase rules get a second one,
+compiled with re.IGNORECASE (python 2 has no scoped (?i:...) flags), and the matches of the two are merged by position.
+at one position literal finds are tried first, then case-insensitive ones, then patterns in rule order.
+^ and $ match at every line
+
+finds can be single characters, whole words, phrases or patterns. empty finds are ignored, and a pattern that matches
+nothing at a position gives way to the rules after it there.
+compileRules keeps the engines compiled in this process in a small LRU cache, shared by the GUI and batch runs
+'''
+import io
+import json
+import re
+import threading
+from collections import OrderedDict
+
+LITERAL = "literal"
+IGNORE_CASE = "ignorecase"
+REGEX = "regex"
+REGEX_IGNORE_CASE = "regex-ignorecase"
+MODES = (LITERAL, IGNORE_CASE, REGEX, REGEX_IGNORE_CASE)
+#longest text a pattern is expected to match. streamed text keeps this much back between chunks, and this much of the
+#text before them for anchors and lookbehinds (see replaceChunk)
+MAX_PATTERN_MATCH = 64 * 1024
+#engines kept in memory by compileRules
+COMPILED_CACHE_SIZE = 32
+
+#a backreference by number, which would point at another group once the pattern is combined with the other rules
+_NUMBERED_REFERENCE = re.compile(r"(?<!\\)(?:\\\\)*(?:\\[1-9]|\(\?\(\d)")
+
+
+'''
+Raised for rules that can't be compiled, with the rule at fault in the message
+'''
+class RuleError(ValueError):
+    pass
+
+
+'''
+A compiled set of find/replace rules
+'''
+class ReplaceEngine(object):
+    def __init__(self, rules, pattern=None):
+        #rules can be a dict or an ordered list of (find, replace) pairs or (find, replace, mode) triples.
+        #a repeated find keeps the last replace
+        #@pattern is a pattern built earlier for the same rules (see RuleSets.EngineCache), it skips building the prefix trees
+        self.rules = normalizeRules(rules)
+        #rule ids of the literal finds, by find and by case folded find. patterns are compiled on their own to expand templates
+        self.literalIds = {}
+        self.foldedIds = {}
+        self.patterns = {}
+        for i, (find, replace, mode) in enumerate(self.rules):
+            if mode == LITERAL:
+                self.literalIds[find] = i
+            elif mode == IGNORE_CASE:
+                self.foldedIds[foldCase(find)] = i
+            else:
+                self.patterns[i] = _compileRule(i, find, mode)
+        #only plain text rules, so a match is its own key into the replacements
+        self.literal = not self.foldedIds and not self.patterns
+        self.replacements = dict([(find, replace) for find, replace, mode in self.rules if mode == LITERAL])
+        self.maxFindLength = max([len(find) for find, _, mode in self.rules if mode in (LITERAL, IGNORE_CASE)] or [0])
+        if self.patterns:
+            self.maxFindLength = max(self.maxFindLength, MAX_PATTERN_MATCH)
+        self.pattern = pattern if pattern is not None else buildRulesPattern(self.rules)
+        self.regex = _compilePattern(self.pattern, re.MULTILINE) if self.pattern else None
+        foldedPattern = "|".join([branch for _, branch in _patternBranches(self.rules, REGEX_IGNORE_CASE)])
+        self.foldedRegex = _compilePattern(foldedPattern, re.MULTILINE | re.IGNORECASE) if foldedPattern else None
+        #expressions of the patterns after a rule, tried where that rule matched nothing. built when first needed
+        self._tails = {}
+        #single character finds are a plain per-character lookup, which unicode.translate does without a call per match
+        self.table = None
+        if self.maxFindLength == 1:
+            self.table = {}
+            #literal finds win over case-insensitive ones, like they do in the pattern
+            for find, replace, mode in self.rules:
+                if mode == IGNORE_CASE:
+                    for char in _caseVariants(foldCase(find)):
+                        self.table.setdefault(ord(char), replace)
+            self.table.update([(ord(find), replace) for find, replace, mode in self.rules if mode == LITERAL])
+
+    #returns True when there is nothing to replace
+    def isEmpty(self):
+        return self.regex is None and self.foldedRegex is None
+
+    #yields the matches in @text from @pos on. a pattern never gives an empty match
+    def finditer(self, text, pos=0):
+        if self.isEmpty():
+            return iter(())
+        if not self.patterns:
+            return self.regex.finditer(text, pos)
+        return self._scan(text, pos)
+
+    #merges the matches of both expressions, at the same position the rule that comes first wins
+    def _scan(self, text, pos):
+        regexes = [regex for regex in (self.regex, self.foldedRegex) if regex is not None]
+        pending = [None] * len(regexes)
+        while pos <= len(text):
+            for i, regex in enumerate(regexes):
+                if pending[i] is None or pending[i].start() < pos:
+                    pending[i] = self._search(regex, text, pos)
+            found = [match for match in pending if match is not None]
+            if not found:
+                return
+            match = min(found, key=self._order)
+            yield match
+            pos = match.end()
+
+    #finds the first non-empty match of @regex from @pos on
+    def _search(self, regex, text, pos):
+        while pos <= len(text):
+            match = regex.search(text, pos)
+            if match is None or match.end() > match.start():
+                return match
+            #the patterns after the one that matched nothing can still match text at the same position
+            start = match.start()
+            while match is not None and match.end() == match.start():
+                tail = self._tail(regex, self.ruleId(match))
+                match = tail.match(text, start) if tail is not None else None
+            if match is not None:
+                return match
+            pos = start + 1
+        return None
+
+    #gets the expression of the patterns of @regex that come after @ruleId, None after the last one
+    def _tail(self, regex, ruleId):
+        folded = regex is self.foldedRegex
+        key = (folded, ruleId)
+        if key not in self._tails:
+            mode = REGEX_IGNORE_CASE if folded else REGEX
+            branches = [branch for i, branch in _patternBranches(self.rules, mode) if i > ruleId]
+            self._tails[key] = re.compile("|".join(branches), regex.flags) if branches else None
+        return self._tails[key]
+
+    #sorts matches by position, then literal and case-insensitive finds before patterns in rule order
+    def _order(self, match):
+        name = match.lastgroup
+        return (match.start(), -1 if name is None or name == "_i" else int(name[2:]))
+
+    #gets the index in self.rules of the rule @match was found by
+    def ruleId(self, match):
+        name = match.lastgroup
+        if name is None:
+            return self.literalIds[match.group(0)]
+        if name == "_i":
+            return self.foldedIds[foldCase(match.group(0))]
+        return int(name[2:])
+
+    #gets the text that replaces @match, with the template of a pattern expanded
+    def replacement(self, match, ruleId=None):
+        ruleId = self.ruleId(match) if ruleId is None else ruleId
+        replace = self.rules[ruleId][1]
+        if ruleId in self.patterns and "\\" in replace:
+            #the groups of the rule are numbered from 1 in its own pattern, not in the combined one
+            return self.patterns[ruleId].match(match.string, match.start()).expand(replace)
+        return replace
+
+    #replaces every match in @text in a single pass and returns the new text
+    def replace(self, text):
+        if self.isEmpty():
+            return text
+        if self.table is not None and isinstance(text, type(u"")):
+            return text.translate(self.table)
+        if self.literal:
+            return self.regex.sub(self._substitute, text)
+        output = []
+        pos = 0
+        for match in self.finditer(text):
+            output.append(text[pos:match.start()])
+            output.append(self.replacement(match))
+            pos = match.end()
+        output.append(text[pos:])
+        return text[:0].join(output)
+
+    #replaces the matches in @text that cannot change when more text is appended to it.
+    #the first @context characters of @text were replaced by the call before, they are only there for ^, \b and lookbehinds.
+    #returns (output, carry, context), @carry has to be put in front of the next chunk and @context passed with it.
+    #pass final=True for the last chunk
+    def replaceChunk(self, text, final=False, context=0):
+        if self.isEmpty() or self.maxFindLength == 1:
+            return self.replace(text[context:]), text[:0], 0
+        #a match is only certain when the longest find still fits before the end of @text
+        cut = len(text) if final else len(text) - self.maxFindLength + 1
+        if cut <= context and not final:
+            return text[:0], text, context
+        output = []
+        pos = context
+        for match in self.finditer(text, context):
+            start = match.start()
+            if start >= cut:
+                break
+            output.append(text[pos:start])
+            output.append(self.replacement(match) if not self.literal else self.replacements[match.group(0)])
+            pos = match.end()
+        if pos < cut:
+            output.append(text[pos:cut])
+            pos = cut
+        if final:
+            return text[:0].join(output), text[:0], 0
+        #patterns see the text before the carry, so ^, \b and lookbehinds at its start match like in one pass
+        keep = max(0, pos - MAX_PATTERN_MATCH) if self.patterns else pos
+        return text[:0].join(output), text[keep:], pos - keep
+
+    #gets the replacement for a single match of literal rules
+    def _substitute(self, match):
+        return self.replacements[match.group(0)]
+
+
+_compiled = OrderedDict()
+_compiledLock = threading.Lock()
+
+
+#gets the engine of @rules from the engines compiled in this process, building it with @build(rules) when it isn't there.
+#the COMPILED_CACHE_SIZE most recently used engines are kept
+def compileRules(rules, build=ReplaceEngine):
+    rules = normalizeRules(rules)
+    key = tuple(rules)
+    with _compiledLock:
+        engine = _compiled.pop(key, None)
+        if engine is not None:
+            _compiled[key] = engine
+            return engine
+    engine = build(rules)
+    with _compiledLock:
+        _compiled[key] = engine
+        while len(_compiled) > COMPILED_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return engine
+
+
+#loads rules from a json file, either {"find": "replace"} or [["find", "replace"], ["find", "replace", "mode"], ...]
+#to keep the order and give modes
+def loadRules(path):
+    with io.open(path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    if hasattr(rules, "items"):
+        rules = list(rules.items())
+    return [tuple(rule) for rule in rules]
+
+
+#rules as json lists. literal rules stay [find, replace] pairs, so they read the same as files written before modes
+def dumpRules(rules):
+    return [[find, replace] if mode == LITERAL else [find, replace, mode] for find, replace, mode in normalizeRules(rules)]
+
+
+#drops empty finds and keeps the order in which the finds were first given. returns (find, replace, mode) triples
+def normalizeRules(rules):
+    if hasattr(rules, "items"):
+        rules = rules.items()
+    order = []
+    replacements = {}
+    for rule in rules:
+        find, replace = rule[0], rule[1]
+        mode = rule[2] if len(rule) > 2 else LITERAL
+        if mode not in MODES:
+            raise RuleError("%s is not a rule mode, use one of %s" % (mode, ", ".join(MODES)))
+        if not find:
+            continue
+        #case-insensitive finds that only differ in case are the same rule
+        key = (foldCase(find) if mode == IGNORE_CASE else find, mode)
+        if key not in replacements:
+            order.append((key, find))
+        replacements[key] = replace
+    return [(find, replacements[key], key[1]) for key, find in order]
+
+
+#builds the expression of the (find, replace, mode) @rules, but for the regex-ignorecase ones which are compiled on their own.
+#groups name the case-insensitive tree and every pattern
+def buildRulesPattern(rules):
+    branches = []
+    literals = [find for find, _, mode in rules if mode == LITERAL]
+    if literals:
+        branches.append(buildPattern(literals))
+    folded = [find for find, _, mode in rules if mode == IGNORE_CASE]
+    if folded:
+        branches.append("(?P<_i>%s)" % buildPattern(folded, ignoreCase=True))
+    branches.extend([branch for _, branch in _patternBranches(rules, REGEX)])
+    return "|".join(branches)
+
+
+#gets (rule id, named group) of the pattern rules with @mode, in rule order
+def _patternBranches(rules, mode):
+    return [(i, "(?P<_r%d>%s)" % (i, find)) for i, (find, _, ruleMode) in enumerate(rules) if ruleMode == mode]
+
+
+#builds one regular expression (text or bytes, like @finds) that matches any of @finds, preferring the longest find at a position
+def buildPattern(finds, ignoreCase=False):
+    #byte finds (python 3) are built as latin-1 text, which maps every byte to one character and back
+    if finds and isinstance(finds[0], bytes) and not isinstance(finds[0], str):
+        return buildPattern([find.decode("latin-1") for find in finds], ignoreCase).encode("latin-1")
+    trie = {}
+    for find in finds:
+        node = trie
+        for char in (foldCase(find) if ignoreCase else find):
+            node = node.setdefault(char, {})
+        #"" is never a character key, so it marks the end of a find
+        node[""] = {}
+    return _nodePattern(trie, ignoreCase)
+
+
+#folds the letter case of @text one character at a time, so a folded find keeps its length
+def foldCase(text):
+    return u"".join([_foldChar(char) for char in text])
+
+
+def _foldChar(char):
+    lower = char.lower()
+    return lower if len(lower) == 1 else char
+
+
+#gets the characters that fold to @char, @char first
+def _caseVariants(char):
+    upper = char.upper()
+    if len(upper) == 1 and upper != char and _foldChar(upper) == char:
+        return [char, upper]
+    return [char]
+
+
+#compiles a pattern rule on its own. its template is expanded against this one, see ReplaceEngine.replacement
+def _compileRule(ruleId, find, mode):
+    if _NUMBERED_REFERENCE.search(find):
+        raise RuleError("rule %d (%s): numbered backreferences can't be combined with other rules, "
+                        "name the group with (?P<name>...) and refer to it with (?P=name)" % (ruleId + 1, find))
+    try:
+        return re.compile(find, re.MULTILINE | (re.IGNORECASE if mode == REGEX_IGNORE_CASE else 0))
+    except re.error as e:
+        raise RuleError("rule %d (%s): %s" % (ruleId + 1, find, e))
+
+
+def _compilePattern(pattern, flags):
+    try:
+        return re.compile(pattern, flags)
+    except re.error as e:
+        raise RuleError("the patterns can't be combined: %s" % e)
+
+
+#turns a prefix tree node into a pattern. children are tried before the node ends, which gives longest-match priority
+def _nodePattern(node, ignoreCase=False):
+    singles = []
+    branches = []
+    for char in sorted(node):
+        if not char:
+            continue
+        child = node[char]
+        #follow chains of single children without recursing so long phrases stay cheap
+        chars = char
+        while len(child) == 1 and "" not in child:
+            nextChar = list(child)[0]
+            chars += nextChar
+            child = child[nextChar]
+        prefix = "".join([_charPattern(c, ignoreCase) for c in chars])
+        if child == {"": {}}:
+            if len(chars) == 1:
+                singles.extend([re.escape(c) for c in (_caseVariants(chars) if ignoreCase else [chars])])
+            else:
+                branches.append(prefix)
+        else:
+            branches.append(prefix + _nodePattern(child, ignoreCase))
+    #single character leaves are merged into one character class
+    if len(singles) == 1:
+        branches.append(singles[0])
+    elif singles:
+        branches.append("[" + "".join(singles) + "]")
+    if not branches:
+        return ""
+    if len(branches) == 1 and "" not in node:
+        return branches[0]
+    pattern = "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        pattern += "?"
+    return pattern
+
+
+#a character of a find, or a class of all its cases
+def _charPattern(char, ignoreCase):
+    variants = _caseVariants(char) if ignoreCase else [char]
+    if len(variants) == 1:
+        return re.escape(char)
+    return "[" + "".join([re.escape(c) for c in variants]) + "]"
@@ -0,0 +1,133 @@
+__author__ = "Narendra"
+'''
+Rule Sets
+Named find/replace rule sets saved as json next to app.ui, and an on-disk cache of compiled engines.
+a frozen build unpacks into a temp folder that is removed on exit, so it keeps them in a per-user folder instead (DATA_DIR)
+
+1. RuleSetStore keeps {"name": [["find", "replace"], ["find", "replace", "mode"], ...]} in ruleSets.json
+2. EngineCache stores the compiled pattern of a rule set under a hash of its rules, so batch runs and app restarts skip
+   building it. saving a rule set with different rules evicts the entry of its old rules,
+   and the cache keeps at most MAX_ENTRIES entries, dropping the least recently used ones.
+   engines already compiled in this process come from the in-memory cache of ReplaceEngine.compileRules first
+'''
+import hashlib
+import io
+import json
+import os
+import sys
+
+from ReplaceEngine import ReplaceEngine, compileRules, dumpRules, normalizeRules
+from StreamProcessor import AtomicFile
+
+if getattr(sys, "frozen", False):
+    #%APPDATA%\TextParser on windows, ~/.TextParser elsewhere
+    DATA_DIR = os.path.join(os.environ.get("APPDATA") or os.path.expanduser("~"), ("" if os.name == "nt" else ".") + "TextParser")
+else:
+    DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+RULE_SETS_FILE = os.path.join(DATA_DIR, "ruleSets.json")
+CACHE_DIR = os.path.join(DATA_DIR, "ruleCache")
+#bump when ReplaceEngine.buildPattern changes, so patterns built by an older version are never used
+CACHE_VERSION = 2
+
+
+'''
+Named rule sets in a json file
+'''
+class RuleSetStore(object):
+    def __init__(self, path=RULE_SETS_FILE, cache=None):
+        self.path = path
+        self.cache = cache
+        self.ruleSets = {}
+        if os.path.exists(path):
+            with io.open(path, "r", encoding="utf-8") as f:
+                self.ruleSets = json.load(f)
+
+    def names(self):
+        return sorted(self.ruleSets)
+
+    #gets the rules of @name as a list of (find, replace) pairs, or (find, replace, mode) triples
+    def get(self, name):
+        return [tuple(rule) for rule in self.ruleSets[name]]
+
+    #saves @rules under @name. the cached engine of the rules it replaces is evicted
+    def save(self, name, rules):
+        rules = dumpRules(rules)
+        old = self.ruleSets.get(name)
+        if self.cache and old is not None and old != rules:
+            self.cache.evict(old)
+        self.ruleSets[name] = rules
+        self._write()
+
+    def remove(self, name):
+        old = self.ruleSets.pop(name)
+        if self.cache:
+            self.cache.evict(old)
+        self._write()
+
+    def _write(self):
+        data = json.dumps(self.ruleSets, indent=1, sort_keys=True, ensure_ascii=False)
+        folder = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with AtomicFile(self.path) as f:
+            f.write(data.encode("utf-8"))
+
+
+'''
+Compiled engines on disk, keyed by a hash of their rules
+'''
+class EngineCache(object):
+    MAX_ENTRIES = 64
+
+    def __init__(self, folder=CACHE_DIR):
+        self.folder = folder
+
+    #gets a ReplaceEngine for @rules, from memory or built from the cached pattern when there is one
+    def engine(self, rules):
+        return compileRules(rules, self._build)
+
+    def _build(self, rules):
+        path = self._entryPath(rules)
+        try:
+            with io.open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry["version"] == CACHE_VERSION and dumpRules(rules) == entry["rules"]:
+                #touch the entry, so pruning drops the least recently used ones
+                os.utime(path, None)
+                return ReplaceEngine(rules, pattern=entry["pattern"])
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+        engine = ReplaceEngine(rules)
+        self._store(path, engine)
+        return engine
+
+    #removes the cached engine of @rules
+    def evict(self, rules):
+        path = self._entryPath(normalizeRules(rules))
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _store(self, path, engine):
+        try:
+            if not os.path.isdir(self.folder):
+                os.makedirs(self.folder)
+            entry = {"version": CACHE_VERSION, "rules": dumpRules(engine.rules), "pattern": engine.pattern}
+            with AtomicFile(path, sync=False) as f:
+                f.write(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+            self._prune()
+        except (IOError, OSError):
+            #the cache only saves time, a read-only install still works without it
+            pass
+
+    #keeps the MAX_ENTRIES most recently used entries
+    def _prune(self):
+        entries = [os.path.join(self.folder, name) for name in os.listdir(self.folder) if name.endswith(".json")]
+        if len(entries) <= self.MAX_ENTRIES:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.MAX_ENTRIES]:
+            os.remove(path)
+
+    def _entryPath(self, rules):
+        key = json.dumps([CACHE_VERSION, dumpRules(rules)], ensure_ascii=False)
+        return os.path.join(self.folder, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
@@ -0,0 +1,288 @@
+__author__ = "Narendra"
+'''
+Stream Processor
+Applies a ReplaceEngine to a file chunk by chunk, so memory stays bounded by the chunk size instead of the file size.
+
+1. the source is read in fixed-size byte chunks and decoded with an incremental decoder
+2. a small carry-over buffer (shorter than the longest find) keeps matches that cross chunk boundaries. with patterns it
+   also holds some of the text already replaced, so anchors and lookbehinds see it
+3. output goes to a temp file next to the target, which is fsynced and renamed over the target once everything is written.
+   a failed run, or a crash, never leaves a half written target
+
+readText, replaceText and writeText do the same work chunk by chunk for a document held in memory, so a worker thread
+can report progress between chunks. a progress callback can raise Cancelled to stop any of them
+
+encoding="auto" detects the encoding of a file (see detectEncoding): a byte order mark gives utf-8-sig, utf-16 or utf-32,
+otherwise an encoding declared in the first bytes (xml, html, python coding line) is used, otherwise utf-8.
+processFile copies the byte order mark of the source as it is. writeText writes it in the native byte order
+
+python 2 has no surrogateescape. there processFile, readText and loadText read a file that isn't valid in its encoding
+again as latin-1, byte for byte (see withFallback), so the CLI, the batch run and the GUI all open it the same way
+'''
+import codecs
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+#bytes read from the source per step
+CHUNK_SIZE = 1024 * 1024
+#undecodable bytes are carried through untouched where the python version allows it
+ERRORS = "surrogateescape" if sys.version_info[0] >= 3 else "strict"
+#reads any bytes and writes them back as they were, for files that don't decode where ERRORS is strict
+FALLBACK_ENCODING = "latin-1"
+#encoding name that asks for the encoding of the file to be detected
+AUTO = "auto"
+#byte order marks, utf-32 first since its little endian mark starts with the utf-16 one
+BOMS = ((codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"), (codecs.BOM_UTF8, "utf-8-sig"),
+        (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+#codecs that read and write a byte order mark, with the codec of the text after each mark and without one
+_NATIVE = "le" if sys.byteorder == "little" else "be"
+_BOM_CODECS = {
+    "utf-8-sig": (((codecs.BOM_UTF8, "utf-8"),), "utf-8"),
+    "utf-16": (((codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be")), "utf-16-" + _NATIVE),
+    "utf-32": (((codecs.BOM_UTF32_LE, "utf-32-le"), (codecs.BOM_UTF32_BE, "utf-32-be")), "utf-32-" + _NATIVE),
+}
+#bytes searched for a declared encoding
+DECLARATION_SIZE = 1024
+_DECLARED = re.compile(br"""(?:encoding|charset|coding)\s*[:=]\s*["']?([A-Za-z0-9_.-]+)""")
+#codecs from bytes to bytes or text to text. python 3 flags them itself (_is_text_encoding), python 2 doesn't
+_NOT_TEXT = ("base64", "bz2", "hex", "quopri", "rot-13", "uu", "zlib", "string-escape")
+
+
+'''
+Raised by a progress callback to stop processing. files being written are left untouched
+'''
+class Cancelled(Exception):
+    pass
+
+
+#streams @srcPath through @engine into @dstPath. @dstPath can be the same file as @srcPath
+#@progress is called as progress(bytesDone, bytesTotal) after every chunk
+def processFile(srcPath, dstPath, engine, encoding="utf-8", chunkSize=CHUNK_SIZE, progress=None):
+    checkChunkSize(chunkSize)
+    encoding = resolveEncoding(srcPath, encoding)
+    return withFallback(_processFile, encoding, srcPath, dstPath, engine, chunkSize, progress)[0]
+
+
+def _processFile(encoding, srcPath, dstPath, engine, chunkSize, progress):
+    total = os.path.getsize(srcPath)
+    bom, encoding = splitBom(srcPath, encoding)
+    done = len(bom)
+    decoder = codecs.getincrementaldecoder(encoding)(ERRORS)
+    encoder = codecs.getincrementalencoder(encoding)(ERRORS)
+    with AtomicFile(dstPath) as dst:
+        #the source is closed before the temp file is renamed over it, windows can't replace a file that is open
+        with open(srcPath, "rb") as src:
+            dst.write(src.read(len(bom)))
+            carry = u""
+            context = 0
+            while True:
+                raw = src.read(chunkSize)
+                final = not raw
+                text = carry + decoder.decode(raw, final)
+                output, carry, context = engine.replaceChunk(text, final, context)
+                dst.write(encoder.encode(output, final))
+                done += len(raw)
+                if progress:
+                    progress(done, total)
+                if final:
+                    break
+    return done
+
+
+#reads and decodes the whole of @path, one chunk at a time
+def readText(path, encoding="utf-8", chunkSize=CHUNK_SIZE, progress=None):
+    return loadText(path, encoding, chunkSize, progress)[0]
+
+
+#same as readText. returns (text, encoding it was read with), FALLBACK_ENCODING when the file didn't decode
+def loadText(path, encoding="utf-8", chunkSize=CHUNK_SIZE, progress=None):
+    checkChunkSize(chunkSize)
+    return withFallback(_readText, resolveEncoding(path, encoding), path, chunkSize, progress)
+
+
+def _readText(encoding, path, chunkSize, progress):
+    total = os.path.getsize(path)
+    done = 0
+    decoder = codecs.getincrementaldecoder(encoding)(ERRORS)
+    parts = []
+    with open(path, "rb") as f:
+        while True:
+            raw = f.read(chunkSize)
+            parts.append(decoder.decode(raw, not raw))
+            done += len(raw)
+            if progress:
+                progress(done, total)
+            if not raw:
+                break
+    return u"".join(parts)
+
+
+#calls function(encoding, *args) and returns (result, encoding). where ERRORS is strict a file that isn't valid in
+#@encoding is read again as FALLBACK_ENCODING, which takes any bytes and writes them back unchanged
+def withFallback(function, encoding, *args):
+    try:
+        return function(encoding, *args), encoding
+    except UnicodeDecodeError:
+        if ERRORS != "strict" or encoding == FALLBACK_ENCODING:
+            raise
+        return function(FALLBACK_ENCODING, *args), FALLBACK_ENCODING
+
+
+#decodes @data read from the middle of a file, byte for byte as FALLBACK_ENCODING where it doesn't decode in @encoding
+def decodeBytes(data, encoding):
+    try:
+        return codecs.decode(data, encoding, ERRORS)
+    except UnicodeDecodeError:
+        if ERRORS != "strict":
+            raise
+        return codecs.decode(data, FALLBACK_ENCODING)
+
+
+#replaces @text with @engine, one chunk of characters at a time
+def replaceText(text, engine, chunkSize=CHUNK_SIZE, progress=None):
+    checkChunkSize(chunkSize)
+    total = len(text)
+    parts = []
+    carry = text[:0]
+    context = 0
+    for start in range(0, total, chunkSize):
+        output, carry, context = engine.replaceChunk(carry + text[start:start + chunkSize], context=context)
+        parts.append(output)
+        if progress:
+            progress(min(start + chunkSize, total), total)
+    parts.append(engine.replaceChunk(carry, True, context)[0])
+    return text[:0].join(parts)
+
+
+#encodes @text and writes it over @path through a temp file, one chunk at a time. "auto" keeps the encoding of @path
+def writeText(path, text, encoding="utf-8", chunkSize=CHUNK_SIZE, progress=None):
+    checkChunkSize(chunkSize)
+    total = len(text)
+    encoder = codecs.getincrementalencoder(resolveEncoding(path, encoding))(ERRORS)
+    with AtomicFile(path) as f:
+        for start in range(0, total, chunkSize):
+            f.write(encoder.encode(text[start:start + chunkSize]))
+            if progress:
+                progress(min(start + chunkSize, total), total)
+        f.write(encoder.encode(u"", True))
+    return total
+
+
+#raises ValueError for a chunk size that can't make progress. an empty read would pass for the end of the file
+def checkChunkSize(chunkSize):
+    if chunkSize <= 0:
+        raise ValueError("chunk size must be a positive number of bytes, got %d" % chunkSize)
+
+
+#gets the encoding of @path from its byte order mark or from an encoding declared in its first bytes, @default otherwise
+def detectEncoding(path, default="utf-8"):
+    try:
+        with open(path, "rb") as f:
+            head = f.read(DECLARATION_SIZE)
+    except (IOError, OSError):
+        return default
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    match = _DECLARED.search(head)
+    if match:
+        declared = match.group(1).decode("ascii")
+        #the declaration was read as ascii, a file in a 16 or 32 bit encoding can't have declared it
+        if isTextEncoding(declared) and not codecs.lookup(declared).name.startswith(("utf-16", "utf-32")):
+            return declared
+    return default
+
+
+#returns True when @name is a codec from bytes to text. "encoding: base64" in a file doesn't make it base64 text
+def isTextEncoding(name):
+    try:
+        info = codecs.lookup(name)
+    except LookupError:
+        return False
+    return getattr(info, "_is_text_encoding", True) and info.name not in _NOT_TEXT
+
+
+#gets the encoding to read @path with, detecting it for "auto"
+def resolveEncoding(path, encoding):
+    return detectEncoding(path) if encoding == AUTO else encoding
+
+
+#splits an encoding that reads and writes a byte order mark (utf-8-sig, utf-16, utf-32) into the mark @path starts with
+#and the codec of the text after it, so the file keeps its byte order. returns (bom, encoding), other encodings have no mark
+def splitBom(path, encoding):
+    name = codecs.lookup(encoding).name
+    if name not in _BOM_CODECS:
+        return b"", encoding
+    boms, plain = _BOM_CODECS[name]
+    with open(path, "rb") as f:
+        head = f.read(4)
+    for bom, codec in boms:
+        if head.startswith(bom):
+            return bom, codec
+    return b"", plain
+
+
+'''
+A binary file object that writes to a temp file and replaces @path with it when closed without errors.
+with @sync the data is on disk before the rename, and the rename before the file is closed. caches can skip that
+'''
+class AtomicFile(object):
+    def __init__(self, path, sync=True):
+        self.path = os.path.abspath(path)
+        self.sync = sync
+        folder, name = os.path.split(self.path)
+        fd, self.tempPath = tempfile.mkstemp(prefix="." + name + ".", suffix=".tmp", dir=folder)
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, data):
+        self.file.write(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        try:
+            if excType is None:
+                #a full disk shows up here at the latest, while the target is still untouched
+                self.file.flush()
+                if self.sync:
+                    os.fsync(self.file.fileno())
+            self.file.close()
+        except Exception:
+            self.file.close()
+            os.remove(self.tempPath)
+            raise
+        if excType is not None:
+            os.remove(self.tempPath)
+            return False
+        #keep permissions of the file being replaced, mkstemp creates private files
+        if os.path.exists(self.path):
+            shutil.copymode(self.path, self.tempPath)
+        replaceFile(self.tempPath, self.path)
+        if self.sync:
+            syncFolder(os.path.dirname(self.path))
+        return False
+
+
+#renames @src over @dst, replacing it where the platform allows it in one step
+def replaceFile(src, dst):
+    if hasattr(os, "replace"):
+        os.replace(src, dst)
+    else:
+        if os.name == "nt" and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
+#flushes the entries of @folder, so a rename into it survives a crash. windows can't open folders, ntfs journals renames
+def syncFolder(folder):
+    if os.name == "nt":
+        return
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
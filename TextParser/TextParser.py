@@ -1,40 +1,109 @@
 ﻿__author__ = "Narendra"
 '''
 Text Parser
-A GUI program designed to replace characters using characters given.
-user has flexible to change both find and replace characters which is upto 5
+A GUI program designed to replace characters, words, sentences or patterns of a text file with the ones given.
+the window has 6 find and replace inputs, TextParserCLI takes any number of rules
 
-limitations:
-1. use can only type one character(not a word or sentence). possible to upgrade program
-2. undo not avialble. The data is only saved when user saves it. Not a major problem
+find and replace inputs can be characters, words or sentences. all of them are replaced in a single pass (see ReplaceEngine)
+the Rules menu makes the finds regular expressions and/or case-insensitive. files are read and saved in their own encoding,
+detected from the byte order mark or the encoding they declare (see StreamProcessor.detectEncoding)
+
+loading, replacing and saving run on a worker thread (see ParserTask). the window keeps painting and the work can be cancelled
+the text is shown through a paged viewer (see PagedTextView) that only lays out the visible lines
+
+inputs can be saved and loaded as named rule sets, compiled rules are cached on disk (see RuleSets)
+every Replace All is journaled (see Document), so it can be undone, redone or re-applied with changed rules
+Find All indexes the matches without replacing: every find input shows its count, Next/Previous Match jump through them
+(only those of the focused find input when it has matches) and a Replace All with the same rules applies the index
+
+the window is built by app_ui.py, generated from app.ui by CompileUI.py and not kept in the tree. generate it once from
+source and before every frozen build. app.ui is only parsed at runtime while app_ui.py is missing or out of date with it,
+or with --load-ui. files are found next to this module, not in the current directory.
+startup time is shown in the status bar and saved in the profile report, --startup-report prints it and quits
+
+the data is only saved when user saves it, through a temp file that is fsynced and renamed over the file. meanwhile
+the replaces are autosaved to a sidecar a few seconds after the last one, and offered back when the file is opened after
+a crash (see Autosave). closing with unsaved replaces asks to save or discard them, a discard drops the sidecar.
+a failed save is reported and leaves the file as it was
 '''
+import time
+#cold start is measured from here, before the Qt modules are imported
+STARTED = time.time()
 import sys
 import os
-from PySide import QtGui, QtCore, QtUiTools
-from PySide import QtXml #declared because of pyinstaller importing issues
+import functools
+import json
+from PySide import QtGui, QtCore
+from StreamProcessor import detectEncoding, loadText, writeText
+from ReplaceEngine import IGNORE_CASE, LITERAL, REGEX, REGEX_IGNORE_CASE, RuleError
+from ParserTask import ParserTask, StallMonitor
+from LineIndex import TextLines, FileLines
+from PagedTextView import PagedTextView
+from Document import Document
+from RuleSets import EngineCache, RuleSetStore
+from Autosave import Autosave, canRecover, discardSidecar, recover
+import Profiler
+
+#timings and counts of every replace, written as json reports (see Profiler)
+profile = Profiler.GetProfile("TextParser")
+
+#app.ui and app_ui.py sit next to this module, or in the bundle folder of a frozen build
+if getattr(sys, "frozen", False):
+    HERE = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(sys.executable)))
+else:
+    HERE = os.path.dirname(os.path.abspath(__file__))
+UI_FILE = os.path.join(HERE, "app.ui")
+#milliseconds from the last change to the autosave
+AUTOSAVE_DELAY = 3000
+#rule mode of the (Regular Expressions, Ignore Case) checks of the Rules menu
+RULE_MODES = {(False, False): LITERAL, (False, True): IGNORE_CASE, (True, False): REGEX, (True, True): REGEX_IGNORE_CASE}
 
 '''
 A PySide Window that shows all the grpahic elements needed for TextParsing
 '''
 class TextParser(QtGui.QMainWindow):
-    def __init__(self):
+    def __init__(self, loadUiFile=False, exitAfterStart=False):
         super(TextParser, self).__init__()
-        self.initUI()
+        self.exitAfterStart = exitAfterStart
+        self.initUI(loadUiFile)
     #Initialze all UI's    
-    def initUI(self):
-        #get the UI filename that exits in the same directory as executable      
-        uifilename = os.getcwd() + "\\app.ui"
-        #load ui file and process it
-        loader = QtUiTools.QUiLoader()
-        uifile = QtCore.QFile(uifilename)
-        uifile.open(QtCore.QFile.ReadOnly)
-        self.ui = loader.load(uifile, self)
-        uifile.close()
+    def initUI(self, loadUiFile=False):
+        profile.AddTime("import", time.time() - STARTED)
+        #build the widgets from app_ui, or from app.ui when asked or when app_ui is out of date
+        with profile.Timer("build ui"):
+            self.ui, self.mainWindow = loadUi(self, loadUiFile)
 
         #declare any local variables needed
-        self.data = ""
-        self.textEdit = self.ui.textBrowser
+        self.document = None
+        #lines of the document as shown. Replace In File shows another file in their place until a file is opened
+        self.documentLines = None
+        self.previewing = False
+        #paged viewer takes the place of the text browser from app.ui
+        self.textEdit = PagedTextView(self.ui.textBrowser.parentWidget())
+        self.textEdit.setGeometry(self.ui.textBrowser.geometry())
+        self.ui.textBrowser.hide()
         self.fname = None
+        self.task = None
+        self.busy = False
+        #changes of the document are autosaved on their own worker, restarted by every change until it settles
+        self.autosave = None
+        self.autosaveTask = None
+        self.autosaveTimer = QtCore.QTimer(self)
+        self.autosaveTimer.setSingleShot(True)
+        self.autosaveTimer.setInterval(AUTOSAVE_DELAY)
+        self.autosaveTimer.timeout.connect(self.runAutosave)
+        #set by the Save of the close prompt, the window closes once the file is saved
+        self.closeAfterSave = False
+        #matches found by Find All in the shown text, and the one jumped to last
+        self.matchIndex = None
+        self.matchOffset = None
+        self.findEdits = [self.ui.f_lineEdit1, self.ui.f_lineEdit2, self.ui.f_lineEdit3,
+                          self.ui.f_lineEdit4, self.ui.f_lineEdit5, self.ui.f_lineEdit6]
+        self.replaceEdits = [self.ui.r_lineEdit1, self.ui.r_lineEdit2, self.ui.r_lineEdit3,
+                             self.ui.r_lineEdit4, self.ui.r_lineEdit5, self.ui.r_lineEdit6]
+        #compiled rules are cached on disk, named rule sets are saved next to app.ui
+        self.engineCache = EngineCache()
+        self.ruleSets = RuleSetStore(cache=self.engineCache)
         
         #declare and connect Open Menu
         openFile = self.ui.actionOpen       
@@ -50,67 +119,553 @@ class TextParser(QtGui.QMainWindow):
         pushButton = self.ui.pushButton
         pushButton.setStatusTip('Replaces all characters based on inputs')
         pushButton.clicked.connect(self.parseText)
+        #declare and connect Replace In File menu. processes big files in chunks without showing them
+        replaceInFile = self.ui.actionReplace_In_File
+        replaceInFile.setStatusTip('Replace all characters in a file without loading it')
+        replaceInFile.triggered.connect(self.replaceInFile)
+        #declare and connect Edit menu. undo, redo and re-apply work on the journal of replace passes
+        undo = self.ui.actionUndo
+        undo.setShortcut('Ctrl+Z')
+        undo.setStatusTip('Undo the last Replace All')
+        undo.triggered.connect(functools.partial(self.editJournal, "Undo", "undo"))
+        redo = self.ui.actionRedo
+        redo.setShortcut('Ctrl+Y')
+        redo.setStatusTip('Redo the last undone Replace All')
+        redo.triggered.connect(functools.partial(self.editJournal, "Redo", "redo"))
+        reapply = self.ui.actionReapply
+        reapply.setShortcut('Ctrl+R')
+        reapply.setStatusTip('Redo the last Replace All with the current inputs. only changed replacements are rewritten')
+        reapply.triggered.connect(self.reapplyText)
+        findAll = self.ui.actionFind_All
+        findAll.setShortcut('Ctrl+F')
+        findAll.setStatusTip('Count the matches of every find input without replacing them')
+        findAll.triggered.connect(self.findAll)
+        nextMatch = self.ui.actionNext_Match
+        nextMatch.setShortcut('F3')
+        nextMatch.setStatusTip('Show the next match of Find All')
+        nextMatch.triggered.connect(functools.partial(self.jumpToMatch, True))
+        previousMatch = self.ui.actionPrevious_Match
+        previousMatch.setShortcut('Shift+F3')
+        previousMatch.setStatusTip('Show the previous match of Find All')
+        previousMatch.triggered.connect(functools.partial(self.jumpToMatch, False))
+        #declare and connect Rules menu
+        saveRules = self.ui.actionSave_Rule_Set
+        saveRules.setStatusTip('Save the find and replace inputs as a named rule set')
+        saveRules.triggered.connect(self.saveRuleSet)
+        loadRules = self.ui.actionLoad_Rule_Set
+        loadRules.setStatusTip('Fill the find and replace inputs from a saved rule set')
+        loadRules.triggered.connect(self.loadRuleSet)
+        #modes of the find inputs
+        self.ui.actionRegular_Expressions.setStatusTip('Finds are regular expressions, replaces can use their groups (\\1, \\g<name>)')
+        self.ui.actionIgnore_Case.setStatusTip('Finds match in any letter case')
+        #opt-in fast path for Replace In File. rewrites the file through mmap when rules keep the byte length
+        self.mappedReplace = self.ui.actionMemory_Mapped
+        self.mappedReplace.setStatusTip('Replace In File rewrites the file in place when find and replace have the same length')
+        #number of matches found by Find All, kept in the status bar until the text changes
+        self.matchLabel = QtGui.QLabel()
+        self.ui.statusbar.addPermanentWidget(self.matchLabel)
+        #declare progress bar and cancel button that show the running task in status bar
+        self.progressBar = QtGui.QProgressBar()
+        self.progressBar.setRange(0, 100)
+        self.progressBar.hide()
+        self.ui.statusbar.addPermanentWidget(self.progressBar)
+        self.cancelButton = QtGui.QPushButton("Cancel")
+        self.cancelButton.setStatusTip('Stops the running task. files being saved are left untouched')
+        self.cancelButton.clicked.connect(self.cancelTask)
+        self.cancelButton.hide()
+        self.ui.statusbar.addPermanentWidget(self.cancelButton)
+        #measures how long the window is blocked while a task runs
+        self.stallMonitor = StallMonitor(self)
+        self.updateEditActions()
+        #the window built from app.ui at runtime is not this one, its close is caught by eventFilter
+        if self.mainWindow is not self:
+            self.mainWindow.installEventFilter(self)
         
         #show MainWindow
-        self.ui.show()
+        self.mainWindow.show()
+        #reported from the next event loop pass, after the window has been painted
+        QtCore.QTimer.singleShot(0, self.reportStartup)
+
+    #shows how long the app took to start, from the first import to the first paint
+    def reportStartup(self):
+        seconds = time.time() - STARTED
+        profile.AddTime("cold start", seconds)
+        report = profile.Report()
+        profile.Save()
+        self.ui.statusbar.showMessage("Started in %.2fs" % seconds)
+        if self.exitAfterStart:
+            sys.stdout.write(json.dumps(report) + "\n")
+            QtGui.QApplication.instance().quit()
 
     #calls File Dialog to select any text based file
     def showOpenDialog(self):
         #TODO: Need to add filters
-        self.fname, _ = QtGui.QFileDialog.getOpenFileName(self, 'Open file', os.getcwd())
-        #process file and check for exceptions        
-        f = None
-        try:
-            f = open(self.fname, 'r')
-        except Exception as e:
-            if not f:
-                print e.message
-                return
-        #get file data
-        with f:
-            self.data = f.read()
-            #add file data to text browser
-            self.textEdit.setText(self.data)
+        fname, _ = QtGui.QFileDialog.getOpenFileName(self, 'Open file', os.getcwd())
+        if not fname:
+            return
+        #file is read and its lines indexed on a worker thread. the viewer is filled once it is done
+        self.runTask("Loading", functools.partial(self.onFileLoaded, fname), loadLines, fname)
+
+    #shows the loaded file data
+    def onFileLoaded(self, fname, loaded):
+        lines, encoding = loaded
+        self.fname = fname
+        self.document = Document(lines.text, encoding)
+        self.clearMatches()
+        #add file data to the viewer, from the top
+        self.showDocument(lines, keepPosition=False)
+        self.startAutosave(fname, encoding)
+        self.updateTitle()
+
+    #collects the changes of the document for its sidecar. changes left by a crash are offered back first
+    def startAutosave(self, fname, encoding):
+        recoverable = canRecover(fname)
+        if not recoverable:
+            #a sidecar of an older version of the file can't be replayed on this one
+            discardSidecar(fname)
+        self.autosave = Autosave(fname, encoding, self.document)
+        if recoverable:
+            #asked once the loading task has ended
+            QtCore.QTimer.singleShot(0, functools.partial(self.offerRecovery, fname))
+
+    #asks to replay the autosaved changes of @fname, or drops them
+    def offerRecovery(self, fname):
+        if fname != self.fname:
+            return
+        answer = QtGui.QMessageBox.question(self, "Recover Changes",
+                                            "%s has replaces that were not saved when Text Parser last closed.\nRecover them?" % os.path.basename(fname),
+                                            QtGui.QMessageBox.Yes | QtGui.QMessageBox.No)
+        if answer == QtGui.QMessageBox.Yes:
+            self.runTask("Recovering", functools.partial(self.onRecovered, fname), recoverLines, fname)
+        else:
+            self.autosave.discard()
+
+    #shows the recovered document. its sidecar stays, later changes are appended to it
+    def onRecovered(self, fname, recovered):
+        lines, document = recovered
+        self.document = document
+        self.autosave = Autosave(fname, document.encoding, document)
+        self.clearMatches()
+        self.showDocument(lines, keepPosition=False)
+        self.updateTitle()
+
+    #restarts the autosave delay
+    def scheduleAutosave(self):
+        if self.autosave:
+            self.autosaveTimer.start()
+
+    #writes the changes made since the last autosave on a worker thread, once no task changes the document
+    def runAutosave(self):
+        if not self.autosave:
+            return
+        if self.busy or self.autosaveTask:
+            self.autosaveTimer.start()
+            return
+        generation, changes = self.autosave.pending()
+        if not changes:
+            return
+        self.autosaveTask = ParserTask(self.autosave.write, generation, changes)
+        self.autosaveTask.signals.finished.connect(self.onAutosaved)
+        self.autosaveTask.signals.failed.connect(self.onAutosaveFailed)
+        QtCore.QThreadPool.globalInstance().start(self.autosaveTask)
+
+    def onAutosaved(self, written):
+        self.autosaveTask = None
+
+    #a sidecar that misses changes can't be replayed, so autosave stops until the file is saved
+    def onAutosaveFailed(self, message):
+        self.autosaveTask = None
+        if self.autosave:
+            self.autosave.stop()
+        self.ui.statusbar.showMessage("Autosave failed, it is off until the file is saved: %s" % message)
+
+    #shows the file name in the title, with a * while there are unsaved changes
+    def updateTitle(self):
+        if not self.fname:
+            return
+        modified = "*" if self.document and self.document.isModified() else ""
+        self.mainWindow.setWindowTitle("Text Parser - %s%s" % (os.path.basename(self.fname), modified))
     
     #saves file data upon user-request
     def saveFile(self):
-        #access file and write data to file. check for excepions also
-        try:
-            with open(self.fname, 'w') as f:
-                f.write(self.data)
-        except Exception as e:
-            print e.message
-        pass
+        if not self.fname or not self.document:
+            return
+        #written on a worker thread through a temp file, so a failed or cancelled save keeps the old file
+        self.runTask("Saving", functools.partial(self.onSaved, self.document, self.document.revision),
+                     writeText, self.fname, self.document.text, self.document.encoding, onFailed=self.onSaveFailed)
+
+    #@revision of @document is on disk. autosave starts over from the saved file
+    def onSaved(self, document, revision, written):
+        document.savedRevision = revision
+        if document is self.document:
+            if self.autosave:
+                self.autosave.discard()
+            else:
+                self.autosave = Autosave(self.fname, document.encoding, document)
+            if self.closeAfterSave:
+                #once the task has ended
+                QtCore.QTimer.singleShot(0, self.mainWindow.close)
+        self.updateTitle()
+
+    #the save failed before the temp file replaced the file, so the file is as it was before
+    def onSaveFailed(self, message):
+        QtGui.QMessageBox.critical(self, "Save Failed", "%s was not saved and is left as it was.\n"
+                                   "The replaces are still open and autosaved.\n\n%s" % (self.fname, message))
 
     #performs parse calucations
     def parseText(self):
         #get data from text inputs
-        replaceDict = self.getReplaceDict()
+        rules = self.getReplaceRules()
         #check for empty data
-        if(self.data is ""): 
+        if not self.document or not self.document.text: 
             #msg =  QtGui.QMessageBox.warning(self, "Warning"," Please Load a text file.", QtGui.QMessageBox.Ok)
             return
-        #process data
-        for char in replaceDict:
-            self.data = self.data.replace(char, replaceDict[char])
-        #show data in text browser
-        self.textEdit.setText(self.data)
-
-    #gets data from text inputs
-    def getReplaceDict(self):
-        myDict = {}
-        myDict[self.ui.f_lineEdit1.text()] = self.ui.r_lineEdit1.text()
-        myDict[self.ui.f_lineEdit2.text()] = self.ui.r_lineEdit2.text()
-        myDict[self.ui.f_lineEdit3.text()] = self.ui.r_lineEdit3.text()
-        myDict[self.ui.f_lineEdit4.text()] = self.ui.r_lineEdit4.text()
-        myDict[self.ui.f_lineEdit5.text()] = self.ui.r_lineEdit5.text()
-        myDict[self.ui.f_lineEdit6.text()] = self.ui.r_lineEdit6.text()
-        return myDict
+        #process data on a worker thread. all the rules are applied together in one pass over the text
+        profile.Reset()
+        with profile.Timer("compile rules"):
+            engine = self.compileRules(rules)
+        if not engine:
+            return
+        self.runTask("Replacing", self.onTextReplaced, editDocument, self.document, "replace", engine)
+
+    #re-applies the last Replace All with the current inputs
+    def reapplyText(self):
+        if not self.document:
+            return
+        engine = self.compileRules(self.getReplaceRules())
+        if not engine:
+            return
+        self.runTask("Re-applying", self.onTextReplaced, editDocument, self.document, "reapply", engine)
+
+    #undoes or redoes a Replace All on the worker thread
+    def editJournal(self, label, action):
+        if not self.document:
+            return
+        self.runTask(label, self.onTextReplaced, editDocument, self.document, action)
+
+    #shows the replaced data
+    def onTextReplaced(self, lines):
+        self.clearMatches()
+        #only the visible lines that changed are redrawn
+        self.showDocument(lines)
+        self.updateTitle()
+        self.scheduleAutosave()
+
+    #shows the lines of the document in the viewer, in place of a Replace In File preview
+    def showDocument(self, lines, keepPosition=True):
+        self.documentLines = lines
+        self.previewing = False
+        self.textEdit.setSource(lines, keepPosition=keepPosition)
+        self.updateEditActions(self.busy)
+
+    #indexes the matches of the inputs in the loaded text on the worker thread
+    def findAll(self):
+        if not self.document:
+            return
+        profile.Reset()
+        engine = self.compileRules(self.getReplaceRules())
+        if not engine:
+            return
+        self.runTask("Finding", self.onMatchesIndexed, indexDocument, self.document, engine)
+
+    #shows the number of matches in total and of every find input
+    def onMatchesIndexed(self, matchIndex):
+        self.matchIndex = matchIndex
+        self.matchOffset = None
+        counts = matchIndex.counts()
+        details = []
+        for findEdit, (find, _, mode) in zip(self.findEdits, self.getReplaceRules()):
+            ruleId = matchIndex.findRule(find, mode) if find else None
+            findEdit.setToolTip("%d matches" % counts[ruleId] if ruleId is not None else "")
+            if ruleId is not None:
+                details.append("%s: %d" % (find, counts[ruleId]))
+        self.matchLabel.setText("%d matches" % len(matchIndex))
+        self.matchLabel.setToolTip("\n".join(details))
+
+    #forgets the matches of Find All once the text they were found in changes
+    def clearMatches(self):
+        self.matchIndex = None
+        self.matchOffset = None
+        self.matchLabel.setText("")
+        self.matchLabel.setToolTip("")
+        for findEdit in self.findEdits:
+            findEdit.setToolTip("")
+
+    #shows the next (or previous) match of Find All, of the focused find input when it has matches
+    def jumpToMatch(self, forward=True):
+        if not self.matchIndex:
+            return
+        ruleId = None
+        focused = QtGui.QApplication.focusWidget()
+        if focused in self.findEdits:
+            find, _, mode = self.getReplaceRules()[self.findEdits.index(focused)]
+            ruleId = self.matchIndex.findRule(find, mode)
+            if ruleId is not None and not self.matchIndex.counts()[ruleId]:
+                ruleId = None
+        index = self.documentLines.index
+        #the first jump starts from the top of the page
+        if self.matchOffset is None:
+            offset = index.offsets[min(self.textEdit.firstLine(), len(index.offsets) - 1)]
+        else:
+            offset = self.matchOffset + 1 if forward else self.matchOffset
+        if forward:
+            start, length = self.matchIndex.nextMatch(offset, ruleId)
+        else:
+            start, length = self.matchIndex.previousMatch(offset, ruleId)
+        self.matchOffset = start
+        line = index.lineAt(start)
+        self.textEdit.showSpan(line, start - index.offsets[line], length)
+        self.ui.statusbar.showMessage("Match at line %d" % (line + 1))
+
+    #replaces all characters of a file chunk by chunk. memory stays bounded no matter how large the file is
+    def replaceInFile(self):
+        fname, _ = QtGui.QFileDialog.getOpenFileName(self, 'Replace In File', os.getcwd())
+        if not fname:
+            return
+        engine = self.compileRules(self.getReplaceRules())
+        if not engine:
+            return
+        mapped = self.mappedReplace.isChecked()
+        #a memory mapped replace rewrites the file in place, stopping it halfway would leave it half replaced
+        self.runTask("Replacing in %s" % fname, self.onFileReplaced, replaceFileLines, fname, engine, mapped, cancellable=not mapped)
+
+    #previews the replaced file straight from disk. the file is not loaded for editing, so the inputs that work on the
+    #loaded document are disabled until a file is opened
+    def onFileReplaced(self, lines):
+        self.clearMatches()
+        self.previewing = True
+        self.textEdit.setSource(lines, keepPosition=False)
+        self.updateEditActions(self.busy)
+
+    #runs function(*args, progress=..) on a worker thread. @onFinished gets the result back on the window thread
+    def runTask(self, label, onFinished, function, *args, **kwargs):
+        self.task = ParserTask(function, *args)
+        self.task.signals.progress.connect(self.progressBar.setValue)
+        if onFinished:
+            self.task.signals.finished.connect(onFinished)
+        self.task.signals.finished.connect(lambda result: self.endTask(label))
+        self.task.signals.failed.connect(lambda message: self.endTask(label, "%s failed: %s" % (label, message)))
+        self.task.signals.cancelled.connect(lambda: self.endTask(label, "%s cancelled" % label))
+        #reported after the window is usable again
+        if kwargs.get("onFailed"):
+            self.task.signals.failed.connect(kwargs["onFailed"])
+        self.cancelButton.setEnabled(kwargs.get("cancellable", True))
+        self.setBusy(True)
+        self.ui.statusbar.showMessage("%s..." % label)
+        self.stallMonitor.start()
+        QtCore.QThreadPool.globalInstance().start(self.task)
+
+    #called on the window thread once the task has finished, failed or been cancelled
+    def endTask(self, label, message=None):
+        stall = self.stallMonitor.stop()
+        started = self.task.started
+        self.setBusy(False)
+        self.closeAfterSave = False
+        if message:
+            self.ui.statusbar.showMessage(message)
+            return
+        #reported from the next event loop pass, after the result has been painted
+        report = lambda: self.ui.statusbar.showMessage("%s done. first paint after %.2fs, longest UI stall %.0fms" % (label, time.time() - started, stall * 1000))
+        QtCore.QTimer.singleShot(0, report)
+
+    #stops the running task at its next chunk
+    def cancelTask(self):
+        if self.task:
+            self.task.cancel()
+
+    #cancels the running task and waits for it. its result, or its cancellation, is handled before this returns
+    def finishTask(self):
+        self.cancelTask()
+        QtCore.QThreadPool.globalInstance().waitForDone()
+        #the signals of the task are queued to this thread
+        QtGui.QApplication.processEvents()
+
+    #only one task runs at a time. inputs that start another one are disabled meanwhile
+    def setBusy(self, busy):
+        self.busy = busy
+        self.progressBar.setValue(0)
+        self.progressBar.setVisible(busy)
+        self.cancelButton.setVisible(busy)
+        for widget in (self.ui.actionOpen, self.ui.actionSave, self.ui.actionReplace_In_File):
+            widget.setEnabled(not busy)
+        self.updateEditActions(busy)
+
+    #enables undo, redo and re-apply when the journal allows them, and the jumps when there are matches.
+    #all of them, Find All and Replace All work on the shown document, not on a Replace In File preview
+    def updateEditActions(self, busy=False):
+        editable = not busy and not self.previewing
+        self.ui.actionFind_All.setEnabled(editable)
+        self.ui.pushButton.setEnabled(editable)
+        document = self.document if editable else None
+        self.ui.actionUndo.setEnabled(bool(document and document.canUndo()))
+        self.ui.actionRedo.setEnabled(bool(document and document.canRedo()))
+        self.ui.actionReapply.setEnabled(bool(document and document.canUndo()))
+        matches = bool(editable and self.matchIndex)
+        self.ui.actionNext_Match.setEnabled(matches)
+        self.ui.actionPrevious_Match.setEnabled(matches)
+
+    def closeEvent(self, event):
+        if not self.confirmClose():
+            event.ignore()
+            return
+        super(TextParser, self).closeEvent(event)
+
+    #closes of the window built from app.ui
+    def eventFilter(self, obj, event):
+        if obj is self.mainWindow and event.type() == QtCore.QEvent.Close and not self.confirmClose():
+            event.ignore()
+            return True
+        return super(TextParser, self).eventFilter(obj, event)
+
+    #asks to save or discard unsaved replaces before the window closes. returns False to keep it open.
+    #a discard drops the sidecar, so the next open doesn't offer the replaces back. a Save closes the window once it is done.
+    #a running task is cancelled first, and its replaces are asked about like any other
+    def confirmClose(self):
+        if self.busy:
+            if self.closeAfterSave:
+                #the save of an earlier close is still running, it closes the window once it is done
+                return False
+            self.finishTask()
+        if not self.autosave:
+            return True
+        if self.document.isModified():
+            answer = QtGui.QMessageBox.question(self, "Unsaved Changes",
+                                                "%s has replaces that were not saved.\nSave them before closing?" % os.path.basename(self.fname),
+                                                QtGui.QMessageBox.Save | QtGui.QMessageBox.Discard | QtGui.QMessageBox.Cancel,
+                                                QtGui.QMessageBox.Save)
+            if answer == QtGui.QMessageBox.Cancel:
+                return False
+            if answer == QtGui.QMessageBox.Save:
+                self.closeAfterSave = True
+                self.saveFile()
+                return False
+        self.autosaveTimer.stop()
+        self.autosave.discard()
+        return True
+
+    #gets data from text inputs as (find, replace, mode) triples in input order. the mode comes from the Rules menu
+    def getReplaceRules(self):
+        mode = RULE_MODES[(self.ui.actionRegular_Expressions.isChecked(), self.ui.actionIgnore_Case.isChecked())]
+        return [(find.text(), replace.text(), mode) for find, replace in zip(self.findEdits, self.replaceEdits)]
+
+    #fills the text inputs and the Rules menu modes from rules. inputs without a rule are cleared
+    def setReplaceRules(self, rules):
+        rules = [tuple(rule) + (LITERAL,) * (3 - len(rule)) for rule in rules]
+        for i, (findEdit, replaceEdit) in enumerate(zip(self.findEdits, self.replaceEdits)):
+            find, replace, _ = rules[i] if i < len(rules) else ("", "", LITERAL)
+            findEdit.setText(find)
+            replaceEdit.setText(replace)
+        modes = set([mode for _, _, mode in rules[:len(self.findEdits)]])
+        if modes:
+            regex, ignoreCase = [key for key, mode in RULE_MODES.items() if mode == rules[0][2]][0]
+            self.ui.actionRegular_Expressions.setChecked(regex)
+            self.ui.actionIgnore_Case.setChecked(ignoreCase)
+        if len(rules) > len(self.findEdits):
+            self.ui.statusbar.showMessage("Only the first %d of %d rules fit in the inputs" % (len(self.findEdits), len(rules)))
+        elif len(modes) > 1:
+            self.ui.statusbar.showMessage("The rule set mixes modes, the inputs all use the mode of the first rule")
+
+    #compiles rules into an engine. a find that isn't a valid pattern is shown in the status bar and gives None
+    def compileRules(self, rules):
+        try:
+            return self.engineCache.engine(rules)
+        except RuleError as e:
+            self.ui.statusbar.showMessage("%s" % e)
+            return None
+
+    #saves the text inputs as a named rule set
+    def saveRuleSet(self):
+        name, ok = QtGui.QInputDialog.getText(self, 'Save Rule Set', 'Rule set name:')
+        if ok and name:
+            self.ruleSets.save(name, self.getReplaceRules())
+            self.ui.statusbar.showMessage("Rule set %s saved" % name)
+
+    #fills the text inputs from a saved rule set
+    def loadRuleSet(self):
+        names = self.ruleSets.names()
+        if not names:
+            self.ui.statusbar.showMessage("No rule sets saved yet")
+            return
+        name, ok = QtGui.QInputDialog.getItem(self, 'Load Rule Set', 'Rule set:', names, 0, False)
+        if ok:
+            self.setReplaceRules(self.ruleSets.get(name))
                                 
+#reads a file in its detected encoding and indexes its lines. returns (lines, encoding). runs on the worker thread
+def loadLines(fname, progress=None):
+    text, encoding = loadText(fname, detectEncoding(fname), progress=progress)
+    return TextLines(text), encoding
+
+#runs document.<action>(*args) and indexes the lines of the result. runs on the worker thread
+def editDocument(document, action, *args, **kwargs):
+    try:
+        with profile.Timer(action):
+            replacements = getattr(document, action)(*args, **kwargs)
+        profile.Count("characters processed", len(document.text))
+        profile.Count("replacements", replacements)
+        with profile.Timer("index lines"):
+            return TextLines(document.text)
+    finally:
+        profile.Save()
+
+#reads a file and replays its autosaved changes. returns (lines, document). runs on the worker thread
+def recoverLines(fname, progress=None):
+    document = recover(fname, progress)
+    return TextLines(document.text), document
+
+#indexes the matches of @engine in @document. runs on the worker thread
+def indexDocument(document, engine, progress=None):
+    try:
+        with profile.Timer("find all"):
+            matchIndex = document.index(engine, progress)
+        profile.Count("characters processed", len(document.text))
+        profile.Count("matches", len(matchIndex))
+        return matchIndex
+    finally:
+        profile.Save()
+
+#replaces a file in place and indexes its lines on disk. runs on the worker thread
+def replaceFileLines(fname, engine, mapped, progress=None):
+    #only needed by Replace In File, not imported at startup
+    from MappedReplace import replaceInPlace
+    encoding = detectEncoding(fname)
+    try:
+        with profile.Timer("replace in file"):
+            replaceInPlace(fname, engine, mapped, encoding=encoding, progress=progress)
+        profile.Count("bytes processed", os.path.getsize(fname))
+        with profile.Timer("index lines"):
+            return FileLines(fname, encoding)
+    finally:
+        profile.Save()
+
+#builds the widgets of app.ui on @window. returns (ui, window to show)
+def loadUi(window, loadUiFile=False):
+    if not loadUiFile:
+        from CompileUI import uiHash
+        try:
+            import app_ui
+        except ImportError:
+            app_ui = None
+        #app.ui is compared with the one app_ui was generated from, where it is shipped. an app_ui without that stamp
+        #wasn't generated by CompileUI and is never used
+        sourceHash = getattr(app_ui, "UI_SOURCE_HASH", None)
+        if sourceHash and (not os.path.exists(UI_FILE) or uiHash(UI_FILE) == sourceHash):
+            ui = app_ui.Ui_MainWindow()
+            ui.setupUi(window)
+            return ui, window
+        sys.stderr.write("app_ui.py is missing or older than app.ui, loading app.ui. run CompileUI.py to generate it\n")
+    #QUiLoader parses the xml at runtime. QtXml is declared because of pyinstaller importing issues
+    from PySide import QtUiTools, QtXml
+    loader = QtUiTools.QUiLoader()
+    uifile = QtCore.QFile(UI_FILE)
+    uifile.open(QtCore.QFile.ReadOnly)
+    ui = loader.load(uifile, window)
+    uifile.close()
+    return ui, ui
+
 #call Main Window
 def main():
     app = QtGui.QApplication(sys.argv)
-    ex = TextParser()
+    ex = TextParser(loadUiFile="--load-ui" in sys.argv, exitAfterStart="--startup-report" in sys.argv)
     sys.exit(app.exec_())
 
 
@@ -0,0 +1,148 @@
+__author__ = "Narendra"
+'''
+Text Parser CLI
+Runs the Text Parser replace rules without the GUI, for batch jobs (CI, cron) over many files.
+PySide is never imported, so startup stays fast on machines without a display.
+
+USAGE:
+python TextParserCLI.py rules.json "logs/*.log" notes.txt -o out/ --jobs 4
+python TextParserCLI.py rules.json "logs/*.log" --in-place --mmap
+
+rules.json holds {"find": "replace"} or [["find", "replace"], ["find", "replace", "mode"], ...], where mode is literal,
+ignorecase, regex or regex-ignorecase (see ReplaceEngine). the name of a rule set saved from the GUI works too
+compiled rules are cached on disk (see RuleSets.EngineCache), so repeated runs with the same rules skip compiling them
+each input is written to the output directory under its own file name, or replaced with --in-place.
+--mmap lets equal-length rules rewrite files in place through a memory map (see MappedReplace). a timing report is printed at the end
+the encoding of every input is detected from its byte order mark or declaration unless --encoding names one
+'''
+import argparse
+import glob
+import os
+import sys
+import time
+
+from BatchProcessor import processFiles
+from ReplaceEngine import RuleError, compileRules, loadRules
+from RuleSets import CACHE_DIR, EngineCache, RuleSetStore
+from StreamProcessor import AUTO, CHUNK_SIZE
+
+
+#expands globs and keeps the given order. inputs that match nothing are reported as missing
+def expandInputs(patterns):
+    paths = []
+    missing = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            missing.append(pattern)
+        for path in matches:
+            if os.path.isfile(path) and path not in paths:
+                paths.append(path)
+    return paths, missing
+
+
+#gets the output file for every input. two inputs with the same file name would overwrite each other
+def outputPaths(paths, outputDir):
+    outputs = []
+    seen = {}
+    for path in paths:
+        name = os.path.basename(path)
+        if name in seen:
+            raise ValueError("%s and %s would both be written to %s" % (seen[name], path, name))
+        seen[name] = path
+        outputs.append(os.path.join(outputDir, name))
+    return outputs
+
+
+#prints per-file timing and the overall throughput
+def printReport(results, elapsed, stream=sys.stdout):
+    totalBytes = 0
+    for path, size, seconds in results:
+        totalBytes += size
+        stream.write("%10.3fs %12d bytes %9.2f MB/s  %s\n" % (seconds, size, _throughput(size, seconds), path))
+    stream.write("%d file(s), %d bytes in %.3fs, %.2f MB/s\n" % (len(results), totalBytes, elapsed, _throughput(totalBytes, elapsed)))
+
+
+def _throughput(size, seconds):
+    return size / (1024.0 * 1024.0) / seconds if seconds > 0 else 0.0
+
+
+#argparse type for counts that must be at least 1
+def positiveInt(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("%s is not a whole number" % value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError("%s must be greater than 0" % value)
+    return number
+
+
+def buildParser():
+    parser = argparse.ArgumentParser(description="Replace text in many files using Text Parser rules.")
+    parser.add_argument("rules", help="json rules file or name of a saved rule set")
+    parser.add_argument("inputs", nargs="+", help="input files or glob patterns")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("-o", "--output-dir", help="directory the processed files are written to")
+    target.add_argument("--in-place", action="store_true", help="replace the input files themselves")
+    parser.add_argument("--mmap", action="store_true",
+                        help="with --in-place, rewrite files through a memory map when every find and replace have the same byte length")
+    parser.add_argument("--encoding", default=AUTO,
+                        help="text encoding of the inputs (default: %s, from the byte order mark or declaration, else utf-8)" % AUTO)
+    parser.add_argument("--chunk-size", type=positiveInt, default=CHUNK_SIZE, help="bytes read per step (default: %d)" % CHUNK_SIZE)
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="where compiled rules are cached (default: %s)" % CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true", help="compile the rules without the on-disk cache")
+    parser.add_argument("-j", "--jobs", type=positiveInt, default=1, help="number of worker processes (default: 1)")
+    return parser
+
+
+def main(argv=None):
+    args = buildParser().parse_args(argv)
+    if os.path.isfile(args.rules):
+        rules = loadRules(args.rules)
+    else:
+        store = RuleSetStore()
+        if args.rules not in store.names():
+            sys.stderr.write("%s is neither a rules file nor a saved rule set\n" % args.rules)
+            return 2
+        rules = store.get(args.rules)
+    try:
+        engine = compileRules(rules) if args.no_cache else EngineCache(args.cache_dir).engine(rules)
+    except RuleError as e:
+        sys.stderr.write("%s\n" % e)
+        return 2
+    paths, missing = expandInputs(args.inputs)
+    for pattern in missing:
+        sys.stderr.write("no files match %s\n" % pattern)
+    if args.in_place:
+        outputs = paths
+    else:
+        try:
+            outputs = outputPaths(paths, args.output_dir)
+        except ValueError as e:
+            sys.stderr.write("%s\n" % e)
+            return 2
+        if not os.path.isdir(args.output_dir):
+            os.makedirs(args.output_dir)
+
+    results = []
+    failed = 0
+    start = time.time()
+    try:
+        for path, _, size, seconds, error in processFiles(zip(paths, outputs), engine, jobs=args.jobs,
+                                                          encoding=args.encoding, chunkSize=args.chunk_size, mapped=args.mmap):
+            if error:
+                sys.stderr.write("failed %s: %s\n" % (path, error))
+                failed += 1
+                continue
+            results.append((path, size, seconds))
+    except (ImportError, OSError) as e:
+        #platforms without working semaphores can't start worker processes
+        sys.stderr.write("worker processes can't be started, run with --jobs 1: %s\n" % e)
+        return 2
+    printReport(results, time.time() - start)
+    return 1 if (failed or missing) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+__author__ = "Narendra"
+'''
+Batch Scaling Benchmark
+Measures how BatchProcessor scales with the number of worker processes.
+A corpus of files is built by repeating sampleText.txt, then the same rules are run with 1, 2, 4 ... workers.
+
+USAGE:
+python benchmarks/BatchScaling.py --files 32 --size-mb 8 --max-jobs 8
+'''
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from BatchProcessor import processFiles
+from ReplaceEngine import ReplaceEngine
+
+SAMPLE_TEXT = os.path.join(os.path.dirname(HERE), "sampleText.txt")
+#same rules as the defaults in app.ui
+RULES = [("a", "4"), ("e", "3"), ("i", "1"), ("o", "0"), ("t", "7"), ("s", "5")]
+
+
+#writes @count files of about @size bytes each made of sampleText.txt
+def buildCorpus(folder, count, size):
+    with open(SAMPLE_TEXT, "rb") as f:
+        sample = f.read()
+    block = sample * max(1, (1024 * 1024) // len(sample))
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, "sample%03d.txt" % i)
+        with open(path, "wb") as f:
+            written = 0
+            while written < size:
+                f.write(block[:size - written])
+                written += min(len(block), size - written)
+        paths.append(path)
+    return paths
+
+
+#runs the corpus once with @jobs workers and returns the elapsed seconds
+def runBatch(paths, outputDir, engine, jobs):
+    pairs = [(path, os.path.join(outputDir, os.path.basename(path))) for path in paths]
+    start = time.time()
+    for result in processFiles(pairs, engine, jobs=jobs):
+        if result[4]:
+            raise RuntimeError("failed %s: %s" % (result[0], result[4]))
+    return time.time() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure BatchProcessor scaling across worker counts.")
+    parser.add_argument("--files", type=int, default=32, help="number of files in the corpus")
+    parser.add_argument("--size-mb", type=float, default=8, help="size of every file in MB")
+    parser.add_argument("--max-jobs", type=int, default=multiprocessing.cpu_count(), help="largest worker count to run")
+    args = parser.parse_args(argv)
+
+    folder = tempfile.mkdtemp(prefix="textparser_bench_")
+    try:
+        paths = buildCorpus(folder, args.files, int(args.size_mb * 1024 * 1024))
+        totalMB = sum([os.path.getsize(path) for path in paths]) / (1024.0 * 1024.0)
+        outputDir = os.path.join(folder, "out")
+        os.makedirs(outputDir)
+        engine = ReplaceEngine(RULES)
+
+        jobCounts = []
+        jobs = 1
+        while jobs <= args.max_jobs:
+            jobCounts.append(jobs)
+            jobs *= 2
+        if jobCounts[-1] != args.max_jobs:
+            jobCounts.append(args.max_jobs)
+
+        print("corpus: %d files, %.1f MB, %d cpu(s)" % (len(paths), totalMB, multiprocessing.cpu_count()))
+        print("%6s %10s %10s %9s %11s" % ("jobs", "seconds", "MB/s", "speedup", "efficiency"))
+        baseline = None
+        for jobs in jobCounts:
+            seconds = runBatch(paths, outputDir, engine, jobs)
+            baseline = baseline or seconds
+            speedup = baseline / seconds
+            print("%6d %10.2f %10.1f %8.2fx %10.0f%%" % (jobs, seconds, totalMB / seconds, speedup, speedup * 100.0 / jobs))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+__author__ = "Narendra"
+'''
+Replace Benchmark
+Reproducible benchmark of the text replacement hot path. Results are written as json so regressions can be tracked.
+
+1. corpora of 1MB, 100MB (and 1GB on request) are built from shuffled lines of sampleText.txt with a fixed seed
+2. rule sets of 1, 6, 100 and 10k rules are swept at several match densities. finds are words of sampleText.txt picked
+   to reach the density, the rest are words that never occur. the density actually reached is measured and reported
+3. every engine runs in its own process, so its peak RSS is its own:
+   legacy  - the original str.replace loop of TextParser.parseText
+   engine  - ReplaceEngine.replace over the whole text
+   stream  - StreamProcessor.processFile, file to file in chunks
+   mapped  - MappedReplace.replaceMapped, in place through mmap
+
+USAGE:
+python benchmarks/ReplaceBenchmark.py --sizes 1 100 --output results.json
+python benchmarks/ReplaceBenchmark.py --sizes 1 100 1024 --rules 6 10000 --engines engine stream mapped
+'''
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from ReplaceEngine import ReplaceEngine
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SAMPLE_TEXT = os.path.join(os.path.dirname(HERE), "sampleText.txt")
+SEED = 20141018
+SIZES = [1, 100]
+RULE_COUNTS = [1, 6, 100, 10000]
+#fraction of the corpus characters covered by matches
+DENSITIES = {"none": 0.0, "low": 0.001, "medium": 0.01, "high": 0.1}
+ENGINES = ["legacy", "engine", "stream", "mapped"]
+MB = 1024 * 1024
+
+
+#writes a corpus of @sizeMB made of shuffled sampleText.txt lines. the same seed always gives the same file
+def buildCorpus(path, sizeMB):
+    if os.path.exists(path) and os.path.getsize(path) == sizeMB * MB:
+        return path
+    with io.open(SAMPLE_TEXT, "r", encoding="utf-8") as f:
+        lines = [line.rstrip("\n") + "\n" for line in f if line.strip()]
+    rng = random.Random(SEED)
+    size = sizeMB * MB
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            block = "".join([rng.choice(lines) for _ in range(4096)]).encode("utf-8")
+            block = block[:size - written]
+            f.write(block)
+            written += len(block)
+    return path
+
+
+#picks @count rules whose finds cover about @density of the sample text. finds keep their length when replaced
+def buildRules(count, density):
+    with io.open(SAMPLE_TEXT, "r", encoding="utf-8") as f:
+        text = f.read()
+    frequency = {}
+    for word in re.findall(r"[A-Za-z]{3,}", text):
+        frequency[word] = frequency.get(word, 0) + 1
+    finds = []
+    covered = 0.0
+    #rarest words first, so low densities are reachable with few rules
+    for word in sorted(frequency, key=lambda word: (frequency[word] * len(word), word)):
+        share = frequency[word] * len(word) / float(len(text))
+        if len(finds) >= count or covered + share > density * 1.5:
+            continue
+        finds.append(word)
+        covered += share
+    #finds that never occur make up the rest of the rule count
+    finds += ["zq%06dx" % i for i in range(count - len(finds))]
+    return [(find, find.upper() if find.upper() != find else find.lower()) for find in finds]
+
+
+#fraction of @path characters covered by matches of @rules, measured on the first MB
+def measureDensity(path, rules):
+    with io.open(path, "r", encoding="utf-8") as f:
+        text = f.read(MB)
+    engine = ReplaceEngine(rules)
+    if engine.isEmpty() or not text:
+        return 0.0
+    return sum([len(match.group(0)) for match in engine.finditer(text)]) / float(len(text))
+
+
+#runs one case in this process and returns its measurements
+def runCase(case):
+    with open(case["rules"], "r") as f:
+        rules = [tuple(rule) for rule in json.load(f)]
+    path = case["corpus"]
+    size = os.path.getsize(path)
+    engineName = case["engine"]
+    workDir = tempfile.mkdtemp(prefix="textparser_case_")
+    #compiling is timed on its own, so small corpora with many rules still show the replace speed
+    start = time.time()
+    engine = ReplaceEngine(rules) if engineName != "legacy" else None
+    compileSeconds = time.time() - start
+    try:
+        if engineName == "legacy":
+            with io.open(path, "r", encoding="utf-8", newline="") as f:
+                data = f.read()
+            start = time.time()
+            replaceDict = dict(rules)
+            for char in replaceDict:
+                data = data.replace(char, replaceDict[char])
+            seconds = time.time() - start
+        elif engineName == "engine":
+            with io.open(path, "r", encoding="utf-8", newline="") as f:
+                data = f.read()
+            start = time.time()
+            data = engine.replace(data)
+            seconds = time.time() - start
+        elif engineName == "stream":
+            from StreamProcessor import processFile
+            start = time.time()
+            processFile(path, os.path.join(workDir, "out.txt"), engine)
+            seconds = time.time() - start
+        elif engineName == "mapped":
+            from MappedReplace import replaceMapped
+            target = os.path.join(workDir, "mapped.txt")
+            shutil.copyfile(path, target)
+            start = time.time()
+            if not replaceMapped(target, engine):
+                return {"skipped": "rules change length"}
+            seconds = time.time() - start
+        else:
+            raise ValueError("unknown engine %s" % engineName)
+    finally:
+        shutil.rmtree(workDir)
+    return {"seconds": seconds, "compile_seconds": compileSeconds,
+            "mb_per_s": size / float(MB) / seconds if seconds > 0 else None, "peak_rss_mb": peakRSS()}
+
+
+#peak resident memory of this process in MB, None where the platform can't tell
+def peakRSS():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #linux reports KB, macOS bytes
+    return peak / float(MB) if sys.platform == "darwin" else peak / 1024.0
+
+
+#runs a case in a child process so peak RSS is measured for it alone
+def runCaseProcess(case, timeout):
+    command = [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    deadline = time.time() + timeout
+    while process.poll() is None:
+        if time.time() > deadline:
+            process.kill()
+            process.wait()
+            return {"skipped": "timeout after %ds" % timeout}
+        time.sleep(0.05)
+    out, err = process.communicate()
+    if process.returncode:
+        return {"error": err.decode("utf-8", "replace").strip().splitlines()[-1:]}
+    return json.loads(out.decode("utf-8"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Text Parser replacement engines.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="corpus sizes in MB (default: 1 100, add 1024 for 1GB)")
+    parser.add_argument("--rules", type=int, nargs="+", default=RULE_COUNTS, help="rule counts (default: 1 6 100 10000)")
+    parser.add_argument("--densities", nargs="+", default=sorted(DENSITIES), choices=sorted(DENSITIES), help="match densities")
+    parser.add_argument("--engines", nargs="+", default=ENGINES, choices=ENGINES, help="engines to run")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "textparser_corpus"),
+                        help="where corpora are built and kept between runs")
+    parser.add_argument("--timeout", type=int, default=600, help="seconds before a case is skipped")
+    parser.add_argument("--output", help="json file for the results (default: stdout)")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        sys.stdout.write(json.dumps(runCase(json.loads(args.run_case))))
+        return 0
+
+    if not os.path.isdir(args.corpus_dir):
+        os.makedirs(args.corpus_dir)
+    results = []
+    for sizeMB in args.sizes:
+        corpus = buildCorpus(os.path.join(args.corpus_dir, "corpus_%dMB.txt" % sizeMB), sizeMB)
+        for count in args.rules:
+            for densityName in args.densities:
+                rules = buildRules(count, DENSITIES[densityName])
+                rulesPath = os.path.join(args.corpus_dir, "rules_%d_%s.json" % (count, densityName))
+                with open(rulesPath, "w") as f:
+                    json.dump(rules, f)
+                density = measureDensity(corpus, rules)
+                for engineName in args.engines:
+                    case = {"corpus": corpus, "rules": rulesPath, "engine": engineName}
+                    result = {"size_mb": sizeMB, "rules": count, "density": densityName,
+                              "measured_density": round(density, 6), "engine": engineName}
+                    result.update(runCaseProcess(case, args.timeout))
+                    results.append(result)
+                    sys.stderr.write("%s\n" % json.dumps(result))
+
+    report = {"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                          "processor": platform.processor(), "seed": SEED},
+              "results": results}
+    data = json.dumps(report, indent=1, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(data)
+    else:
+        sys.stdout.write(data + "\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
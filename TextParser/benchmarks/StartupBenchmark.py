@@ -0,0 +1,85 @@
+__author__ = "Narendra"
+'''
+Startup Benchmark
+Cold start of Text Parser, from launching the interpreter to the first paint of the window.
+
+every run starts a new process with --startup-report, which quits once the window is painted and prints its profile
+report (import, build ui, cold start). the wall time of the whole process is measured here as well, so interpreter
+startup is included. runs with the generated app_ui.py and with app.ui loaded at runtime (--load-ui) are compared
+run CompileUI.py first, Text Parser loads app.ui at runtime while app_ui.py is missing or isn't generated from it
+
+USAGE:
+python benchmarks/StartupBenchmark.py --runs 10 --output startup.json
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEXT_PARSER = os.path.join(os.path.dirname(HERE), "TextParser.py")
+MODES = {"app_ui": [], "load_ui": ["--load-ui"]}
+
+
+#starts Text Parser once and returns its timings
+def runOnce(extraArgs, timeout):
+    start = time.time()
+    process = subprocess.Popen([sys.executable, TEXT_PARSER, "--startup-report"] + extraArgs,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    deadline = start + timeout
+    while process.poll() is None:
+        if time.time() > deadline:
+            process.kill()
+            process.wait()
+            return {"error": "timeout after %ds" % timeout}
+        time.sleep(0.01)
+    wall = time.time() - start
+    out, err = process.communicate()
+    if process.returncode:
+        return {"error": err.decode("utf-8", "replace").strip().splitlines()[-1:]}
+    report = json.loads(out.decode("utf-8").strip().splitlines()[-1])
+    result = {"wall_seconds": wall}
+    for name, timer in report["timers"].items():
+        result[name.replace(" ", "_") + "_seconds"] = timer["seconds"]
+    return result
+
+
+#min and median of every measurement over @runs
+def summarize(runs):
+    summary = {}
+    for key in sorted(set([key for run in runs for key in run if key.endswith("_seconds")])):
+        values = sorted([run[key] for run in runs if key in run])
+        summary[key] = {"min": values[0], "median": values[len(values) // 2]}
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the cold start of Text Parser.")
+    parser.add_argument("--runs", type=int, default=10, help="starts per mode (default: 10)")
+    parser.add_argument("--modes", nargs="+", default=sorted(MODES), choices=sorted(MODES), help="ui loading modes")
+    parser.add_argument("--timeout", type=int, default=60, help="seconds before a start is given up")
+    parser.add_argument("--output", help="json file for the results (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for mode in args.modes:
+        runs = [runOnce(MODES[mode], args.timeout) for _ in range(args.runs)]
+        errors = [run["error"] for run in runs if "error" in run]
+        results[mode] = {"runs": runs, "summary": summarize([run for run in runs if "error" not in run]), "errors": errors}
+        sys.stderr.write("%s %s\n" % (mode, json.dumps(results[mode]["summary"])))
+
+    report = {"machine": {"python": platform.python_version(), "platform": platform.platform()}, "results": results}
+    data = json.dumps(report, indent=1, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(data)
+    else:
+        sys.stdout.write(data + "\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())